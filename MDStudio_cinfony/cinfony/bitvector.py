@@ -0,0 +1,62 @@
+#-*. coding: utf-8 -*-
+##  This file is part of Cinfony.
+##  The contents are covered by the terms of the BSD license
+##  which is included in the file LICENSE_BSD.txt.
+
+"""
+bitvector - Fingerprint bit vector helpers shared by the Cinfony modules
+
+Fingerprint.to_numpy() returns a NumPy uint8 array with one 0/1 value per
+bit or, with packed=True, the packed fingerprint bytes: bit i is stored
+in byte i // 8 at position i % 8, least significant bit first. The
+functions below convert between the toolkit representations and these
+layouts. They require NumPy.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def wordstobytes(words, bitsperint):
+    """Return integer words as bytes, least significant byte first.
+
+    Required parameters:
+       words -- a sequence of unsigned integers
+       bitsperint -- the number of bits per word, a multiple of 8
+    """
+    dtype = np.dtype("<u%d" % (bitsperint // 8))
+    return np.fromiter(words, dtype=dtype, count=len(words)).view(np.uint8)
+
+
+def unpackbits(octets):
+    """Unpack bytes into a 0/1 vector, least significant bit first."""
+    octets = np.asarray(octets, dtype=np.uint8).reshape(-1, 1)
+    return np.unpackbits(octets, axis=1)[:, ::-1].ravel()
+
+
+def packbits(bitvector):
+    """Pack a 0/1 vector into bytes, least significant bit first."""
+    bitvector = np.asarray(bitvector, dtype=bool)
+    padded = np.zeros(-(-len(bitvector) // 8) * 8, dtype=bool)
+    padded[:len(bitvector)] = bitvector
+    return np.packbits(padded.reshape(-1, 8)[:, ::-1], axis=1).ravel()
+
+
+def tanimoto(octets, other):
+    """Return the Tanimoto coefficient of two packed fingerprints.
+
+    The shorter fingerprint is padded with zero bytes. Returns 0.0 if
+    no bits are set in either fingerprint.
+    """
+    octets = np.asarray(octets, dtype=np.uint8)
+    other = np.asarray(other, dtype=np.uint8)
+    if len(octets) != len(other):
+        size = max(len(octets), len(other))
+        octets = np.concatenate((octets, np.zeros(size - len(octets), dtype=np.uint8)))
+        other = np.concatenate((other, np.zeros(size - len(other), dtype=np.uint8)))
+    union = int(np.unpackbits(octets | other).sum())
+    if not union:
+        return 0.0
+    return int(np.unpackbits(octets & other).sum()) / float(union)
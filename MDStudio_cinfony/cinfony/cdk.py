@@ -19,6 +19,14 @@ Global variables:
 """
 import sys
 import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cinfony.bitvector import unpackbits as _unpackbits
 
 if sys.platform[:4] == "java":
     import org.openscience.cdk as cdk
@@ -33,13 +41,9 @@ if sys.platform[:4] == "java":
     cdk.graph.Cycles.or_ = getattr(cdk.graph.Cycles, "or")
 else:
     from jpype import *
+    from cinfony import jvm
 
-    if not isJVMStarted():
-        _jvm = os.environ['JPYPE_JVM']
-        if _jvm[0] == '"': # Remove trailing quotes
-            _jvm = _jvm[1:-1]
-        _cp = os.environ['CLASSPATH']
-        startJVM(_jvm, "-Djava.class.path=" + _cp)
+    jvm.start()
 
     cdk = JPackage("org").openscience.cdk
     try:
@@ -113,6 +117,130 @@ def _intvalue(integer):
     return integer
 
 
+_fingerprintercache = threading.local()
+
+
+def _getfingerprinter(fp):
+    """Return the fingerprinter instance of the current thread for fp
+
+    CDK fingerprinters are not thread safe, one instance per fingerprint
+    type is created for every thread and reused.
+    """
+    fp = fp.lower()
+    if fp not in _fingerprinters:
+        raise ValueError("%s is not a recognised CDK Fingerprint type" % fp)
+    cache = _fingerprintercache.__dict__
+    if fp not in cache:
+        cache[fp] = _fingerprinters[fp]()
+    return cache[fp]
+
+
+def calcfp_many(molecules, fp="daylight"):
+    """Calculate the fingerprints of many molecules.
+
+    Required parameters:
+       molecules -- an iterable of Molecules
+
+    Optional parameters:
+       fp -- the fingerprint type (default is "daylight")
+
+    Returns a NumPy uint8 array with one row of packed fingerprint bytes
+    per molecule, in the layout of Fingerprint.to_numpy(packed=True).
+    """
+    molecules = list(molecules)
+    fingerprinter = _getfingerprinter(fp)
+    ans = np.zeros((len(molecules), -(-fingerprinter.getSize() // 8)), dtype=np.uint8)
+    for i, molecule in enumerate(molecules):
+        bitset = fingerprinter.getBitFingerprint(molecule.Molecule).asBitSet()
+        # BitSet.toByteArray uses the same little-endian bit order
+        data = np.array(bitset.toByteArray(), dtype=np.int8).view(np.uint8)
+        ans[i, :len(data)] = data
+    return ans
+
+
+def _arrayvalues(value):
+    """Unpack a CDK array descriptor result in a single call
+
+    The array results format their elements comma separated, which avoids
+    a length() and get() call across the Java bridge for every element.
+    An empty array formats as an empty string and gives no values.
+    """
+    values = []
+    for x in str(value.toString()).split(","):
+        x = x.strip()
+        if not x:
+            continue
+        try:
+            values.append(int(x))
+        except ValueError:
+            values.append(float(x))
+    return values
+
+
+def _desclayout(descnames):
+    """Return the descriptor instances and the column names of their values"""
+    layout = []
+    for descname in descnames:
+        try:
+            desc = _descdict[descname]
+        except KeyError:
+            raise ValueError("%s is not a recognised CDK descriptor type" % descname)
+        resulttype = desc.getDescriptorResultType()
+        if "Array" in str(resulttype.getClass().getName()):
+            names = [descname + ".%d" % i for i in range(resulttype.length())]
+        else:
+            names = [descname]
+        layout.append((desc, names))
+    return layout
+
+
+def calcdesc_many(molecules, descnames=[]):
+    """Calculate descriptor values for many molecules.
+
+    Required parameters:
+       molecules -- an iterable of Molecules
+
+    Optional parameter:
+       descnames -- a list of names of descriptors
+
+    The descriptor instances and the layout of their values are resolved
+    once for all molecules and every descriptor value is unpacked with a
+    single call across the Java bridge. Each descriptor is still
+    calculated with a separate Java call per molecule, so the number of
+    calls grows with the number of molecules times descriptors.
+
+    Returns a tuple of the value names and a matrix with one row of
+    values per molecule, as NumPy float array if NumPy is available.
+    Values that cannot be calculated are NaN.
+    """
+    if not descnames:
+        descnames = descs
+    layout = _desclayout(descnames)
+    names = [name for desc, columns in layout for name in columns]
+
+    rows = []
+    for molecule in molecules:
+        row = []
+        for desc, columns in layout:
+            try:
+                value = desc.calculate(molecule.Molecule).getValue()
+                if hasattr(value, "get"):
+                    values = _arrayvalues(value)
+                elif hasattr(value, "doubleValue"):
+                    values = [value.doubleValue()]
+                else:
+                    values = [_intvalue(value)]
+            except (CDKException, NullPointerException):
+                values = []
+            values = values[:len(columns)]
+            row.extend(values + [float("nan")] * (len(columns) - len(values)))
+        rows.append(row)
+
+    if np is not None:
+        rows = np.array(rows, dtype=float).reshape(len(rows), len(names))
+    return names, rows
+
+
 def readfile(format, filename):
     """Iterate over the molecules in a file.
 
@@ -415,11 +543,7 @@ class Molecule(object):
                      fps variable for a list of of available fingerprint
                      types.
         """
-        fp = fp.lower()
-        if fp in _fingerprinters:
-            fingerprinter = _fingerprinters[fp]()
-        else:
-            raise ValueError("%s is not a recognised CDK Fingerprint type" % fp)
+        fingerprinter = _getfingerprinter(fp)
         return Fingerprint(fingerprinter.getBitFingerprint(self.Molecule).asBitSet())
 
     def calcdesc(self, descnames=[]):
@@ -443,8 +567,8 @@ class Molecule(object):
             try:
                 value = desc.calculate(self.Molecule).getValue()
                 if hasattr(value, "get"): # Instead of array
-                    for i in range(value.length()):
-                        ans[descname + ".%d" % i] = value.get(i)
+                    for i, x in enumerate(_arrayvalues(value)):
+                        ans[descname + ".%d" % i] = x
                 elif hasattr(value, "doubleValue"):
                     ans[descname] = value.doubleValue()
                 else:
@@ -593,6 +717,38 @@ class Fingerprint(object):
     def __str__(self):
         return self.fp.toString()
 
+    def to_numpy(self, packed=False):
+        """Return the fingerprint as a NumPy uint8 array.
+
+        Optional parameters:
+           packed -- return the packed fingerprint bytes, least
+                     significant bit first, instead of one 0/1 value
+                     per bit (default is False)
+        """
+        # BitSet.toByteArray uses the same little-endian bit order
+        octets = np.zeros(self.fp.size() // 8, dtype=np.uint8)
+        data = np.array(self.fp.toByteArray(), dtype=np.int8).view(np.uint8)
+        octets[:len(data)] = data
+        if packed:
+            return octets
+        return _unpackbits(octets)
+
+    @classmethod
+    def from_numpy(cls, array, packed=False):
+        """Create a Fingerprint from a NumPy array as returned by to_numpy().
+
+        Optional parameters:
+           packed -- the array holds packed fingerprint bytes
+                     (default is False)
+        """
+        bitvector = np.asarray(array, dtype=np.uint8)
+        if packed:
+            bitvector = _unpackbits(bitvector)
+        fp = java.util.BitSet(len(bitvector))
+        for i in np.flatnonzero(bitvector).tolist():
+            fp.set(i)
+        return cls(fp)
+
 
 class Atom(object):
     """Represent a cdkjpype Atom.
@@ -21,6 +21,14 @@ import os
 import sys
 import tempfile
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cinfony.bitvector import (packbits as _packbits, tanimoto as _tanimoto, unpackbits as _unpackbits,
+                                 wordstobytes as _wordstobytes)
+
 if sys.platform[:3] == "cli":
     _indigonet = os.environ["INDIGONET"]
     import clr
@@ -227,7 +235,7 @@ class Molecule(object):
        Mol -- an Indigo Mol or any type of cinfony Molecule
 
     Attributes:
-       atoms, data, molwt, title
+       atoms, coordinates, data, molwt, title
 
     Methods:
        addh(), calcfp(), draw(), localopt(), removeh(),
@@ -253,6 +261,22 @@ class Molecule(object):
     def atoms(self):
         return [Atom(atom) for atom in self.Mol.iterateAtoms()]
 
+    def _getcoordinates(self):
+        # Indigo has no bulk coordinate access, use the native atom objects
+        if not self.Mol.hasCoord():
+            raise AttributeError("Molecule has no coordinates (0D structure)")
+        coords = [atom.xyz() for atom in self.Mol.iterateAtoms()]
+        return np.array(coords, dtype=np.float64).reshape(-1, 3)
+
+    def _setcoordinates(self, coordinates):
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        if len(coordinates) != self.Mol.countAtoms():
+            raise ValueError("Expected coordinates for %d atoms" % self.Mol.countAtoms())
+        for atom, xyz in zip(self.Mol.iterateAtoms(), coordinates.tolist()):
+            atom.setXYZ(*xyz)
+    coordinates = property(_getcoordinates, _setcoordinates,
+                           doc="Atom coordinates as (n_atoms, 3) NumPy array")
+
     @property
     def data(self):
         return MoleculeData(self.Mol)
@@ -510,7 +534,7 @@ class Smarts(object):
        smartspattern
 
     Methods:
-       findall(molecule)
+       findall(molecule), match(molecule)
 
     Example:
     >>> mol = readstring("smi","CCN(CC)CC") # triethylamine
@@ -545,6 +569,16 @@ class Smarts(object):
             ans.append(tuple(a))
         return ans
 
+    def match(self,molecule):
+        """Does the SMARTS pattern match a particular molecule?
+
+        Stops at the first match.
+
+        Required parameters:
+           molecule
+        """
+        return indigo.substructureMatcher(molecule.Mol).match(self.smarts) is not None
+
 class MoleculeData(object):
     """Store molecule data in a dictionary-type object
 
@@ -634,7 +668,7 @@ class Fingerprint(object):
        fingerprint -- a vector calculated by one of the fingerprint methods
 
     Attributes:
-       fp -- the underlying fingerprint object
+       fp -- the underlying fingerprint object (None if created by from_numpy())
        bits -- a list of bits set in the Fingerprint
 
     Methods:
@@ -644,21 +678,78 @@ class Fingerprint(object):
     """
     def __init__(self, fingerprint):
         self.fp = fingerprint
+        self._octets = None
 
     def __or__(self, other):
+        if self.fp is None or other.fp is None:
+            return _tanimoto(self.to_numpy(packed=True), other.to_numpy(packed=True))
         return indigo.similarity(self.fp, other.fp, "tanimoto")
 
     def _buffer_to_int(self):
-        stringrep = self.fp.toString()
-        return [int(stringrep[i:i+1]) for i in range(0, len(stringrep), 1)]
+        if self.fp is None:
+            return self._octets.tolist()
+        return list(_bufferbytes(self.fp.toBuffer()))
 
     @property
     def bits(self):
+        if np is not None:
+            return (np.flatnonzero(self.to_numpy()) + 1).tolist()
         return _findbits(self._buffer_to_int(), 8)
 
     def __str__(self):
         return str(self._buffer_to_int())
 
+    def to_numpy(self, packed=False):
+        """Return the fingerprint as a NumPy uint8 array.
+
+        Optional parameters:
+           packed -- return the packed fingerprint bytes, least
+                     significant bit first, instead of one 0/1 value
+                     per bit (default is False)
+
+        Element i of the unpacked array corresponds to bit i + 1 in
+        the bits attribute.
+        """
+        if self.fp is None:
+            octets = self._octets.copy()
+        else:
+            octets = np.frombuffer(_bufferbytes(self.fp.toBuffer()), dtype=np.uint8)
+        if packed:
+            return octets
+        return _unpackbits(octets)
+
+    @classmethod
+    def from_numpy(cls, array, packed=False):
+        """Create a Fingerprint from a NumPy array as returned by to_numpy().
+
+        Indigo cannot load a fingerprint, so the Fingerprint is backed by
+        the bit vector: its fp attribute is None and the "|" operator
+        compares the bit vectors.
+
+        Optional parameters:
+           packed -- the array holds packed fingerprint bytes
+                     (default is False)
+        """
+        fingerprint = cls(None)
+        if packed:
+            fingerprint._octets = np.array(array, dtype=np.uint8).ravel()
+        else:
+            fingerprint._octets = _packbits(array)
+        return fingerprint
+
+
+def _bufferbytes(buf):
+    """Return the result of IndigoObject.toBuffer() as bytearray.
+
+    Depending on the Indigo and Python version toBuffer returns bytes or
+    a list of signed byte values. Fingerprint bytes hold bit i of the
+    fingerprint in byte i // 8 at position i % 8, least significant bit
+    first.
+    """
+    if isinstance(buf, (bytes, bytearray)):
+        return bytearray(buf)
+    return bytearray(x & 0xff for x in buf)
+
 
 def _toint(string):
     """
@@ -679,6 +770,9 @@ def _findbits(fp, bitsperint):
     >>> _findbits([13, 71], 8)
     [1, 3, 4, 9, 10, 11, 15]
     """
+    if np is not None and bitsperint % 8 == 0:
+        bitvector = _unpackbits(_wordstobytes(fp, bitsperint))
+        return (np.flatnonzero(bitvector) + 1).tolist()
     ans = []
     start = 1
     for x in fp:
@@ -692,6 +786,34 @@ def _findbits(fp, bitsperint):
     return ans
 
 
+def calcfp_many(molecules, fptype="sim"):
+    """Calculate the fingerprints of many molecules.
+
+    Required parameters:
+       molecules -- an iterable of Molecules
+
+    Optional parameters:
+       fptype -- the fingerprint type (default is "sim")
+
+    Returns a NumPy uint8 array with one row of packed fingerprint bytes
+    per molecule, in the layout of Fingerprint.to_numpy(packed=True).
+    """
+    molecules = list(molecules)
+    fptype = fptype.lower()
+    if fptype not in ["sim", "sub", "sub-res", "sub-tau", "full"]:
+        raise ValueError("%s is not a recognised Indigo Fingerprint type" % fptype)
+
+    ans = None
+    for i, molecule in enumerate(molecules):
+        octets = Fingerprint(molecule.Mol.fingerprint(fptype)).to_numpy(packed=True)
+        if ans is None:
+            ans = np.zeros((len(molecules), len(octets)), dtype=np.uint8)
+        ans[i] = octets
+    if ans is None:
+        ans = np.zeros((0, 0), dtype=np.uint8)
+    return ans
+
+
 def _compressbits(bitvector, wordsize=32):
     """Compress binary vector into vector of long ints.
 
@@ -700,6 +822,10 @@ def _compressbits(bitvector, wordsize=32):
     >>> _compressbits([0, 1, 0, 0, 0, 1], 2)
     [2, 0, 2]
     """
+    if np is not None and wordsize in (8, 16, 32, 64):
+        words = _packbits(bitvector)
+        words = np.concatenate((words, np.zeros(-len(words) % (wordsize // 8), dtype=np.uint8)))
+        return words.view("<u%d" % (wordsize // 8)).tolist()
     ans = []
     for start in range(0, len(bitvector), wordsize):
         compressed = 0
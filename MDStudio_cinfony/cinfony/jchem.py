@@ -22,6 +22,14 @@ import sys
 import os
 from glob import glob
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cinfony.bitvector import (packbits as _packbits, tanimoto as _tanimoto, unpackbits as _unpackbits,
+                                 wordstobytes as _wordstobytes)
+
 if sys.platform[:4] == "java":
     classpath = []
     if 'JCHEMDIR' in os.environ:
@@ -40,13 +48,12 @@ if sys.platform[:4] == "java" or sys.platform[:3] == "cli":
     MolFormatException = chemaxon.formats.MolFormatException
 else:
     from jpype import *
+    from cinfony import jvm
 
-    if not isJVMStarted():
-        _jvm = os.environ['JPYPE_JVM']
-        if _jvm[0] == '"': # Remove trailing quotes
-            _jvm = _jvm[1:-1]
-        _cp = os.pathsep.join(os.environ.get('CLASSPATH', '').split(os.pathsep))
-        startJVM(_jvm, "-Djava.class.path=" + _cp)
+    _jars = []
+    if 'JCHEMDIR' in os.environ:
+        _jars = glob(os.path.join(os.environ['JCHEMDIR'], 'lib', '*.jar'))
+    jvm.start(_jars)
 
     chemaxon = JPackage("chemaxon")
     MolHandler = chemaxon.util.MolHandler
@@ -472,7 +479,7 @@ class Fingerprint(object):
        fingerprint -- a vector calculated by one of the fingerprint methods
 
     Attributes:
-       fp -- the underlying fingerprint object
+       fp -- the underlying fingerprint object (None if created by from_numpy())
        bits -- a list of bits set in the Fingerprint
 
     Methods:
@@ -482,12 +489,17 @@ class Fingerprint(object):
     """
     def __init__(self, fingerprint):
         self.fp = fingerprint
+        self._octets = None
 
     def __or__(self, other):
+        if self.fp is None or other.fp is None:
+            return _tanimoto(self.to_numpy(packed=True), other.to_numpy(packed=True))
         return 1 - self.fp.getTanimoto(other.fp)
 
     def __getattr__(self, attr):
-        if attr == "bits":
+        if attr == "bits" and self.fp is None:
+            return np.flatnonzero(self.to_numpy()).tolist()
+        elif attr == "bits":
             # Create a bits attribute on-the-fly
             bs = self.fp.toBitSet()
             bits = [-1]
@@ -500,8 +512,47 @@ class Fingerprint(object):
         else:
             raise AttributeError("Fingerprint has no attribute %s" % attr)
     def __str__(self):
+        if self.fp is None:
+            words = np.zeros(-(-len(self._octets) // 4) * 4, dtype=np.uint8)
+            words[:len(self._octets)] = self._octets
+            return ", ".join([str(x) for x in words.view("<i4")])
         return ", ".join([str(x) for x in self.fp.toIntArray()])
 
+    def to_numpy(self, packed=False):
+        """Return the fingerprint as a NumPy uint8 array.
+
+        Optional parameters:
+           packed -- return the packed fingerprint bytes, least
+                     significant bit first, instead of one 0/1 value
+                     per bit (default is False)
+        """
+        if self.fp is None:
+            octets = self._octets.copy()
+        else:
+            octets = _wordstobytes([x & 0xFFFFFFFF for x in self.fp.toIntArray()], 32)
+        if packed:
+            return octets
+        return _unpackbits(octets)
+
+    @classmethod
+    def from_numpy(cls, array, packed=False):
+        """Create a Fingerprint from a NumPy array as returned by to_numpy().
+
+        ECFP fingerprints can only be calculated from a molecule, so the
+        Fingerprint is backed by the bit vector: its fp attribute is None
+        and the "|" operator compares the bit vectors.
+
+        Optional parameters:
+           packed -- the array holds packed fingerprint bytes
+                     (default is False)
+        """
+        fingerprint = cls(None)
+        if packed:
+            fingerprint._octets = np.array(array, dtype=np.uint8).ravel()
+        else:
+            fingerprint._octets = _packbits(array)
+        return fingerprint
+
 class Atom(object):
     """Represent an Atom.
 
@@ -0,0 +1,167 @@
+#-*. coding: utf-8 -*-
+##  This file is part of Cinfony.
+##  The contents are covered by the terms of the BSD license
+##  which is included in the file LICENSE_BSD.txt.
+
+"""
+jvm - Shared Java Virtual Machine lifecycle for the JPype based modules
+
+The cdk, opsin and jchem modules share a single JVM per process. It can
+only be started once, so its classpath and options must cover all Java
+toolkits. Call configure() before importing any of these modules to set
+the classpath, heap size and garbage collector; the first module imported
+starts the JVM with the combined classpath of the configuration, the
+CLASSPATH environment variable and the jars of every module.
+
+Global variables:
+  startup_time - seconds it took to start the JVM, None if not started
+                 by this module
+"""
+
+import os
+import sys
+import time
+import warnings
+import threading
+
+_config = {'path': None, 'classpath': [], 'max_heap': None, 'initial_heap': None,
+           'gc': None, 'options': []}
+_lock = threading.Lock()
+_started = {'classpath': None}
+
+startup_time = None
+"""Seconds it took to start the JVM"""
+
+
+def _isjython():
+    return sys.platform[:4] == "java"
+
+
+def configure(**kwargs):
+    """Configure the JVM before it is started.
+
+    Optional parameters:
+       path -- path to the JVM shared library (default is the JPYPE_JVM
+               environment variable or the JPype default JVM)
+       classpath -- a list of jar files and directories, prepended to the
+                    CLASSPATH environment variable
+       max_heap -- maximum heap size, e.g. "4g" (-Xmx)
+       initial_heap -- initial heap size, e.g. "512m" (-Xms)
+       gc -- garbage collector name, e.g. "G1" or "Parallel"
+             (-XX:+Use<gc>GC)
+       options -- a list of additional JVM options
+
+    Raises ValueError for unknown settings and RuntimeError if the JVM
+    was already started.
+    """
+    unknown = set(kwargs).difference(_config)
+    if unknown:
+        raise ValueError("Unknown JVM settings: %s" % ", ".join(sorted(unknown)))
+    if isstarted():
+        raise RuntimeError("The JVM is already started and cannot be reconfigured")
+
+    for key, value in kwargs.items():
+        if key in ('classpath', 'options'):
+            value = list(value or [])
+        _config[key] = value
+    return dict(_config)
+
+
+def jvmpath():
+    """Return the path to the JVM shared library."""
+    path = _config['path'] or os.environ.get('JPYPE_JVM')
+    if path:
+        return path.strip('"')
+    import jpype
+    return jpype.getDefaultJVMPath()
+
+
+def classpath(extra=None):
+    """Return the combined classpath entries without duplicates.
+
+    Optional parameters:
+       extra -- a list of additional classpath entries
+    """
+    entries = list(_config['classpath'])
+    entries.extend(os.environ.get('CLASSPATH', '').split(os.pathsep))
+    entries.extend(extra or [])
+
+    combined = []
+    for entry in entries:
+        if entry and entry not in combined:
+            combined.append(entry)
+    return combined
+
+
+def jvmoptions(extra=None):
+    """Return the JVM startup options.
+
+    Optional parameters:
+       extra -- a list of additional classpath entries
+    """
+    options = ["-Djava.class.path=%s" % os.pathsep.join(classpath(extra))]
+    if _config['initial_heap']:
+        options.append("-Xms%s" % _config['initial_heap'])
+    if _config['max_heap']:
+        options.append("-Xmx%s" % _config['max_heap'])
+    if _config['gc']:
+        options.append("-XX:+Use%sGC" % _config['gc'])
+    options.extend(_config['options'])
+    return options
+
+
+def isstarted():
+    """Return True if the JVM is running."""
+    if _isjython():
+        return True
+    try:
+        import jpype
+    except ImportError:
+        return False
+    return jpype.isJVMStarted()
+
+
+def start(extra=None):
+    """Start the JVM unless it is running.
+
+    Optional parameters:
+       extra -- a list of classpath entries required by the calling module
+
+    Under Jython the JVM is always running and this is a no-op.
+    """
+    global startup_time
+    if _isjython():
+        return
+
+    import jpype
+    with _lock:
+        if jpype.isJVMStarted():
+            missing = [entry for entry in extra or [] if entry not in (_started['classpath'] or [entry])]
+            if missing:
+                warnings.warn("Not on the classpath of the running JVM: %s. Add them to the JVM "
+                              "classpath configuration." % os.pathsep.join(missing))
+            return
+        start_time = time.time()
+        jpype.startJVM(jvmpath(), *jvmoptions(extra))
+        startup_time = time.time() - start_time
+        _started['classpath'] = classpath(extra)
+
+
+def attach_thread():
+    """Attach the calling thread to the JVM.
+
+    Threads other than the one that started the JVM must be attached
+    before calling Java code.
+    """
+    if _isjython():
+        return
+
+    import jpype
+    if jpype.isJVMStarted() and not jpype.isThreadAttachedToJVM():
+        jpype.attachThreadToJVM()
+
+
+def info():
+    """Return the JVM state, startup time and options."""
+    return {'started': isstarted(), 'startup_time': startup_time,
+            'options': jvmoptions() if not _isjython() else []}
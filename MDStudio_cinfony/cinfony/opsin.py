@@ -16,17 +16,15 @@ Global variables:
 
 import os
 import sys
+from multiprocessing.pool import ThreadPool
+
+from cinfony import jvm
 
 if sys.platform[:4] == "java": # Jython
     import uk.ac.cam.ch.wwmm.opsin as opsin
 else: # CPython
     import jpype
-    if not jpype.isJVMStarted():
-        _jvm = os.environ['JPYPE_JVM']
-        if _jvm[0] == '"': # Handle trailing quotes
-            _jvm = _jvm[1:-1]
-        _cp = os.environ['CLASSPATH']
-        jpype.startJVM(_jvm, "-Djava.class.path=" + _cp)
+    jvm.start()
     opsin = jpype.JPackage("uk").ac.cam.ch.wwmm.opsin
     
 try:
@@ -64,7 +62,67 @@ def readstring(format, string):
 
     return Molecule(result)
 
-    
+
+def _convertname(name, formats):
+    """Convert a single name, return the output strings and an error message."""
+    result = _nametostruct.parseChemicalName(name)
+    if str(result.getStatus()) == "FAILURE":
+        return None, str(result.getMessage())
+    try:
+        mol = Molecule(result)
+        return [mol.write(format) for format in formats], None
+    except Exception as ex:
+        return None, str(ex)
+
+
+def convert_many(names, formats=("smi",), threads=4):
+    """Convert many IUPAC names in a pool of threads attached to the JVM.
+
+    Required parameters:
+       names -- a list of IUPAC names
+
+    Optional parameters:
+       formats -- the output formats, see the outformats variable
+                  (default is ("smi",))
+       threads -- number of worker threads (default is 4)
+
+    The OPSIN NameToStructure instance is thread safe and the JVM runs the
+    parsing without holding the Python interpreter lock, so the names are
+    converted concurrently.
+
+    Returns a tuple of a dictionary with a list of output strings per
+    output format and a list of error messages. Names that fail to convert
+    have None as output and an error message, the error of converted names
+    is None.
+
+    Example:
+    >>> results, errors = convert_many(["propane", "butane"], ["smi", "inchi"])
+    """
+    for format in formats:
+        if format not in outformats:
+            raise ValueError("%s is not a recognised OPSIN format" % format)
+
+    names = list(names)
+    if threads > 1 and len(names) > 1:
+        pool = ThreadPool(min(threads, len(names)), initializer=jvm.attach_thread)
+        try:
+            converted = pool.map(lambda name: _convertname(name, formats), names,
+                                 chunksize=max(1, len(names) // (threads * 4)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        converted = [_convertname(name, formats) for name in names]
+
+    results = dict((format, []) for format in formats)
+    errors = []
+    for output, error in converted:
+        for i, format in enumerate(formats):
+            results[format].append(output[i] if output else None)
+        errors.append(error)
+    return results, errors
+
+
 class Molecule(object):
     """Represent a opsinjpype Molecule.
 
@@ -22,6 +22,14 @@ import sys
 import math
 import os.path
 import tempfile
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cinfony.bitvector import packbits as _packbits, unpackbits as _unpackbits, wordstobytes as _wordstobytes
 
 if sys.platform[:4] == "java":
     import org.openbabel as ob
@@ -49,6 +57,7 @@ elif sys.platform[:3] == "cli":
     _obfuncs = ob.openbabel_csharp
     _obconsts = ob.openbabel_csharp
 else:
+    import ctypes
     import openbabel as ob
     _obfuncs = _obconsts = ob
     try:
@@ -266,8 +275,8 @@ class Molecule(object):
        OBMol -- an Open Babel OBMol or any type of cinfony Molecule
 
     Attributes:
-       atoms, charge, conformers, data, dim, energy, exactmass, formula,
-       molwt, spin, sssr, title, unitcell.
+       atoms, charge, conformers, coordinates, data, dim, energy, exactmass,
+       formula, molwt, spin, sssr, title, unitcell.
     (refer to the Open Babel library documentation for more info).
 
     Methods:
@@ -295,6 +304,25 @@ class Molecule(object):
     def atoms(self):
         return [ Atom(self.OBMol.GetAtom(i+1)) for i in range(self.OBMol.NumAtoms()) ]
 
+    def _getcoordinates(self):
+        natoms = self.OBMol.NumAtoms()
+        if natoms == 0:
+            return np.zeros((0, 3))
+        # Copy the coordinate buffer at once instead of one SWIG call per value
+        coords = np.empty((natoms, 3), dtype=np.float64)
+        ctypes.memmove(coords.ctypes.data, int(self.OBMol.GetCoordinates()), coords.nbytes)
+        return coords
+
+    def _setcoordinates(self, coordinates):
+        coordinates = np.ascontiguousarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        if len(coordinates) != self.OBMol.NumAtoms():
+            raise ValueError("Expected coordinates for %d atoms" % self.OBMol.NumAtoms())
+        coords = ob.doubleArray(coordinates.size)
+        ctypes.memmove(int(coords.cast()), coordinates.ctypes.data, coordinates.nbytes)
+        self.OBMol.SetCoordinates(coords)
+    coordinates = property(_getcoordinates, _setcoordinates,
+                           doc="Atom coordinates as (n_atoms, 3) NumPy array")
+
     @property
     def charge(self):
         return self.OBMol.GetTotalCharge()
@@ -401,16 +429,8 @@ class Molecule(object):
                      fps variable for a list of of available fingerprint
                      types.
         """
-        if sys.platform[:3] == "cli":
-            fp = ob.VectorUInt()
-        else:
-            fp = ob.vectorUnsignedInt()
-        fptype = fptype.lower()
-        try:
-            fingerprinter = _fingerprinters[fptype]
-        except KeyError:
-            raise ValueError("%s is not a recognised Open Babel Fingerprint type" % fptype)
-        fingerprinter.GetFingerprint(self.OBMol, fp)
+        fp = _newfpvector()
+        _getfingerprinter(fptype).GetFingerprint(self.OBMol, fp)
         return Fingerprint(fp)
 
     def write(self, format="smi", filename=None, overwrite=False, opt=None):
@@ -704,10 +724,13 @@ def _findbits(fp, bitsperint):
     >>> _findbits([13, 71], 8)
     [1, 3, 4, 9, 10, 11, 15]
     """
-    ans = []
-    start = 1
     if sys.platform[:4] == "java":
         fp = [fp.get(i) for i in range(fp.size())]
+    if np is not None and bitsperint % 8 == 0:
+        bitvector = _unpackbits(_wordstobytes(fp, bitsperint))
+        return (np.flatnonzero(bitvector) + 1).tolist()
+    ans = []
+    start = 1
     for x in fp:
         i = start
         while x > 0:
@@ -719,6 +742,58 @@ def _findbits(fp, bitsperint):
     return ans
 
 
+_fpbuffers = threading.local()
+
+
+def _newfpvector():
+    """Return a new fingerprint word vector."""
+    if sys.platform[:3] == "cli":
+        return ob.VectorUInt()
+    return ob.vectorUnsignedInt()
+
+
+def _getfingerprinter(fptype):
+    """Return the Open Babel fingerprinter plugin for fptype."""
+    try:
+        return _fingerprinters[fptype.lower()]
+    except KeyError:
+        raise ValueError("%s is not a recognised Open Babel Fingerprint type" % fptype)
+
+
+def calcfp_many(molecules, fptype="FP2"):
+    """Calculate the fingerprints of many molecules.
+
+    Required parameters:
+       molecules -- an iterable of Molecules
+
+    Optional parameters:
+       fptype -- the fingerprint type (default is "FP2")
+
+    The fingerprinter is looked up once and a single word vector per
+    thread is reused for all molecules.
+
+    Returns a NumPy uint8 array with one row of packed fingerprint bytes
+    per molecule, in the layout of Fingerprint.to_numpy(packed=True).
+    """
+    molecules = list(molecules)
+    fingerprinter = _getfingerprinter(fptype)
+    bitsperint = ob.OBFingerprint.Getbitsperint()
+    if not hasattr(_fpbuffers, "fp"):
+        _fpbuffers.fp = _newfpvector()
+    fp = _fpbuffers.fp
+
+    ans = None
+    for i, molecule in enumerate(molecules):
+        fp.clear()
+        fingerprinter.GetFingerprint(molecule.OBMol, fp)
+        if ans is None:
+            ans = np.zeros((len(molecules), len(fp) * bitsperint // 8), dtype=np.uint8)
+        ans[i] = _wordstobytes(fp, bitsperint)
+    if ans is None:
+        ans = np.zeros((0, 0), dtype=np.uint8)
+    return ans
+
+
 class Fingerprint(object):
     """A Molecular Fingerprint.
 
@@ -750,6 +825,45 @@ class Fingerprint(object):
             fp = [self.fp.get(i) for i in range(self.fp.size())]
         return ", ".join([str(x) for x in fp])
 
+    def to_numpy(self, packed=False):
+        """Return the fingerprint as a NumPy uint8 array.
+
+        Optional parameters:
+           packed -- return the packed fingerprint bytes, least
+                     significant bit first, instead of one 0/1 value
+                     per bit (default is False)
+
+        Element i of the unpacked array corresponds to bit i + 1 in
+        the bits attribute.
+        """
+        fp = self.fp
+        if sys.platform[:4] == "java":
+            fp = [self.fp.get(i) for i in range(self.fp.size())]
+        octets = _wordstobytes(fp, ob.OBFingerprint.Getbitsperint())
+        if packed:
+            return octets
+        return _unpackbits(octets)
+
+    @classmethod
+    def from_numpy(cls, array, packed=False):
+        """Create a Fingerprint from a NumPy array as returned by to_numpy().
+
+        Optional parameters:
+           packed -- the array holds packed fingerprint bytes
+                     (default is False)
+        """
+        octets = np.asarray(array, dtype=np.uint8) if packed else _packbits(array)
+        wordsize = ob.OBFingerprint.Getbitsperint() // 8
+        octets = np.concatenate((octets, np.zeros(-len(octets) % wordsize, dtype=np.uint8)))
+        words = octets.view("<u%d" % wordsize).tolist()
+        if sys.platform[:3] == "cli":
+            fp = ob.VectorUInt()
+            for word in words:
+                fp.Add(word)
+        else:
+            fp = ob.vectorUnsignedInt(words)
+        return cls(fp)
+
 
 class Smarts(object):
     """A Smarts Pattern Matcher
@@ -758,7 +872,7 @@ class Smarts(object):
        smartspattern
 
     Methods:
-       findall(molecule)
+       findall(molecule), match(molecule)
 
     Example:
     >>> mol = readstring("smi","CCN(CC)CC") # triethylamine
@@ -789,6 +903,16 @@ class Smarts(object):
             vector = [vector.get(i) for i in range(vector.size())]
         return list(vector)
 
+    def match(self,molecule):
+        """Does the SMARTS pattern match a particular molecule?
+
+        Stops at the first match.
+
+        Required parameters:
+           molecule
+        """
+        return bool(self.obsmarts.Match(molecule.OBMol, True))
+
 
 class MoleculeData(object):
     """Store molecule data in a dictionary-type object
@@ -20,6 +20,13 @@ Global variables:
 
 import os
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cinfony.bitvector import packbits as _packbits, unpackbits as _unpackbits
+
 from rdkit import Chem
 from rdkit.Chem import AllChem, Draw
 from rdkit.Chem import Descriptors
@@ -27,6 +34,7 @@ from rdkit.Chem import Descriptors
 _descDict = dict(Descriptors.descList)
 
 import rdkit.DataStructs
+import rdkit.Geometry
 import rdkit.Chem.MACCSkeys
 import rdkit.Chem.AtomPairs.Pairs
 import rdkit.Chem.AtomPairs.Torsions
@@ -47,7 +55,7 @@ except ImportError:
     aggdraw = None
 
 # A list of supported fingerprint types
-fps = ['rdkit', 'layered', 'maccs', 'atompairs', 'torsions', 'morgan']
+fps = ['rdkit', 'layered', 'maccs', 'atompairs', 'torsions', 'morgan', 'pattern']
 
 # A list of supported descriptors
 descs = _descDict.keys()
@@ -227,7 +235,7 @@ class Molecule(object):
        Mol -- an RDKit Mol or any type of cinfony Molecule
 
     Attributes:
-       atoms, data, formula, molwt, title
+       atoms, coordinates, data, formula, molwt, title
 
     Methods:
        addh(), calcfp(), calcdesc(), draw(), localopt(), make3D(), removeh(),
@@ -253,6 +261,28 @@ class Molecule(object):
     def atoms(self):
         return [Atom(rdkatom) for rdkatom in self.Mol.GetAtoms()]
 
+    def _getcoordinates(self):
+        if self.Mol.GetNumConformers() == 0:
+            raise AttributeError("Molecule has no coordinates (0D structure)")
+        return self.Mol.GetConformer().GetPositions()
+
+    def _setcoordinates(self, coordinates):
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        natoms = self.Mol.GetNumAtoms()
+        if len(coordinates) != natoms:
+            raise ValueError("Expected coordinates for %d atoms" % natoms)
+        if self.Mol.GetNumConformers() == 0:
+            self.Mol.AddConformer(Chem.Conformer(natoms), assignId=True)
+        conformer = self.Mol.GetConformer()
+        if hasattr(conformer, "SetPositions"):
+            conformer.SetPositions(coordinates)
+        else:
+            for i, xyz in enumerate(coordinates.tolist()):
+                conformer.SetAtomPosition(i, rdkit.Geometry.Point3D(*xyz))
+        conformer.Set3D(bool(coordinates[:, 2].any()))
+    coordinates = property(_getcoordinates, _setcoordinates,
+                           doc="Atom coordinates as (n_atoms, 3) NumPy array")
+
     @property
     def data(self):
         return MoleculeData(self.Mol)
@@ -381,6 +411,8 @@ class Molecule(object):
             fp = Fingerprint(Chem.LayeredFingerprint(self.Mol))
         elif fptype=="maccs":
             fp = Fingerprint(Chem.MACCSkeys.GenMACCSKeys(self.Mol))
+        elif fptype=="pattern":
+            fp = Fingerprint(Chem.PatternFingerprint(self.Mol))
         elif fptype=="atompairs":
             # Going to leave as-is. See Atom Pairs documentation.
             fp = Chem.AtomPairs.Pairs.GetAtomPairFingerprintAsIntVect(self.Mol)
@@ -523,7 +555,7 @@ class Smarts(object):
        smartspattern
 
     Methods:
-       findall(molecule)
+       findall(molecule), match(molecule), calcfp()
 
     Example:
     >>> mol = readstring("smi","CCN(CC)CC") # triethylamine
@@ -549,6 +581,25 @@ class Smarts(object):
         """
         return molecule.Mol.GetSubstructMatches(self.rdksmarts)
 
+    def match(self,molecule):
+        """Does the SMARTS pattern match a particular molecule?
+
+        Stops at the first match.
+
+        Required parameters:
+           molecule
+        """
+        return molecule.Mol.HasSubstructMatch(self.rdksmarts)
+
+    def calcfp(self):
+        """Calculate the pattern fingerprint of the SMARTS query.
+
+        The bits set in the query fingerprint are a subset of the bits of
+        the "pattern" fingerprint of every molecule the query matches, so
+        molecules missing any of them can be skipped without matching.
+        """
+        return Fingerprint(Chem.PatternFingerprint(self.rdksmarts))
+
 
 class MoleculeData(object):
     """Store molecule data in a dictionary-type object
@@ -660,8 +711,106 @@ class Fingerprint(object):
             raise AttributeError("Fingerprint has no attribute %s" % attr)
 
     def __str__(self):
+        if np is not None:
+            return ", ".join([str(x) for x in _compressbits(self.to_numpy())])
         return ", ".join([str(x) for x in _compressbits(self.fp)])
 
+    def to_numpy(self, packed=False):
+        """Return the fingerprint as a NumPy uint8 array.
+
+        Optional parameters:
+           packed -- return the packed fingerprint bytes, least
+                     significant bit first, instead of one 0/1 value
+                     per bit (default is False)
+        """
+        bitvector = np.zeros((0,), dtype=np.uint8)
+        rdkit.DataStructs.ConvertToNumpyArray(self.fp, bitvector)
+        if packed:
+            return _packbits(bitvector)
+        return bitvector
+
+    @classmethod
+    def from_numpy(cls, array, nbits=None, packed=False):
+        """Create a Fingerprint from a NumPy array as returned by to_numpy().
+
+        Optional parameters:
+           nbits -- the fingerprint length, required for packed arrays
+                    if not a multiple of 8 (default is the array length)
+           packed -- the array holds packed fingerprint bytes
+                     (default is False)
+        """
+        bitvector = _unpackbits(array) if packed else np.asarray(array)
+        fp = rdkit.DataStructs.ExplicitBitVect(nbits or len(bitvector))
+        fp.SetBitsFromList(np.flatnonzero(bitvector).tolist())
+        return cls(fp)
+
+
+_bitfingerprinters = {"rdkit": Chem.RDKFingerprint,
+                      "layered": Chem.LayeredFingerprint,
+                      "maccs": Chem.MACCSkeys.GenMACCSKeys,
+                      "pattern": Chem.PatternFingerprint}
+
+
+def calcfp_many(molecules, fptype="rdkit", opt=None):
+    """Calculate the fingerprints of many molecules.
+
+    Required parameters:
+       molecules -- an iterable of Molecules
+
+    Optional parameters:
+       fptype -- the fingerprint type (default is "rdkit"). See the
+                 fps variable for a list of of available fingerprint
+                 types.
+       opt -- a dictionary of options for fingerprints. Currently only used
+              for radius in Morgan fingerprints and for nbits, the number
+              of bits to fold atompairs and torsions into (default 2048).
+
+    The fingerprint function is resolved once and the bits of every
+    fingerprint are converted in a single reused NumPy buffer. The
+    atompairs and torsions types have no bit vector fingerprinter: they
+    fall back to calcfp() per molecule and the nonzero elements of the
+    count vector are folded into nbits bits.
+
+    Returns a NumPy uint8 array with one row of packed fingerprint bytes
+    per molecule, in the layout of Fingerprint.to_numpy(packed=True).
+    """
+    if opt == None:
+        opt = {}
+    molecules = list(molecules)
+    fptype = fptype.lower()
+    if fptype == "morgan":
+        radius = opt.get('radius', 4)
+        fingerprinter = lambda mol: Chem.rdMolDescriptors.GetMorganFingerprintAsBitVect(mol, radius)
+    elif fptype in _bitfingerprinters:
+        fingerprinter = _bitfingerprinters[fptype]
+    elif fptype in fps:
+        nbits = opt.get('nbits', 2048)
+        ans = np.zeros((len(molecules), -(-nbits // 8)), dtype=np.uint8)
+        for i, molecule in enumerate(molecules):
+            ans[i] = _packbits(_foldbits(molecule.calcfp(fptype, opt), nbits))
+        return ans
+    else:
+        raise ValueError("%s is not a recognised RDKit Fingerprint type" % fptype)
+
+    ans = None
+    bitvector = np.zeros((0,), dtype=np.uint8)
+    for i, molecule in enumerate(molecules):
+        rdkit.DataStructs.ConvertToNumpyArray(fingerprinter(molecule.Mol), bitvector)
+        if ans is None:
+            ans = np.zeros((len(molecules), -(-len(bitvector) // 8)), dtype=np.uint8)
+        ans[i] = _packbits(bitvector)
+    if ans is None:
+        ans = np.zeros((0, 0), dtype=np.uint8)
+    return ans
+
+
+def _foldbits(fp, nbits):
+    """Fold the nonzero elements of a sparse count vector into nbits bits."""
+    bitvector = np.zeros(nbits, dtype=np.uint8)
+    indices = np.fromiter(fp.GetNonzeroElements(), dtype=np.int64)
+    bitvector[indices % nbits] = 1
+    return bitvector
+
 
 def _compressbits(bitvector, wordsize=32):
     """Compress binary vector into vector of long ints.
@@ -671,6 +820,10 @@ def _compressbits(bitvector, wordsize=32):
     >>> _compressbits([0, 1, 0, 0, 0, 1], 2)
     [2, 0, 2]
     """
+    if np is not None and wordsize in (8, 16, 32, 64):
+        words = _packbits(bitvector)
+        words = np.concatenate((words, np.zeros(-len(words) % (wordsize // 8), dtype=np.uint8)))
+        return words.view("<u%d" % (wordsize // 8)).tolist()
     ans = []
     for start in range(0, len(bitvector), wordsize):
         compressed = 0
@@ -19,6 +19,13 @@ import os
 
 from time import sleep
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cinfony.bitvector import packbits as _packbits, unpackbits as _unpackbits
+
 # .NET classes
 import clr
 from System.Net import WebClient
@@ -349,6 +356,35 @@ class Fingerprint(object):
     def __str__(self):
         return self.fp
 
+    def to_numpy(self, packed=False):
+        """Return the fingerprint as a NumPy uint8 array.
+
+        Optional parameters:
+           packed -- return the packed fingerprint bytes, least
+                     significant bit first, instead of one 0/1 value
+                     per bit (default is False)
+        """
+        bitvector = np.frombuffer(self.fp.encode("ascii"), dtype=np.uint8) - ord("0")
+        if packed:
+            return _packbits(bitvector)
+        return bitvector
+
+    @classmethod
+    def from_numpy(cls, array, nbits=None, packed=False):
+        """Create a Fingerprint from a NumPy array as returned by to_numpy().
+
+        Optional parameters:
+           nbits -- the fingerprint length, required for packed arrays
+                    if not a multiple of 8 (default is the array length)
+           packed -- the array holds packed fingerprint bytes
+                     (default is False)
+        """
+        bitvector = np.asarray(array, dtype=np.uint8)
+        if packed:
+            bitvector = _unpackbits(bitvector)
+        bitvector = (bitvector[:nbits] != 0).astype(np.uint8) + ord("0")
+        return cls(bitvector.tobytes().decode("ascii"))
+
 
 class Smarts(object):
     """A Smarts Pattern Matcher
@@ -19,15 +19,37 @@ Global variables:
 import re
 import os
 import sys
+import socket
+import hashlib
+import tempfile
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cinfony.bitvector import packbits as _packbits, unpackbits as _unpackbits
 
 if sys.version_info.major == 2:
     from cStringIO import StringIO
-    import urllib2
-    from urllib2 import URLError
+    from urllib2 import URLError, HTTPError
+    from urlparse import urljoin, urlsplit
+    import httplib
+    import Queue as queue
 else:
     from io import StringIO
-    import urllib.request as urllib2
-    from urllib.error import URLError
+    from urllib.error import URLError, HTTPError
+    from urllib.parse import urljoin, urlsplit
+    import http.client as httplib
+    import queue
+
+try:
+    from multiprocessing.pool import ThreadPool
+except ImportError:
+    ThreadPool = None
+
+_rename = getattr(os, "replace", os.rename)
 
 try:
     import Tkinter as tk
@@ -57,6 +79,23 @@ outformats = {"smi": "SMILES", "cdxml": "ChemDraw XML", "inchi": "InChI",
 fps = ["std", "maccs", "estate"]
 """A list of supported fingerprint types"""
 
+baseurls = {"rajweb": os.environ.get("WEBEL_RAJWEB_URL", "http://ws1.bmc.uu.se:8182/cdk"),
+            "nci": os.environ.get("WEBEL_NCI_URL", "http://cactus.nci.nih.gov/chemical/structure")}
+"""The base URLs of the web services, see configure()"""
+
+cachedir = os.environ.get("WEBEL_CACHE_DIR",
+                          os.path.join(tempfile.gettempdir(), "cinfony_webel_cache"))
+"""Directory of the on-disk response cache. None or "" disables the cache"""
+
+cachesize = int(os.environ.get("WEBEL_CACHE_SIZE", 256 * 1024 ** 2))
+"""Maximum size of the on-disk response cache in bytes"""
+
+maxworkers = 8
+"""Maximum number of concurrent requests (and pooled connections per host)"""
+
+timeout = 60
+"""Socket timeout in seconds"""
+
 
 # The following function is taken from urllib.py in the IronPython dist
 def _quo(text, safe="/"):
@@ -78,17 +117,253 @@ def _quo(text, safe="/"):
     return ''.join(res)
 
 
-def _makeserver(serverurl):
-    """Curry the name of the server"""
-    def server(*urlcomponents):       
-        url = "%s/" % serverurl + "/".join(urlcomponents)
-        resp = urllib2.urlopen(url)
-        return resp.read()
+class _ConnectionPool(object):
+    """A pool of keep-alive HTTP connections, per host
+
+    Connections are returned to the pool after a request unless the
+    server closes them. A request on a pooled connection that turns
+    out to be stale is retried once on a fresh connection. Redirects
+    are followed up to maxredirects times.
+    """
+    redirects = (301, 302, 303, 307, 308)
+    maxredirects = 10
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(self.maxsize)
+            return self._pools[key]
+
+    def _connect(self, parts):
+        if parts.scheme == "https":
+            return httplib.HTTPSConnection(parts.netloc, timeout=self.timeout)
+        return httplib.HTTPConnection(parts.netloc, timeout=self.timeout)
+
+    def urlopen(self, url):
+        """Return the body of a GET request, raise HTTPError if not OK"""
+        for _ in range(self.maxredirects + 1):
+            resp, data = self._get(url)
+            location = resp.getheader("Location")
+            if resp.status not in self.redirects or not location:
+                break
+            url = urljoin(url, location)
+        else:
+            raise HTTPError(url, resp.status, "Too many redirects", resp.msg, None)
+
+        if resp.status != 200:
+            raise HTTPError(url, resp.status, resp.reason, resp.msg, None)
+        return data
+
+    def _get(self, url):
+        """Return the response and body of a GET request"""
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        pool = self._pool((parts.scheme, parts.netloc))
+
+        try:
+            conn, reused = pool.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._connect(parts), False
+
+        while True:
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (httplib.HTTPException, socket.error) as e:
+                conn.close()
+                if not reused:
+                    raise URLError(e)
+                conn, reused = self._connect(parts), False
+
+        if resp.will_close:
+            conn.close()
+        else:
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        return resp, data
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+
+
+class _ResponseCache(object):
+    """An on-disk cache of response bodies keyed by URL
+
+    The oldest responses are removed when the cache grows beyond
+    maxsize bytes.
+    """
+    def __init__(self, path, maxsize=None):
+        self.path = path
+        self.maxsize = maxsize
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _filename(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, digest[:2], digest[2:])
+
+    def get(self, url):
+        try:
+            with open(self._filename(url), "rb") as cached:
+                return cached.read()
+        except (IOError, OSError):
+            return None
+
+    def put(self, url, data):
+        filename = self._filename(url)
+        dirname = os.path.dirname(filename)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            fd, tmp = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+            with os.fdopen(fd, "wb") as output:
+                output.write(data)
+            _rename(tmp, filename)
+        except (IOError, OSError):
+            return
+        self._prune(len(data))
+
+    def _entries(self):
+        """Return (mtime, size, filename) of the cached responses"""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                filename = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+        return entries
+
+    def _prune(self, added):
+        """Remove the oldest responses down to 90% of maxsize if full"""
+        if not self.maxsize:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += added
+                if self._size <= self.maxsize:
+                    return
+            entries = sorted(self._entries())
+            self._size = sum(entry[1] for entry in entries)
+            for mtime, size, filename in entries:
+                if self._size <= self.maxsize * 0.9:
+                    break
+                try:
+                    os.remove(filename)
+                except OSError:
+                    continue
+                self._size -= size
+
+
+_pool = _ConnectionPool(maxworkers, timeout)
+_cache = _ResponseCache(cachedir, cachesize) if cachedir else None
+_workers = None
+_workerslock = threading.Lock()
+
+
+def configure(rajweb=None, nci=None, cachedir=None, cachesize=None, maxworkers=None, timeout=None):
+    """Configure the web services used by webel.
+
+    Optional parameters:
+       rajweb -- base URL of the CDK descriptor web service
+       nci -- base URL of the NCI/CADD Chemical Identifier Resolver
+       cachedir -- directory of the on-disk response cache, use ""
+                   to disable the cache
+       cachesize -- maximum size of the response cache in bytes
+       maxworkers -- maximum number of concurrent requests
+       timeout -- socket timeout in seconds
+
+    The defaults can also be set using the WEBEL_RAJWEB_URL,
+    WEBEL_NCI_URL, WEBEL_CACHE_DIR and WEBEL_CACHE_SIZE environment
+    variables.
+    """
+    global _pool, _cache, _workers, _descs
+    module = sys.modules[__name__]
+    if rajweb is not None:
+        baseurls["rajweb"] = rajweb.rstrip("/")
+        _descs = None
+    if nci is not None:
+        baseurls["nci"] = nci.rstrip("/")
+    if cachedir is not None or cachesize is not None:
+        module.cachedir = module.cachedir if cachedir is None else cachedir
+        module.cachesize = cachesize or module.cachesize
+        _cache = _ResponseCache(module.cachedir, module.cachesize) if module.cachedir else None
+    if maxworkers is not None or timeout is not None:
+        module.maxworkers = maxworkers or module.maxworkers
+        module.timeout = timeout or module.timeout
+        _pool.close()
+        _pool = _ConnectionPool(module.maxworkers, module.timeout)
+        with _workerslock:
+            if _workers is not None:
+                _workers.close()
+            _workers = None
+
+
+def _fetch(url):
+    """Return the body of url, using the response cache if enabled"""
+    cache = _cache
+    if cache is not None:
+        data = cache.get(url)
+        if data is not None:
+            return data
+    data = _pool.urlopen(url)
+    if cache is not None:
+        cache.put(url, data)
+    return data
+
+
+def _map(function, iterable):
+    """Map function over iterable using the bounded pool of worker threads"""
+    global _workers
+    items = list(iterable)
+    if ThreadPool is None or maxworkers < 2 or len(items) < 2:
+        return [function(item) for item in items]
+    with _workerslock:
+        if _workers is None:
+            _workers = ThreadPool(maxworkers)
+        workers = _workers
+    return workers.map(function, items)
+
+
+def _makeserver(name):
+    """Curry the name of the server
+
+    The base URL is looked up in the baseurls dictionary on every call
+    so that it can be changed using configure().
+    Responses are returned as text unless binary=True is given.
+    """
+    def server(*urlcomponents, **kwargs):
+        url = "%s/" % baseurls[name] + "/".join(urlcomponents)
+        data = _fetch(url)
+        if kwargs.get("binary") or sys.version_info.major == 2:
+            return data
+        return data.decode("utf-8")
     return server
 
 
-rajweb = _makeserver("http://ws1.bmc.uu.se:8182/cdk")
-nci = _makeserver("http://cactus.nci.nih.gov/chemical/structure")
+rajweb = _makeserver("rajweb")
+nci = _makeserver("nci")
 _descs = None # Cache the list of descriptors
 
 
@@ -238,9 +513,13 @@ class Molecule(object):
                     raise ValueError("%s is not a recognised Webel descriptor type" % descname)
         ans = {}
         p = re.compile("""Descriptor parent="(\w*)" name="([\w\-\+\d]*)" value="([\d\.]*)""")
-        for descname in descnames:
+        smiles = _quo(self.smiles)
+
+        def calc(descname):
             longname = "org.openscience.cdk.qsar.descriptors.molecular." + descname
-            response = rajweb("descriptor", longname, _quo(self.smiles))
+            return rajweb("descriptor", longname, smiles)
+
+        for response in _map(calc, descnames):
             for match in p.findall(response):
                 if match[2]:
                     ans["%s_%s" % (match[0], match[1])] = float(match[2])
@@ -321,9 +600,10 @@ class Molecule(object):
         Tkinter and Python Imaging Library are required for
         image display.
         """
-        imagedata = nci(_quo(self.smiles), "image")
+        imagedata = nci(_quo(self.smiles), "image", binary=True)
         if filename:
-            print >> open(filename, "wb"), imagedata
+            with open(filename, "wb") as imagefile:
+                imagefile.write(imagedata)
         if show:
             if not tk:
                 errormessage = ("Tkinter or Python Imaging "
@@ -371,6 +651,35 @@ class Fingerprint(object):
     def __str__(self):
         return self.fp
 
+    def to_numpy(self, packed=False):
+        """Return the fingerprint as a NumPy uint8 array.
+
+        Optional parameters:
+           packed -- return the packed fingerprint bytes, least
+                     significant bit first, instead of one 0/1 value
+                     per bit (default is False)
+        """
+        bitvector = np.frombuffer(self.fp.encode("ascii"), dtype=np.uint8) - ord("0")
+        if packed:
+            return _packbits(bitvector)
+        return bitvector
+
+    @classmethod
+    def from_numpy(cls, array, nbits=None, packed=False):
+        """Create a Fingerprint from a NumPy array as returned by to_numpy().
+
+        Optional parameters:
+           nbits -- the fingerprint length, required for packed arrays
+                    if not a multiple of 8 (default is the array length)
+           packed -- the array holds packed fingerprint bytes
+                     (default is False)
+        """
+        bitvector = np.asarray(array, dtype=np.uint8)
+        if packed:
+            bitvector = _unpackbits(bitvector)
+        bitvector = (bitvector[:nbits] != 0).astype(np.uint8) + ord("0")
+        return cls(bitvector.tobytes().decode("ascii"))
+
 
 class Smarts(object):
     """A Smarts Pattern Matcher
@@ -605,6 +605,14 @@ class TestCDK(TestToolkit):
         self.assertEqual(len(self.mols[0].atoms), 4)
         self.assertRaises(AttributeError, self.RSaccesstest)
 
+    def testRFdescmany(self):
+        """Test the batch descriptor calculation"""
+        names, values = self.toolkit.calcdesc_many(self.mols, [self.tpsaname])
+        self.assertEqual(names, [self.tpsaname])
+        self.assertEqual(len(values), len(self.mols))
+        self.assertAlmostEqual(values[1][0], 26.02, 2)
+        self.assertRaises(ValueError, self.toolkit.calcdesc_many, self.mols, ["BadDescName"])
+
 class TestJchem(TestToolkit):
     toolkit = jchem
     tanimotoresult = 0.444
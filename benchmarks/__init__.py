@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite for the MDStudio_structures core functions
+
+Every module named bench_*.py registers its benchmarks with the harness
+on import.
+"""
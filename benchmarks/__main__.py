@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+Python runner for the MDStudio_structures benchmarks, run as:
+::
+    python benchmarks run -o results.json
+    python benchmarks compare baseline.json results.json
+    python benchmarks calibrate results.json -o toolkit_calibration.json
+
+Benchmarks run offline for all available toolkits, toolkits that are not
+installed are skipped. Compare exits with a non-zero status when a
+benchmark is slower than the baseline by more than the threshold.
+Calibrate converts results to the toolkit calibration table used by the
+'auto' toolkit selection of the service.
+"""
+
+import os
+import sys
+import argparse
+import importlib
+
+# Add modules in package to path so we can import them
+modulepath = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.insert(0, modulepath)
+
+from benchmarks.harness import (run_benchmarks, write_results, load_results, compare_results,
+                                report_comparison)
+
+
+def load_benchmarks():
+    """
+    Import all bench_*.py modules to register their benchmarks
+    """
+
+    benchpath = os.path.dirname(os.path.abspath(__file__))
+    for filename in sorted(os.listdir(benchpath)):
+        if filename.startswith('bench_') and filename.endswith('.py'):
+            importlib.import_module('benchmarks.{0}'.format(filename[:-3]))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='benchmarks', description='MDStudio_structures benchmarks')
+    commands = parser.add_subparsers(dest='command')
+
+    run = commands.add_parser('run', help='run benchmarks')
+    run.add_argument('-o', '--output', default='benchmark_results.json', help='results file')
+    run.add_argument('-b', '--benchmark', action='append', help='benchmark name, may be repeated')
+    run.add_argument('-t', '--toolkit', action='append', help='toolkit name, may be repeated')
+    run.add_argument('-s', '--sizes', type=int, nargs='+', help='problem sizes')
+    run.add_argument('-r', '--repeat', type=int, default=3, help='number of timed runs')
+
+    compare = commands.add_parser('compare', help='compare two results files')
+    compare.add_argument('baseline', help='baseline results file')
+    compare.add_argument('current', help='current results file')
+    compare.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown')
+
+    calibrate = commands.add_parser('calibrate', help='toolkit calibration table from a results file')
+    calibrate.add_argument('results', help='results file')
+    calibrate.add_argument('-o', '--output', default='toolkit_calibration.json', help='calibration file')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        load_benchmarks()
+        results = run_benchmarks(names=args.benchmark, selected_toolkits=args.toolkit, sizes=args.sizes,
+                                 repeat=args.repeat, log=sys.stdout)
+        write_results(results, args.output)
+        return 0
+
+    if args.command == 'compare':
+        comparisons = compare_results(load_results(args.baseline), load_results(args.current),
+                                      threshold=args.threshold)
+        report_comparison(comparisons)
+        return int(any(comp['regression'] for comp in comparisons))
+
+    if args.command == 'calibrate':
+        from mdstudio_structures.cheminfo_toolkit_select import calibration_from_benchmarks
+
+        write_results(calibration_from_benchmarks(load_results(args.results)), args.output)
+        return 0
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
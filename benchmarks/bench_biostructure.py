@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: bench_biostructure.py
+
+Benchmarks for the biomolecular structure functions behind the
+remove_residues endpoint.
+"""
+
+from mdstudio_structures.cheminfo_biostructure import structure_remove_residues
+
+from .harness import benchmark
+from .synthetic import synthetic_pdb
+
+
+@benchmark('remove_residues_pdb', sizes=(100, 1000, 10000), toolkit_independent=True)
+def bench_remove_residues_pdb(toolkit, size):
+
+    structure = synthetic_pdb(size)
+
+    def run():
+        structure_remove_residues(structure, ['HOH'], mol_format='pdb')
+
+    return run, size * 2
+
+
+@benchmark('remove_residues_mmcif', sizes=(100, 1000, 10000), toolkit_independent=True)
+def bench_remove_residues_mmcif(toolkit, size):
+
+    structure, removed = structure_remove_residues(synthetic_pdb(size), [], mol_format='pdb', output_format='cif')
+
+    def run():
+        structure_remove_residues(structure, ['HOH'], mol_format='cif')
+
+    return run, size * 2
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: bench_cheminfo.py
+
+Benchmarks for the descriptor, fingerprint, substructure and filter
+functions behind the descriptors, chemical_similarity, substructure_search
+and filter endpoints.
+"""
+
+import os
+
+from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_descriptors import available_descriptors
+from mdstudio_structures.cheminfo_filter import available_catalogues, mol_filter
+from mdstudio_structures.cheminfo_fingerprint import (available_fingerprints, mol_fingerprint_cross_similarity,
+                                                      mol_fingerprint_many)
+from mdstudio_structures.cheminfo_molhandle import mol_read, mol_read_many
+from mdstudio_structures.cheminfo_substructure import library_fingerprints, match_many, mol_substructure_search
+
+from .harness import benchmark, SkipBenchmark
+from .bench_molhandle import read_molecules
+from .synthetic import synthetic_smiles
+
+HEAD_SDF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tests', 'files', 'head.sdf')
+
+# Amide query matched by a small fraction of the synthetic SMILES
+SUBSTRUCTURE_QUERY = 'C(=O)[NX3;H2]'
+
+# Structural alert style pattern set
+ALERT_PATTERNS = ('C(=O)[NX3;H2]', '[CX3](=O)[OX2H1]', '[NX3;H2,H1;!$(NC=O)]', 'C(F)(F)F', '[Cl,Br,I]',
+                  'C=CC(=O)', '[OX2H][CX4]', 'c1ccccc1', 'C1CC1', '[#6]~[#7]~[#6]=O')
+
+
+def head_molecules(toolkit, size):
+    """
+    Replicate the head.sdf test set to size molecules, skip if the toolkit
+    has no fingerprints or cannot read SD files
+    """
+
+    if not available_fingerprints().get(toolkit):
+        raise SkipBenchmark()
+
+    mols = [mol for mol in mol_read_many(HEAD_SDF, from_file=True, toolkit=toolkit) if mol is not None]
+    if not mols:
+        raise SkipBenchmark()
+
+    return [mols[i % len(mols)] for i in range(size)]
+
+
+@benchmark('calcdesc', sizes=(1, 10, 100))
+def bench_calcdesc(toolkit, size):
+
+    if not available_descriptors().get(toolkit):
+        raise SkipBenchmark()
+
+    mols = read_molecules(toolkit, size)
+
+    def run():
+        for mol in mols:
+            mol.calcdesc()
+
+    return run, size
+
+
+@benchmark('mol_fingerprint_cross_similarity', sizes=(10, 100, 300))
+def bench_fingerprint_cross_similarity(toolkit, size):
+
+    fps = available_fingerprints().get(toolkit)
+    if not fps:
+        raise SkipBenchmark()
+
+    fptype = 'maccs' if 'maccs' in fps else list(fps)[0]
+    fingerprints = [mol.calcfp(fptype) for mol in read_molecules(toolkit, size)]
+
+    def run():
+        mol_fingerprint_cross_similarity(fingerprints, fingerprints, toolkit)
+
+    return run, size * size
+
+
+@benchmark('calcfp_head_sdf', sizes=(10, 100, 1000))
+def bench_calcfp(toolkit, size):
+
+    mols = head_molecules(toolkit, size)
+
+    def run():
+        for mol in mols:
+            mol.calcfp().to_numpy(packed=True)
+
+    return run, size
+
+
+@benchmark('calcfp_many_head_sdf', sizes=(10, 100, 1000))
+def bench_calcfp_many(toolkit, size):
+
+    mols = head_molecules(toolkit, size)
+
+    def run():
+        mol_fingerprint_many(mols)
+
+    return run, size
+
+
+def substructure_library(toolkit, size):
+    """
+    Synthetic SMILES library of size molecules, skip if the toolkit has
+    no SMARTS support
+    """
+
+    if not hasattr(toolkits.get(toolkit), 'Smarts'):
+        raise SkipBenchmark()
+
+    return [mol_read(smiles, mol_format='smi', toolkit=toolkit) for smiles in synthetic_smiles(size)]
+
+
+@benchmark('substructure_search', sizes=(100, 1000))
+def bench_substructure_search(toolkit, size):
+
+    mols = substructure_library(toolkit, size)
+
+    def run():
+        mol_substructure_search(SUBSTRUCTURE_QUERY, mols, toolkit=toolkit)
+
+    return run, size
+
+
+@benchmark('substructure_search_unscreened', sizes=(100, 1000))
+def bench_substructure_search_unscreened(toolkit, size):
+
+    mols = substructure_library(toolkit, size)
+
+    def run():
+        mol_substructure_search(SUBSTRUCTURE_QUERY, mols, toolkit=toolkit, screen=False)
+
+    return run, size
+
+
+@benchmark('substructure_search_cached', sizes=(100, 1000))
+def bench_substructure_search_cached(toolkit, size):
+
+    mols = substructure_library(toolkit, size)
+    fingerprints = library_fingerprints(mols)
+    if fingerprints is None:
+        raise SkipBenchmark()
+
+    def run():
+        mol_substructure_search(SUBSTRUCTURE_QUERY, mols, toolkit=toolkit, fingerprints=fingerprints)
+
+    return run, size
+
+
+@benchmark('match_many', sizes=(100, 1000))
+def bench_match_many(toolkit, size):
+
+    mols = substructure_library(toolkit, size)
+
+    def run():
+        match_many(ALERT_PATTERNS, mols, toolkit=toolkit)
+
+    return run, size * len(ALERT_PATTERNS)
+
+
+@benchmark('filter_pains', sizes=(100, 1000))
+def bench_filter_pains(toolkit, size):
+
+    if 'pains' not in available_catalogues():
+        raise SkipBenchmark()
+
+    mols = substructure_library(toolkit, size)
+
+    def run():
+        mol_filter(mols, catalogues=['pains'], toolkit=toolkit)
+
+    return run, size
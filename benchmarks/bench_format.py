@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: bench_format.py
+
+Benchmarks for the structure file format detection in
+mol_validate_file_object.
+"""
+
+from mdstudio_structures.cheminfo_format import sniff_format
+from mdstudio_structures.cheminfo_molhandle import mol_validate_file_object
+
+from .harness import benchmark
+from .synthetic import synthetic_pdb, synthetic_smiles
+
+
+@benchmark('sniff_format_pdb', sizes=(100, 1000, 10000), toolkit_independent=True)
+def bench_sniff_format_pdb(toolkit, size):
+
+    structure = synthetic_pdb(size)
+
+    def run():
+        sniff_format(structure)
+
+    return run, 1
+
+
+@benchmark('sniff_format_smiles', toolkit_independent=True)
+def bench_sniff_format_smiles(toolkit, size):
+
+    smiles = synthetic_smiles(size)
+
+    def run():
+        for s in smiles:
+            sniff_format(s)
+
+    return run, size
+
+
+@benchmark('validate_file_object_pdb', sizes=(100, 1000, 10000), toolkit_independent=True)
+def bench_validate_file_object_pdb(toolkit, size):
+
+    structure = synthetic_pdb(size)
+
+    def run():
+        mol_validate_file_object({'content': structure, 'path': None, 'extension': None})
+
+    return run, 1
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: bench_molhandle.py
+
+Benchmarks for the molecule read, write and manipulation functions behind
+the convert, addh, make3d and rotate endpoints.
+"""
+
+from mdstudio_structures.cheminfo_molhandle import (mol_read, mol_write, mol_addh, mol_make3D,
+                                                    mol_combine_rotations)
+
+from .harness import benchmark, SkipBenchmark
+from .synthetic import synthetic_smiles
+
+# Forcefield used for 3D coordinate generation per toolkit
+FORCEFIELDS = {'rdk': 'uff'}
+# Format supported by both Outputfile and Molecule.write, required by
+# mol_combine_rotations
+ROTATION_FORMATS = {'pybel': 'mol2'}
+ROTATIONS = [[1, 0, 0, 90], [1, 0, 0, -90], [0, 1, 0, 90], [0, 1, 0, -90], [0, 0, 1, 90], [0, 0, 1, -90]]
+
+
+def read_molecules(toolkit, size):
+    """
+    Read a synthetic molecule set, skip if the toolkit cannot read SMILES
+    """
+
+    mols = [mol_read(smiles, mol_format='smi', toolkit=toolkit) for smiles in synthetic_smiles(size)]
+    if not all(mols):
+        raise SkipBenchmark()
+    return mols
+
+
+@benchmark('mol_read')
+def bench_mol_read(toolkit, size):
+
+    smiles = synthetic_smiles(size)
+    read_molecules(toolkit, 1)
+
+    def run():
+        for s in smiles:
+            mol_read(s, mol_format='smi', toolkit=toolkit)
+
+    return run, size
+
+
+@benchmark('mol_write')
+def bench_mol_write(toolkit, size):
+
+    mols = read_molecules(toolkit, size)
+    if mol_write(mols[0], mol_format='mol') is None:
+        raise SkipBenchmark()
+
+    def run():
+        for mol in mols:
+            mol_write(mol, mol_format='mol')
+
+    return run, size
+
+
+@benchmark('mol_addh')
+def bench_mol_addh(toolkit, size):
+
+    smiles = synthetic_smiles(size)
+    read_molecules(toolkit, 1)
+
+    # Adding hydrogens modifies the molecule in place, reading is part of
+    # the timing to start every repeat from the same molecules
+    def run():
+        for s in smiles:
+            mol_addh(mol_read(s, mol_format='smi', toolkit=toolkit))
+
+    return run, size
+
+
+@benchmark('mol_make3D', sizes=(1, 10, 50))
+def bench_mol_make3D(toolkit, size):
+
+    if toolkit in ('cdk', 'webel', 'opsin'):
+        raise SkipBenchmark()
+
+    smiles = synthetic_smiles(size)
+    read_molecules(toolkit, 1)
+    forcefield = FORCEFIELDS.get(toolkit, 'mmff94')
+
+    def run():
+        for s in smiles:
+            mol_make3D(mol_read(s, mol_format='smi', toolkit=toolkit), forcefield=forcefield)
+
+    return run, size
+
+
+@benchmark('mol_combine_rotations', sizes=(1, 10, 50))
+def bench_mol_combine_rotations(toolkit, size):
+
+    if toolkit not in ROTATION_FORMATS:
+        raise SkipBenchmark()
+
+    mols = []
+    for mol in read_molecules(toolkit, size):
+        mol = mol_make3D(mol, forcefield=FORCEFIELDS.get(toolkit, 'mmff94'))
+        if mol is None:
+            raise SkipBenchmark()
+        mol.mol_format = ROTATION_FORMATS[toolkit]
+        mols.append(mol)
+
+    def run():
+        for mol in mols:
+            mol_combine_rotations(mol, rotations=ROTATIONS)
+
+    return run, size * len(ROTATIONS)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: harness.py
+
+Minimal benchmark harness for the MDStudio_structures core functions.
+
+Benchmarks are registered using the `benchmark` decorator. A benchmark
+function is called with a toolkit name and a problem size and performs
+all setup work before returning a (run, items) tuple where `run` is the
+callable to time and `items` the number of items it processes, used to
+report throughput. Benchmarks that do not apply to a toolkit raise
+`SkipBenchmark`.
+"""
+
+import gc
+import sys
+import json
+import time
+import platform
+import datetime
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from mdstudio_structures import toolkits, __version__
+
+# Toolkits that require network access are never benchmarked
+ONLINE_TOOLKITS = ('webel', 'silverwebel')
+
+BENCHMARKS = []
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class SkipBenchmark(Exception):
+    """
+    Raised by a benchmark that does not apply to a toolkit
+    """
+
+
+def benchmark(name, sizes=(10, 100, 1000), toolkit_independent=False):
+    """
+    Register a benchmark function
+
+    :param name:                benchmark name
+    :type name:                 :py:str
+    :param sizes:               default problem sizes
+    :type sizes:                :py:tuple
+    :param toolkit_independent: run once instead of once per toolkit
+    :type toolkit_independent:  :py:bool
+    """
+
+    def decorator(func):
+        BENCHMARKS.append({'name': name, 'func': func, 'sizes': sizes,
+                           'toolkit_independent': toolkit_independent})
+        return func
+
+    return decorator
+
+
+def available_toolkits():
+    """
+    Names of the loaded toolkits that can be benchmarked offline
+    """
+
+    return sorted(t for t in toolkits if t not in ONLINE_TOOLKITS)
+
+
+def _peak_memory(run):
+    """
+    Peak Python heap memory allocated by a single call to run in bytes
+    """
+
+    if tracemalloc is None:
+        return None
+
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(bench, toolkit, size, repeat=3):
+    """
+    Run a single benchmark for a toolkit and problem size
+
+    :return: benchmark result or None when skipped
+    :rtype:  :py:dict
+    """
+
+    try:
+        run, items = bench['func'](toolkit, size)
+    except SkipBenchmark:
+        return None
+
+    timings = []
+    for i in range(repeat):
+        gc.collect()
+        start = timer()
+        run()
+        timings.append(timer() - start)
+
+    best = min(timings)
+    return {'name': bench['name'], 'toolkit': toolkit, 'size': size, 'items': items,
+            'repeat': repeat, 'time': best, 'mean': sum(timings) / len(timings),
+            'throughput': items / best if best > 0 else None,
+            'peak_memory': _peak_memory(run)}
+
+
+def run_benchmarks(names=None, selected_toolkits=None, sizes=None, repeat=3, log=None):
+    """
+    Run all registered benchmarks matching names for the selected toolkits
+
+    :param names:             benchmark names, all by default
+    :type names:              :py:list
+    :param selected_toolkits: toolkits names, all available by default
+    :type selected_toolkits:  :py:list
+    :param sizes:             problem sizes overriding the benchmark defaults
+    :type sizes:              :py:list
+    :param repeat:            number of timed runs, the fastest is reported
+    :type repeat:             :py:int
+    :param log:               file object to report progress to
+    :type log:                file object
+
+    :return:                  results document
+    :rtype:                   :py:dict
+    """
+
+    available = available_toolkits()
+    selected = [t for t in (selected_toolkits or available) if t in available]
+
+    results = []
+    for bench in BENCHMARKS:
+        if names and bench['name'] not in names:
+            continue
+
+        for toolkit in ([None] if bench['toolkit_independent'] else selected):
+            for size in (sizes or bench['sizes']):
+                result = run_benchmark(bench, toolkit, size, repeat=repeat)
+                if result is None:
+                    continue
+                results.append(result)
+                if log is not None:
+                    log.write('{0:<32} {1:<8} {2:>6} {3:>12.4f}s {4:>12.1f} items/s\n'.format(
+                        bench['name'], toolkit or '-', size, result['time'], result['throughput'] or 0))
+
+    metadata = {'python': platform.python_version(), 'platform': platform.platform(),
+                'version': __version__, 'toolkits': selected,
+                'timestamp': datetime.datetime.utcnow().isoformat()}
+
+    return {'metadata': metadata, 'results': results}
+
+
+def write_results(results, path):
+    """
+    Write a results document as JSON
+    """
+
+    with open(path, 'w') as outfile:
+        json.dump(results, outfile, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """
+    Load a results document from JSON
+    """
+
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Compare two results documents
+
+    A benchmark is flagged as regression when its time increased by more
+    than the threshold fraction relative to the baseline.
+
+    :param baseline:  baseline results document
+    :type baseline:   :py:dict
+    :param current:   current results document
+    :type current:    :py:dict
+    :param threshold: allowed relative slowdown
+    :type threshold:  :py:float
+
+    :return:          list of comparisons for benchmarks in both documents
+    :rtype:           :py:list
+    """
+
+    def key(result):
+        return result['name'], result['toolkit'], result['size']
+
+    base = dict((key(r), r) for r in baseline['results'])
+
+    comparisons = []
+    for result in current['results']:
+        previous = base.get(key(result))
+        if previous is None or not previous['time']:
+            continue
+
+        ratio = result['time'] / previous['time']
+        comparisons.append({'name': result['name'], 'toolkit': result['toolkit'], 'size': result['size'],
+                            'baseline': previous['time'], 'current': result['time'], 'ratio': ratio,
+                            'regression': ratio > 1 + threshold})
+
+    return comparisons
+
+
+def report_comparison(comparisons, out=sys.stdout):
+    """
+    Print a comparison table, regressions are marked with '!'
+    """
+
+    for comp in comparisons:
+        out.write('{0} {1:<32} {2:<8} {3:>6} {4:>10.4f}s {5:>10.4f}s {6:>7.2f}x\n'.format(
+            '!' if comp['regression'] else ' ', comp['name'], comp['toolkit'] or '-', comp['size'],
+            comp['baseline'], comp['current'], comp['ratio']))
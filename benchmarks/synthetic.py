@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: synthetic.py
+
+Deterministic synthetic molecule and structure sets for benchmarking
+"""
+
+import random
+
+SUBSTITUENTS = ('O', 'N', 'F', 'Cl', 'OC', 'C(=O)O', 'C(N)=O', 'c1ccccc1', 'C1CC1')
+RESIDUES = ('ALA', 'GLY', 'SER', 'LEU', 'LYS', 'ASP')
+BACKBONE = (('N', 'N', -0.53, 1.36), ('CA', 'C', 0.0, 0.0), ('C', 'C', 1.53, 0.0), ('O', 'O', 2.1, 1.1))
+
+
+def synthetic_smiles(count, min_atoms=4, max_atoms=24, seed=42):
+    """
+    Generate a reproducible set of substituted alkane SMILES strings
+
+    :param count:     number of molecules
+    :type count:      :py:int
+    :param min_atoms: minimum length of the carbon chain
+    :type min_atoms:  :py:int
+    :param max_atoms: maximum length of the carbon chain
+    :type max_atoms:  :py:int
+    :param seed:      random seed
+    :type seed:       :py:int
+
+    :rtype:           :py:list
+    """
+
+    rng = random.Random(seed)
+    smiles = []
+    for i in range(count):
+        chain = []
+        for j in range(rng.randint(min_atoms, max_atoms)):
+            atom = 'C'
+            if rng.random() < 0.25:
+                atom += '({0})'.format(rng.choice(SUBSTITUENTS))
+            chain.append(atom)
+        smiles.append(''.join(chain))
+
+    return smiles
+
+
+def synthetic_pdb(residues, waters=None, seed=42):
+    """
+    Generate a PDB structure with a single chain of backbone-only amino
+    acid residues followed by water molecules.
+
+    :param residues: number of amino acid residues
+    :type residues:  :py:int
+    :param waters:   number of waters, same as residues by default
+    :type waters:    :py:int
+    :param seed:     random seed
+    :type seed:      :py:int
+
+    :rtype:          :py:str
+    """
+
+    rng = random.Random(seed)
+    record = '{0:<6}{1:>5} {2:<4} {3:>3} {4:1}{5:>4}    {6:>8.3f}{7:>8.3f}{8:>8.3f}{9:>6.2f}{10:>6.2f}          {11:>2}\n'
+
+    lines = []
+    serial = 1
+    for resnum in range(1, residues + 1):
+        resname = rng.choice(RESIDUES)
+        for name, element, dx, dy in BACKBONE:
+            lines.append(record.format('ATOM', serial % 100000, ' {0}'.format(name), resname, 'A', resnum % 10000,
+                                       resnum * 3.8 + dx, dy, 0.0, 1.0, 20.0, element))
+            serial += 1
+
+    for resnum in range(1, (residues if waters is None else waters) + 1):
+        lines.append(record.format('HETATM', serial % 100000, ' O', 'HOH', 'W', resnum % 10000,
+                                   rng.uniform(-50, 50), rng.uniform(-50, 50), rng.uniform(-50, 50),
+                                   1.0, 30.0, 'O'))
+        serial += 1
+
+    return ''.join(lines)
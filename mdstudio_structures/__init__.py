@@ -12,7 +12,7 @@ If you remove the pandas import all the HELL may break loose
 import pandas
 import os
 
-from .cheminfo_pkgmanager import CinfonyPackageManager
+from .cheminfo_pkgmanager import CinfonyPackageManager, configure_jvm
 
 __module__ = 'mdstudio_structures'
 __docformat__ = 'restructuredtext'
@@ -27,6 +27,9 @@ __rootpath__ = os.path.dirname(__file__)
 __all__ = ['toolkits']
 
 
+# Configure the JVM before the Java toolkits start it on import
+configure_jvm(os.path.join(os.path.dirname(__rootpath__), 'settings.yml'))
+
 # Load the toolkits
 paths = {}
 toolkits = CinfonyPackageManager(paths)
@@ -1,3 +1,11 @@
+import os
+import logging
+
+# Configure logging before the service starts. The package __init__, which
+# loads the cheminformatics toolkits, has already run at this point.
+logging.basicConfig(level=os.environ.get('MDSTUDIO_STRUCTURES_LOG_LEVEL', 'INFO').upper(),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
 from mdstudio.runner import main
 from mdstudio_structures.wamp_services import StructuresWampApi
 
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_biostructure.py
+
+Biomolecular structure (PDB, mmCIF) manipulation functions
+"""
+
+import sys
+
+from Bio.PDB.PDBIO import PDBIO
+from Bio.PDB.PDBParser import PDBParser
+
+from .cheminfo_mmcif import is_mmcif, mmcif_remove_residues
+
+# Library and function compatibility
+if sys.version_info[0] < 3:
+    from cStringIO import StringIO
+else:
+    from io import StringIO
+
+MMCIF_FORMATS = ('cif', 'mmcif')
+
+
+def structure_format(handle, mol_format=None):
+    """
+    Return the structure file format, 'pdb' or 'cif', of a structure
+
+    The format is derived from mol_format if it is a known PDB or mmCIF
+    format name, otherwise from the start of the file.
+
+    :param handle:     seekable file object
+    :type handle:      file object
+    :param mol_format: format name as given by the user
+    :type mol_format:  :py:str
+
+    :rtype:            :py:str
+    """
+
+    if mol_format in MMCIF_FORMATS:
+        return 'cif'
+    if mol_format in ('pdb', 'ent'):
+        return 'pdb'
+
+    start = handle.read(1024)
+    handle.seek(0)
+    return 'cif' if is_mmcif(start) else 'pdb'
+
+
+def structure_remove_residues(handle, residues, mol_format=None, output_format=None, outfile=None):
+    """
+    Remove residues by name from a PDB or mmCIF structure
+
+    mmCIF input is streamed using the lightweight '_atom_site' parser in
+    cheminfo_mmcif, PDB input is parsed using Biopython.
+
+    :param handle:        structure file content or open file object
+    :type handle:         :py:str or file object
+    :param residues:      residue names to remove
+    :type residues:       :py:list
+    :param mol_format:    input format 'pdb' or 'cif', detected if not set
+    :type mol_format:     :py:str
+    :param output_format: output format 'pdb' or 'cif', input format if not set
+    :type output_format:  :py:str
+    :param outfile:       file object to write to. Return output as string
+                          if not defined.
+    :type outfile:        file object
+
+    :return:              output structure (or None if outfile) and the
+                          names of the removed residues
+    :rtype:               :py:tuple
+    """
+
+    if not hasattr(handle, 'read'):
+        handle = StringIO(handle)
+
+    mol_format = structure_format(handle, mol_format)
+    output_format = 'cif' if (output_format or mol_format) in MMCIF_FORMATS else 'pdb'
+
+    output = outfile or StringIO()
+    if mol_format == 'cif':
+        removed = mmcif_remove_residues(handle, residues, output, output_format=output_format)
+    else:
+        removed = _pdb_remove_residues(handle, residues, output, output_format=output_format)
+
+    if outfile is not None:
+        return None, removed
+
+    output.seek(0)
+    return output.read(), removed
+
+
+def _pdb_remove_residues(handle, residues, outfile, output_format='pdb'):
+    """
+    Remove residues by name from a PDB structure using Biopython
+    """
+
+    parser = PDBParser(PERMISSIVE=True)
+    structure = parser.get_structure('mol_object', handle)
+
+    to_remove = [r.upper() for r in residues]
+    removed = []
+    for model in structure:
+        for chain in list(model):
+            for residue in list(chain):
+                if residue.get_resname() in to_remove:
+                    chain.detach_child(residue.id)
+                    removed.append(residue.get_resname())
+            if len(chain) == 0:
+                model.detach_child(chain.id)
+
+    if output_format == 'cif':
+        from Bio.PDB.mmcifio import MMCIFIO
+        io = MMCIFIO()
+    else:
+        io = PDBIO()
+    io.set_structure(structure)
+    io.save(outfile)
+
+    return removed
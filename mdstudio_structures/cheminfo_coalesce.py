@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_coalesce.py
+
+Coalescing of identical concurrent endpoint calls.
+
+Endpoint methods wrapped by the `coalesce` decorator are keyed by a hash
+of the endpoint name and the canonical JSON representation of the request.
+When a call with the same key is still in flight, the new call follows the
+leader and receives a copy of its result or failure instead of computing
+it again. Followers wait at most `timeout` seconds after which they run
+the call themselves.
+
+Only calls returning a Deferred, i.e. offloaded to an executor, can be in
+flight. All bookkeeping happens in the reactor thread.
+"""
+
+import copy
+import json
+import hashlib
+import logging
+import functools
+
+from twisted.internet import defer, reactor
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(endpoint, request):
+    """
+    Hash of the endpoint name and canonical JSON request
+
+    :param endpoint: endpoint name
+    :type endpoint:  :py:str
+    :param request:  endpoint request
+    :type request:   :py:dict
+
+    :rtype:          :py:str
+    """
+
+    payload = json.dumps([endpoint, request], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class RequestCoalescer(object):
+    """
+    Registry of in-flight endpoint calls
+
+    :param enabled:   coalesce identical calls
+    :type enabled:    :py:bool
+    :param timeout:   maximum time in seconds a follower waits for the
+                      leader, wait indefinitely when None
+    :type timeout:    :py:float
+    :param endpoints: names of the endpoints to coalesce, all when empty
+    :type endpoints:  :py:list
+    :param clock:     Twisted IReactorTime provider used for timeouts
+    """
+
+    def __init__(self, clock=None, **kwargs):
+
+        self.enabled = True
+        self.timeout = 300
+        self.endpoints = []
+        self.clock = clock or reactor
+        self.stats = {'leaders': 0, 'followers': 0, 'timeouts': 0}
+
+        self._inflight = {}
+        self.configure(**kwargs)
+
+    def configure(self, **kwargs):
+        """
+        Update the coalescing settings
+
+        :raises ValueError: on unknown settings
+
+        :return: the updated settings
+        :rtype:  :py:dict
+        """
+
+        unknown = set(kwargs).difference(self.config())
+        if unknown:
+            raise ValueError('Unknown coalesce settings: {0}'.format(', '.join(sorted(unknown))))
+
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+        self.endpoints = list(self.endpoints or [])
+
+        return self.config()
+
+    def config(self):
+        """
+        Return the current settings
+
+        :rtype: :py:dict
+        """
+
+        return {'enabled': self.enabled, 'timeout': self.timeout, 'endpoints': self.endpoints}
+
+    def __len__(self):
+
+        return len(self._inflight)
+
+    def call(self, endpoint, func, *args):
+        """
+        Call func for endpoint or follow an identical call in flight
+
+        :param endpoint: endpoint name
+        :type endpoint:  :py:str
+        :param func:     endpoint method
+        :type func:      :py:func
+        :param args:     self, request and claims
+
+        :return:         endpoint result or Deferred
+        """
+
+        if not self.enabled or (self.endpoints and endpoint not in self.endpoints):
+            return func(*args)
+
+        key = request_key(endpoint, args[1])
+        if key in self._inflight:
+            return self._follow(endpoint, key, func, args)
+
+        result = func(*args)
+        if not isinstance(result, defer.Deferred) or result.called:
+            return result
+
+        self.stats['leaders'] += 1
+        followers = self._inflight[key] = []
+
+        def done(result):
+
+            if self._inflight.get(key) is followers:
+                del self._inflight[key]
+
+            for follower in followers:
+                if isinstance(result, dict):
+                    follower.callback(copy.deepcopy(result))
+                elif hasattr(result, 'trap'):
+                    follower.errback(result)
+                else:
+                    follower.callback(result)
+
+            return result
+
+        return result.addBoth(done)
+
+    def _follow(self, endpoint, key, func, args):
+        """
+        Await the result of the in-flight call with key
+        """
+
+        self.stats['followers'] += 1
+        follower = defer.Deferred()
+        self._inflight[key].append(follower)
+        logger.debug('Coalesced %s request %s with in-flight call', endpoint, key)
+
+        if self.timeout is not None:
+            timer = self.clock.callLater(self.timeout, self._expire, key, follower, func, args)
+
+            def cancel(result):
+                if timer.active():
+                    timer.cancel()
+                return result
+
+            follower.addBoth(cancel)
+
+        return follower
+
+    def _expire(self, key, follower, func, args):
+        """
+        Stop waiting for the leader and run the call for follower
+        """
+
+        followers = self._inflight.get(key, [])
+        if follower in followers:
+            followers.remove(follower)
+
+        self.stats['timeouts'] += 1
+        logger.warning('Request %s not completed within %s seconds, running it again', key, self.timeout)
+        defer.maybeDeferred(func, *args).chainDeferred(follower)
+
+
+coalescer = RequestCoalescer()
+
+
+def coalesce(endpoint):
+    """
+    Decorator coalescing identical concurrent calls to an endpoint method
+    with signature (self, request, claims).
+
+    :param endpoint: endpoint name
+    :type endpoint:  :py:str
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(self, request, claims):
+            return coalescer.call(endpoint, func, self, request, claims)
+
+        return wrapper
+
+    return decorator
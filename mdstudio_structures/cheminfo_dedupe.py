@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_dedupe.py
+
+Deduplication of molecule sets by canonical key.
+
+Batch endpoints receive molecule sets with repeated structures. The
+molecules are reduced to one representative per canonical key (canonical
+SMILES or InChIKey written by the active toolkit), the work is done for
+the unique molecules only and the results are scattered back to the
+original molecule indices:
+
+    unique, inverse = mol_deduplicate(molobjects)
+    results = scatter([compute(molobject) for molobject in unique], inverse)
+
+Results referring to atom indices, such as substructure matches, depend
+on the atom order of the input and are not interchangeable between
+duplicates. InChIKeys identify tautomers with mobile hydrogens as the same
+structure. Salts and other multi component structures are not reduced to
+a parent structure.
+"""
+
+import logging
+
+from numpy import array, intp
+
+logger = logging.getLogger(__name__)
+
+CANONICAL_KEYS = {'smiles': 'can', 'inchikey': 'inchikey'}
+
+
+def canonical_keys(molobjects, key='smiles'):
+    """
+    Canonical keys of many molecules
+
+    :param molobjects: Cinfony molecular objects, None for molecules that
+                       could not be read
+    :type molobjects:  :py:list
+    :param key:        canonical key type, 'smiles' or 'inchikey'
+    :type key:         :py:str
+
+    :raises ValueError: for unsupported key types
+
+    :return:           canonical key per molecule, None for unreadable
+                       molecules or molecules the toolkit fails to write
+    :rtype:            :py:list
+    """
+
+    if key not in CANONICAL_KEYS:
+        raise ValueError('Unsupported canonical key "{0}", choose from: {1}'.format(
+            key, ', '.join(sorted(CANONICAL_KEYS))))
+
+    mol_format = CANONICAL_KEYS[key]
+    keys = []
+    for molobject in molobjects:
+        if molobject is None:
+            keys.append(None)
+            continue
+
+        try:
+            # Canonical SMILES may be followed by the molecule title
+            keys.append(molobject.write(mol_format).split()[0])
+        except (IOError, ValueError, IndexError) as e:
+            logger.debug('Unable to write %s key of molecule %s: %s', key, molobject.title, e)
+            keys.append(None)
+
+    return keys
+
+
+def unique_keys(keys):
+    """
+    Index the first occurrence of every key
+
+    Molecules without key (None) are never merged with other molecules.
+
+    :param keys: key per item
+    :type keys:  :py:list
+
+    :return:     indices of the unique items and the index of the unique
+                 item for every item
+    :rtype:      :py:tuple
+    """
+
+    first = {}
+    unique = []
+    inverse = []
+    for i, item_key in enumerate(keys):
+        if item_key is None:
+            position = len(unique)
+            unique.append(i)
+        else:
+            position = first.get(item_key)
+            if position is None:
+                position = first[item_key] = len(unique)
+                unique.append(i)
+        inverse.append(position)
+
+    return unique, array(inverse, dtype=intp)
+
+
+def mol_deduplicate(molobjects, key='smiles'):
+    """
+    Reduce a molecule set to one molecule per canonical key
+
+    :param molobjects: Cinfony molecular objects, None for molecules that
+                       could not be read
+    :type molobjects:  :py:list
+    :param key:        canonical key type, 'smiles' or 'inchikey'
+    :type key:         :py:str
+
+    :return:           unique molecules and the index of the unique
+                       molecule for every molecule
+    :rtype:            :py:tuple
+    """
+
+    molobjects = list(molobjects)
+    unique, inverse = unique_keys(canonical_keys(molobjects, key=key))
+    if len(unique) < len(molobjects):
+        logger.debug('Deduplicated %s molecules to %s unique structures', len(molobjects), len(unique))
+
+    return [molobjects[i] for i in unique], inverse
+
+
+def scatter(results, inverse):
+    """
+    Scatter the results of the unique molecules back to all molecules
+
+    :param results: result per unique molecule
+    :type results:  :py:list
+    :param inverse: index of the unique molecule for every molecule as
+                    returned by `mol_deduplicate`
+    :type inverse:  :numpy:ndarray
+
+    :return:        result per molecule
+    :rtype:         :py:list
+    """
+
+    return [results[i] for i in inverse]
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_executor.py
+
+Offload blocking endpoint work from the Twisted reactor thread.
+
+MDStudio components run on the Twisted reactor. Endpoint methods wrapped
+by the `offload` decorator return a Deferred and run their body in an
+executor so the reactor keeps serving other requests in the meantime.
+The executor type is selected per endpoint in the module level `executor`:
+
+* thread:  a dedicated Twisted thread pool, suited for toolkit calls that
+           release the GIL (many RDKit functions) and network I/O. The
+           OpenBabel SWIG bindings hold the GIL. Toolkits that are not
+           thread safe (pybel, indy, see `SERIAL_PACKAGES` in
+           cheminfo_pkgmanager) run one request at a time.
+* process: a pool of worker processes for pure Python CPU bound work.
+           The request and response need to be picklable. Workers are
+           forked from the service process including its reactor threads,
+           avoid with the Java toolkits once the JVM is started.
+* inline:  run synchronously in the reactor thread as before.
+
+Request metrics are recorded for all executor types, per phase timings
+and runtime profiler settings only apply to the thread and inline
+executors.
+"""
+
+import functools
+import multiprocessing
+
+from twisted.internet import defer, reactor, threads
+from twisted.python import failure
+from twisted.python.threadpool import ThreadPool
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_metrics import propagate_context
+
+EXECUTOR_TYPES = ('thread', 'process', 'inline')
+
+# Undecorated endpoint methods by name, resolved again in worker processes
+_OFFLOADED = {}
+
+
+def _run_offloaded(name, cls, request, claims):
+    """
+    Run an offloaded endpoint method in a worker process
+
+    The method is called on an uninitialized instance of the component
+    class as the component session itself cannot be sent to the worker.
+    """
+
+    return _OFFLOADED[name](cls.__new__(cls), request, claims)
+
+
+def _attach_jvm(func):
+    """
+    Attach the worker thread calling func to the JVM of the Java toolkits
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        toolkits.attach_thread()
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _serialized(func):
+    """
+    Hold the lock of the requested toolkit while calling the endpoint
+    method func, for toolkits that are not thread safe
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, request, claims):
+        toolkit = request.get('toolkit') if isinstance(request, dict) else None
+        with toolkits.lock(toolkit):
+            return func(self, request, claims)
+
+    return wrapper
+
+
+def _deferred_from_future(future):
+    """
+    Wrap a concurrent.futures Future in a Deferred fired in the reactor
+    thread
+    """
+
+    deferred = defer.Deferred()
+
+    def done(future):
+        try:
+            result = future.result()
+        except Exception:
+            reactor.callFromThread(deferred.errback, failure.Failure())
+        else:
+            reactor.callFromThread(deferred.callback, result)
+
+    future.add_done_callback(done)
+    return deferred
+
+
+class EndpointExecutor(object):
+    """
+    Per endpoint selection of the executor running endpoint methods
+
+    :param default:       executor type for endpoints not in endpoints
+    :type default:        :py:str
+    :param endpoints:     executor type by endpoint name
+    :type endpoints:      :py:dict
+    :param max_threads:   maximum size of the thread pool
+    :type max_threads:    :py:int
+    :param max_processes: number of worker processes, CPU count by default
+    :type max_processes:  :py:int
+    """
+
+    def __init__(self, **kwargs):
+
+        self.default = 'thread'
+        self.endpoints = {}
+        self.max_threads = 8
+        self.max_processes = None
+
+        self._threadpool = None
+        self._processpool = None
+        self.configure(**kwargs)
+
+    def configure(self, default=None, endpoints=None, max_threads=None, max_processes=None):
+        """
+        Update the executor settings. Changes to the pool sizes apply to
+        pools created after the update.
+
+        :raises ValueError: on unknown executor types
+        """
+
+        for kind in [default] + list((endpoints or {}).values()):
+            if kind is not None and kind not in EXECUTOR_TYPES:
+                raise ValueError('Unknown executor type {0}, choose from {1}'.format(
+                    kind, ', '.join(EXECUTOR_TYPES)))
+        if (default == 'process' or 'process' in (endpoints or {}).values()) and ProcessPoolExecutor is None:
+            raise ValueError('Process executor requires the concurrent.futures package')
+
+        self.default = default or self.default
+        self.endpoints.update(endpoints or {})
+        self.max_threads = max_threads or self.max_threads
+        self.max_processes = max_processes or self.max_processes
+
+    def executor_type(self, endpoint):
+        """
+        Executor type used for endpoint
+
+        :rtype: :py:str
+        """
+
+        return self.endpoints.get(endpoint, self.default)
+
+    @property
+    def threadpool(self):
+        """
+        Thread pool started on first use and stopped on reactor shutdown
+        """
+
+        if self._threadpool is None:
+            self._threadpool = ThreadPool(minthreads=0, maxthreads=self.max_threads, name='mdstudio_structures')
+            self._threadpool.start()
+            reactor.addSystemEventTrigger('during', 'shutdown', self.shutdown)
+        return self._threadpool
+
+    @property
+    def processpool(self):
+        """
+        Process pool started on first use and stopped on reactor shutdown
+        """
+
+        if self._processpool is None:
+            self._processpool = ProcessPoolExecutor(max_workers=self.max_processes or multiprocessing.cpu_count())
+            if self._threadpool is None:
+                reactor.addSystemEventTrigger('during', 'shutdown', self.shutdown)
+        return self._processpool
+
+    def run_in_thread(self, func, *args, **kwargs):
+        """
+        Call func in the thread pool
+
+        :rtype: :twisted:Deferred
+        """
+
+        return threads.deferToThreadPool(reactor, self.threadpool, _attach_jvm(func), *args, **kwargs)
+
+    def run_in_process(self, func, *args):
+        """
+        Call the module level function func in the process pool
+
+        :rtype: :twisted:Deferred
+        """
+
+        return _deferred_from_future(self.processpool.submit(func, *args))
+
+    def shutdown(self):
+        """
+        Stop the thread and process pools
+        """
+
+        if self._threadpool is not None:
+            self._threadpool.stop()
+            self._threadpool = None
+        if self._processpool is not None:
+            self._processpool.shutdown(wait=False)
+            self._processpool = None
+
+
+executor = EndpointExecutor()
+
+
+def offload(endpoint):
+    """
+    Decorator running an endpoint method with signature
+    (self, request, claims) in the executor configured for the endpoint.
+
+    :param endpoint: endpoint name
+    :type endpoint:  :py:str
+    """
+
+    def decorator(func):
+
+        name = '{0}.{1}'.format(func.__module__, func.__name__)
+        _OFFLOADED[name] = func
+
+        @functools.wraps(func)
+        def wrapper(self, request, claims):
+
+            kind = executor.executor_type(endpoint)
+            if kind == 'process':
+                return executor.run_in_process(_run_offloaded, name, type(self), request, claims)
+            if kind == 'thread':
+                return executor.run_in_thread(propagate_context(_serialized(func)), self, request, claims)
+            return _serialized(func)(self, request, claims)
+
+        return wrapper
+
+    return decorator
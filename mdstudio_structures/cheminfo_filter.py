@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_filter.py
+
+Structural alert filtering of molecule batches using SMARTS catalogues.
+
+A catalogue is a named set of SMARTS patterns with an alert id each, read
+from a text file with one 'SMARTS id' pair per line ('#' comments) or from
+a CSV file with quoted SMARTS and '<regId=id>' columns as used for the
+PAINS filters. Available catalogues are:
+
+- the catalogue files in the `catalogues` directory of this package,
+  e.g. 'reactive'
+- 'pains', the PAINS filters distributed with RDKit (Baell and Holloway,
+  J. Med. Chem. 2010), when RDKit is installed
+- catalogue files configured in the 'filter_catalogues' settings
+
+Catalogues are loaded once per process. Molecules are screened against
+all patterns using the pattern fingerprints (`cheminfo_substructure`) and
+only the remaining molecule, pattern pairs are matched.
+"""
+
+import os
+import re
+import csv
+import glob
+import logging
+import threading
+
+from numpy import array, ones, uint8
+
+from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_substructure import (library_fingerprints, match_many, screen_many,
+                                                       screening_supported, smarts_cache)
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_DIR = os.path.join(os.path.dirname(__file__), 'catalogues')
+
+regid_regex = re.compile(r'regId=([^>(]+)')
+
+# Catalogue files configured in the 'filter_catalogues' settings
+catalogue_files = {}
+
+_catalogues = {}
+_catalogues_lock = threading.Lock()
+
+
+def _pains_file():
+    """
+    Path to the PAINS filters distributed with RDKit, None if RDKit is not
+    installed
+    """
+
+    try:
+        from rdkit import RDConfig
+    except ImportError:
+        return
+
+    path = os.path.join(RDConfig.RDDataDir, 'Pains', 'wehi_pains.csv')
+    if os.path.isfile(path):
+        return path
+
+
+def _merge_hydrogens(smarts):
+    """
+    Merge explicit hydrogen atoms in a SMARTS pattern into the hydrogen
+    count of their neighbours so it matches molecules with implicit
+    hydrogens. Requires RDKit, the pattern is returned unchanged otherwise.
+    """
+
+    try:
+        from rdkit import Chem
+    except ImportError:
+        return smarts
+
+    query = Chem.MolFromSmarts(smarts, mergeHs=True)
+    return Chem.MolToSmarts(query) if query is not None else smarts
+
+
+def available_catalogues():
+    """
+    List the available alert catalogues
+
+    :return: catalogue file per catalogue name
+    :rtype:  :py:dict
+    """
+
+    available = {}
+    for path in glob.glob(os.path.join(CATALOGUE_DIR, '*.txt')):
+        available[os.path.splitext(os.path.basename(path))[0]] = path
+
+    pains = _pains_file()
+    if pains:
+        available['pains'] = pains
+
+    available.update(catalogue_files)
+    return available
+
+
+def configure_catalogues(files):
+    """
+    Register additional catalogue files and drop loaded catalogues
+
+    :param files: catalogue file per catalogue name
+    :type files:  :py:dict
+    """
+
+    with _catalogues_lock:
+        catalogue_files.clear()
+        catalogue_files.update(files or {})
+        _catalogues.clear()
+
+
+def read_catalogue(path):
+    """
+    Read the alert ids and SMARTS patterns from a catalogue file
+
+    Patterns in CSV catalogues (PAINS) are written with explicit hydrogen
+    atoms which are merged into their neighbours.
+
+    :param path: catalogue file
+    :type path:  :py:str
+
+    :return:     alert ids and SMARTS patterns
+    :rtype:      :py:tuple
+    """
+
+    ids = []
+    patterns = []
+    with open(path) as catalogue:
+        if path.endswith('.csv'):
+            for row in csv.reader(catalogue):
+                if len(row) < 2:
+                    continue
+                regid = regid_regex.search(row[1])
+                ids.append(regid.group(1) if regid else row[1])
+                patterns.append(_merge_hydrogens(row[0]))
+        else:
+            for line in catalogue:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = line.split(None, 1)
+                patterns.append(fields[0])
+                ids.append(fields[1].strip() if len(fields) > 1 else fields[0])
+
+    return ids, patterns
+
+
+class AlertCatalogue(object):
+    """
+    Named set of SMARTS structural alerts
+
+    :param name:     catalogue name
+    :type name:      :py:str
+    :param ids:      alert ids
+    :type ids:       :py:list
+    :param patterns: SMARTS pattern per alert
+    :type patterns:  :py:list
+    """
+
+    def __init__(self, name, ids, patterns):
+
+        self.name = name
+        self.ids = list(ids)
+        self.patterns = list(patterns)
+
+        self._screens = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+
+        return len(self.patterns)
+
+    def screen(self, toolkit):
+        """
+        Return the alerts valid for a toolkit and their query fingerprints
+
+        Patterns the toolkit fails to parse are logged and skipped.
+
+        :param toolkit: cheminformatics toolkit to use
+        :type toolkit:  :py:str
+
+        :return:        indices of the valid alerts and their packed query
+                        fingerprint matrix, None if the toolkit does not
+                        support screening
+        :rtype:         :py:tuple
+        """
+
+        with self._lock:
+            if toolkit in self._screens:
+                return self._screens[toolkit]
+
+            valid = []
+            queries = []
+            for i, smarts in enumerate(self.patterns):
+                try:
+                    pattern = smarts_cache.get(smarts, toolkit)
+                except (IOError, ValueError):
+                    logger.warning('Alert %s of catalogue %s not supported by %s', self.ids[i], self.name, toolkit)
+                    continue
+
+                valid.append(i)
+                if screening_supported(toolkit):
+                    queries.append(pattern.calcfp().to_numpy(packed=True))
+
+            queries = array(queries, dtype=uint8) if queries else None
+            self._screens[toolkit] = (valid, queries)
+            return self._screens[toolkit]
+
+
+def load_catalogue(name):
+    """
+    Return an alert catalogue by name, read once per process
+
+    :param name: catalogue name
+    :type name:  :py:str
+
+    :return:     alert catalogue, None if not available
+    :rtype:      :py:AlertCatalogue
+    """
+
+    with _catalogues_lock:
+        if name in _catalogues:
+            return _catalogues[name]
+
+        path = available_catalogues().get(name)
+        if path is None:
+            logger.error('Alert catalogue %s not available', name)
+            return
+
+        ids, patterns = read_catalogue(path)
+        logger.info('Loaded %s alerts of catalogue %s from %s', len(ids), name, path)
+        _catalogues[name] = AlertCatalogue(name, ids, patterns)
+        return _catalogues[name]
+
+
+def mol_filter(molobjects, catalogues=('pains',), toolkit='rdk', screen=True, fingerprints=None):
+    """
+    Match molecules against the structural alerts of one or more catalogues
+
+    :param molobjects:   Cinfony molecular objects, None for molecules
+                         that could not be read
+    :type molobjects:    :py:list
+    :param catalogues:   alert catalogue names
+    :type catalogues:    :py:list
+    :param toolkit:      cheminformatics toolkit to use
+    :type toolkit:       :py:str
+    :param screen:       fingerprint screen molecules and alerts before
+                         matching
+    :type screen:        :py:bool
+    :param fingerprints: library fingerprint matrix from
+                         `library_fingerprints`, calculated when screening
+                         without it
+    :type fingerprints:  :numpy:ndarray
+
+    :return:             list of matched '<catalogue>:<alert id>' ids per
+                         molecule, None for unreadable molecules, and the
+                         number of alert matches screened out and run.
+                         None if a catalogue is not available, an alert
+                         pattern is invalid or the toolkit does not
+                         support SMARTS.
+    :rtype:              :py:tuple
+    """
+
+    if not hasattr(toolkits.get(toolkit), 'Smarts'):
+        logger.error('SMARTS matching not supported by toolkit %s', toolkit)
+        return
+
+    loaded = [load_catalogue(name) for name in catalogues]
+    if None in loaded:
+        return
+
+    molobjects = list(molobjects)
+    alerts = [None if molobject is None else [] for molobject in molobjects]
+    valid = [i for i, molobject in enumerate(molobjects) if molobject is not None]
+    stats = {'molecules': len(molobjects), 'screened': 0, 'matched': 0}
+
+    screen = screen and bool(valid) and screening_supported(toolkit)
+    if screen and fingerprints is None:
+        fingerprints = library_fingerprints(molobjects)
+
+    for catalogue in loaded:
+        indices, queries = catalogue.screen(toolkit)
+        if screen and fingerprints is not None and queries is not None:
+            candidates = screen_many(queries, fingerprints[valid])
+        else:
+            candidates = ones((len(valid), len(indices)), dtype=bool)
+
+        stats['screened'] += candidates.size - int(candidates.sum())
+        stats['matched'] += int(candidates.sum())
+        matches = match_many([catalogue.patterns[index] for index in indices], [molobjects[i] for i in valid],
+                             toolkit=toolkit, candidates=candidates)
+        if matches is None:
+            return
+
+        for row, column in zip(*matches.nonzero()):
+            alerts[valid[row]].append('{0}:{1}'.format(catalogue.name, catalogue.ids[indices[column]]))
+
+    stats['flagged'] = sum(1 for alert in alerts if alert)
+    return alerts, stats
@@ -1,18 +1,21 @@
 # -*- coding: utf-8 -*-
-from __future__ import print_function
 
 """
-file: cheminfo_molhandle.py
+file: cheminfo_fingerprint.py
 
 Cinfony driven cheminformatics fingerprint functions
 """
 
+import logging
+
 from itertools import combinations
 from scipy.spatial.distance import squareform
-from numpy import array
+from numpy import array, zeros, uint8
 
 from . import toolkits
 
+logger = logging.getLogger(__name__)
+
 RDKIT_SYM_METRIC = {'tanimoto': 'TanimotoSimilarity', 'dice': 'DiceSimilarity',
                     'cosine': 'CosineSimilarity', 'sokal': 'SokalSimilarity',
                     'russel': 'RusselSimilarity', 'kulczynski': 'KulczynskiSimilarity',
@@ -50,26 +53,68 @@ def mol_fingerprint(molobject, fp=None):
 
     afp = available_fingerprints()
     if molobject.toolkit not in afp:
-        print('No fingerprint methods supported by toolkit {0}'.format(molobject.toolkit))
+        logger.error('No fingerprint methods supported by toolkit %s', molobject.toolkit)
         return
 
     if fp:
         if fp not in afp[molobject.toolkit]:
-            print('Fingerprint methods {0} not supported by toolkit {1}'.format(
-                afp, molobject.toolkit))
+            logger.error('Fingerprint method %s not supported by toolkit %s', fp, molobject.toolkit)
             return
 
-        print('Calculate {0} fingerprint using toolkit {1}'.format(fp, molobject.toolkit))
+        logger.debug('Calculate %s fingerprint using toolkit %s', fp, molobject.toolkit)
         fpobj = molobject.calcfp(fp)
 
         return fpobj
 
-    print('Calculate fingerprint using toolkit {0}'.format(molobject.toolkit))
+    logger.debug('Calculate fingerprint using toolkit %s', molobject.toolkit)
     fpobj = molobject.calcfp()
 
     return fpobj
 
 
+def mol_fingerprint_many(molobjects, fp=None):
+    """
+    Return the fingerprints of many molecules as packed bit matrix
+
+    Uses the batch fingerprint function of the toolkit module when
+    available, which reuses the fingerprinter and output buffers for all
+    molecules. All molecules should be of the same toolkit.
+
+    :param molobjects: Cinfony molecular objects
+    :type molobjects:  :py:list
+    :param fp:         fingerprint type, toolkit default if not defined
+    :type fp:          :py:str
+
+    :return:           one row of packed fingerprint bytes per molecule
+                       in Fingerprint.to_numpy(packed=True) layout
+    :rtype:            :numpy:ndarray
+    """
+
+    molobjects = list(molobjects)
+    if not molobjects:
+        return zeros((0, 0), dtype=uint8)
+
+    toolkit = molobjects[0].toolkit
+    afp = available_fingerprints()
+    if toolkit not in afp:
+        logger.error('No fingerprint methods supported by toolkit %s', toolkit)
+        return
+
+    if fp and fp not in afp[toolkit]:
+        logger.error('Fingerprint method %s not supported by toolkit %s', fp, toolkit)
+        return
+
+    toolkit_driver = toolkits.get(toolkit)
+    if hasattr(toolkit_driver, 'calcfp_many'):
+        logger.debug('Calculate %s fingerprints of %s molecules using toolkit %s', fp, len(molobjects), toolkit)
+        if fp:
+            return toolkit_driver.calcfp_many(molobjects, fp)
+        return toolkit_driver.calcfp_many(molobjects)
+
+    fps = [mol_fingerprint(molobject, fp=fp).to_numpy(packed=True) for molobject in molobjects]
+    return array(fps, dtype=uint8)
+
+
 def mol_fingerprint_comparison(u, v, toolkit, metric='tanimoto'):
     """
     Compare two fingerprints using metric
@@ -100,7 +145,7 @@ def mol_fingerprint_comparison(u, v, toolkit, metric='tanimoto'):
         metric = getattr(rdkit.Chem.DataStructs, RDKIT_SYM_METRIC[metric])
         return rdkit.Chem.DataStructs.FingerprintSimilarity(u.fp, v.fp, metric=metric)
 
-    print('Fingerprint comparison metric {0} not supported by toolkit {1}'.format(metric, toolkit))
+    logger.error('Fingerprint comparison metric %s not supported by toolkit %s', metric, toolkit)
 
 
 def mol_fingerprint_pairwise_similarity(fps, toolkit, metric='tanimoto'):
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_format.py
+
+Structure file format detection and record splitting.
+
+The sniffer only inspects the first `SNIFF_SIZE` characters of a string or
+file (and the last few characters to separate single molecule MOL files
+from multi molecule SD files), so the cost is independent of the size of
+the structure.
+
+Multi molecule SDF, MOL2, SMILES and InChI content is split in records
+lazily. `record_offsets` indexes the byte offset of every record in a file
+so a slice of records can be read without parsing the records before it.
+"""
+
+import re
+
+SNIFF_SIZE = 4096
+
+PDB_RECORDS = ('HEADER', 'TITLE ', 'COMPND', 'REMARK', 'ATOM  ', 'HETATM', 'CRYST1', 'MODEL ', 'SEQRES',
+               'EXPDTA', 'AUTHOR', 'SOURCE', 'KEYWDS', 'JRNL  ', 'ORIGX1', 'SCALE1')
+
+# Groups of format names that describe the same file format
+FORMAT_ALIASES = ({'mol', 'sdf', 'sd', 'mdl'}, {'pdb', 'ent'}, {'cif', 'mmcif', 'mcif'},
+                  {'smi', 'smiles', 'can'})
+
+smiles_regex = re.compile(r'^([^J][A-Za-z0-9@+\-\[\]\(\)\\\/%=#$.:*]+)$')
+inchikey_regex = re.compile(r'^(InChIKey=)?[A-Z]{14}-[A-Z]{8}[SN][A-Z]-[A-Z]$')
+float_regex = re.compile(r'^[-+]?\d*\.\d+([eE][-+]?\d+)?$')
+
+
+def same_format(format1, format2):
+    """
+    Check if two format names describe the same file format
+
+    :rtype: :py:bool
+    """
+
+    if format1 == format2:
+        return True
+
+    return any(format1 in group and format2 in group for group in FORMAT_ALIASES)
+
+
+def _is_xyz(lines):
+    """
+    XYZ files: atom count, comment line, element and coordinates
+    """
+
+    if len(lines) < 3 or not lines[0].strip().isdigit():
+        return False
+
+    fields = lines[2].split()
+    return len(fields) == 4 and all(float_regex.match(field) for field in fields[1:])
+
+
+def sniff_format(content, size=SNIFF_SIZE, tail=None):
+    """
+    Detect the structure file format of content
+
+    Recognizes the InChI, InChIKey, SMILES, MOL2, CML, mmCIF, PDB, XYZ,
+    MOL and SDF formats.
+
+    :param content: structure file content, only the first `size`
+                    characters are inspected
+    :type content:  :py:str
+    :param size:    maximum number of characters to inspect
+    :type size:     :py:int
+    :param tail:    end of the content, taken from content by default
+    :type tail:     :py:str
+
+    :return:        format name or None if not recognized
+    :rtype:         :py:str
+    """
+
+    if not content:
+        return None
+
+    prefix = content[:size].lstrip()
+    if tail is None:
+        tail = content[-16:]
+
+    # Single line identifiers
+    first = prefix.partition('\n')[0].strip()
+    if first.startswith('InChI='):
+        return 'inchi'
+    if inchikey_regex.match(first):
+        return 'inchikey'
+
+    if prefix.startswith('<?xml') or prefix.startswith('<cml') or prefix.startswith('<molecule'):
+        return 'cml'
+    if prefix.startswith('@<TRIPOS>') or '\n@<TRIPOS>' in prefix:
+        return 'mol2'
+
+    # Skip comment lines for mmCIF files
+    start = prefix
+    while start.startswith('#'):
+        start = start.partition('\n')[2].lstrip()
+    if start.startswith('data_'):
+        return 'cif'
+
+    if content[:6] in PDB_RECORDS or prefix[:6] in PDB_RECORDS:
+        return 'pdb'
+
+    lines = content[:size].split('\n', 5)[:5]
+    if any('V2000' in line or 'V3000' in line for line in lines[1:]) or '\nM  END' in prefix:
+        return 'sdf' if '$$$$' in prefix or tail.rstrip().endswith('$$$$') else 'mol'
+
+    if _is_xyz(lines):
+        return 'xyz'
+
+    # SMILES, optionally followed by a name
+    tokens = first.split()
+    if 0 < len(tokens) <= 2 and not first.startswith('#') and smiles_regex.match(tokens[0]):
+        return 'smi'
+
+    return None
+
+
+def sniff_file_format(path, size=SNIFF_SIZE):
+    """
+    Detect the structure file format of a file from its header
+
+    :param path: path to the structure file
+    :type path:  :py:str
+    :param size: maximum number of characters to inspect
+    :type size:  :py:int
+
+    :return:     format name or None if not recognized
+    :rtype:      :py:str
+    """
+
+    with open(path, 'r') as handle:
+        prefix = handle.read(size)
+        tail = ''
+        if len(prefix) == size:
+            handle.seek(0, 2)
+            end = handle.tell()
+            handle.seek(max(end - 16, 0))
+            tail = handle.read()
+
+    return sniff_format(prefix, size=size, tail=tail or None)
+
+
+# Formats with one record per line
+LINE_FORMATS = ('smi', 'smiles', 'can', 'inchi', 'inchikey')
+
+
+def iter_records(content, mol_format):
+    """
+    Iterate over the molecule records in multi molecule content
+
+    Content in formats without multi molecule support is returned as a
+    single record.
+
+    :param content:    structure file content
+    :type content:     :py:str
+    :param mol_format: structure file format
+    :type mol_format:  :py:str
+
+    :return:           record generator
+    :rtype:            :py:generator
+    """
+
+    if mol_format in ('sdf', 'sd'):
+        start = 0
+        while start < len(content):
+            end = content.find('\n$$$$', start)
+            end = len(content) if end < 0 else content.find('\n', end + 5) + 1 or len(content)
+            record = content[start:end]
+            start = end
+            if record.strip():
+                yield record
+
+    elif mol_format in LINE_FORMATS:
+        for line in content.splitlines():
+            if line.strip():
+                yield line.strip()
+
+    elif mol_format == 'mol2':
+        start = content.find('@<TRIPOS>MOLECULE')
+        while start >= 0:
+            end = content.find('\n@<TRIPOS>MOLECULE', start)
+            yield content[start:len(content) if end < 0 else end + 1]
+            start = end if end < 0 else end + 1
+
+    elif content.strip():
+        yield content
+
+
+def record_offsets(path, mol_format):
+    """
+    Index the byte offsets of the molecule records in a file
+
+    :param path:       path to the structure file
+    :type path:        :py:str
+    :param mol_format: structure file format
+    :type mol_format:  :py:str
+
+    :return:           offset of the start of every record
+    :rtype:            :py:list
+    """
+
+    offsets = []
+    position = 0
+
+    # Records of other formats start at the first line or the line after
+    # the SD file record separator, also if that (title) line is blank.
+    # Blank lines at the end of the file do not start a record.
+    record_start = 0
+    with open(path, 'rb') as handle:
+        for line in handle:
+            if line.strip():
+                if mol_format in LINE_FORMATS:
+                    offsets.append(position)
+                elif mol_format == 'mol2':
+                    if line.startswith(b'@<TRIPOS>MOLECULE'):
+                        offsets.append(position)
+                elif record_start is not None:
+                    offsets.append(record_start)
+                    record_start = None
+
+                if mol_format in ('sdf', 'sd') and line.startswith(b'$$$$'):
+                    record_start = position + len(line)
+
+            position += len(line)
+
+    return offsets
+
+
+def read_records(path, mol_format, offsets, start=0, stop=None):
+    """
+    Read a slice of records from a file using the record offset index
+
+    :param path:       path to the structure file
+    :type path:        :py:str
+    :param mol_format: structure file format
+    :type mol_format:  :py:str
+    :param offsets:    record offsets from `record_offsets`
+    :type offsets:     :py:list
+    :param start:      index of the first record
+    :type start:       :py:int
+    :param stop:       index after the last record, read to the end by
+                       default
+    :type stop:        :py:int
+
+    :return:           record generator
+    :rtype:            :py:generator
+    """
+
+    if start >= len(offsets):
+        return iter([])
+
+    with open(path, 'rb') as handle:
+        handle.seek(offsets[start])
+        if stop is not None and stop < len(offsets):
+            chunk = handle.read(offsets[stop] - offsets[start])
+        else:
+            chunk = handle.read()
+
+    return iter_records(chunk.decode('utf-8'), mol_format)
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_metrics.py
+
+Lightweight latency and payload size instrumentation of the WAMP endpoints.
+
+Endpoint methods are wrapped by the `instrument` decorator that sets up a
+per-thread request context. Within a request, `phase` context managers
+accumulate the time spent in the validate, mol_read, compute, mol_write and
+response phases. At the end of the request all timings are committed at
+once to histograms in the module level `metrics` registry, keeping the
+per-phase overhead to a timer call and a dictionary update.
+
+The registry can be exported as JSON compatible dictionary or in the
+Prometheus text exposition format.
+"""
+
+import os
+import sys
+import time
+import bisect
+import tempfile
+import functools
+import threading
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# Library and function compatibility
+if sys.version_info[0] < 3:
+    string_types = (str, unicode)
+else:
+    string_types = (str, bytes)
+
+# Histogram upper bounds for phase latency in seconds and payload size in bytes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+PROMETHEUS_PREFIX = 'mdstudio_structures'
+
+_local = threading.local()
+
+
+class Histogram(object):
+    """
+    Cumulative histogram with fixed bucket upper bounds
+
+    :param bounds: sorted bucket upper bounds, an implicit +Inf bucket is added
+    :type bounds:  :py:tuple
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds):
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Add a single observation
+        """
+
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        Return (upper bound, cumulative count) tuples including +Inf
+        """
+
+        total = 0
+        buckets = []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+    def to_dict(self):
+
+        return {'count': self.count, 'sum': self.sum,
+                'mean': self.sum / self.count if self.count else None,
+                'buckets': dict(('+Inf' if bound == float('inf') else repr(bound), count)
+                                for bound, count in self.cumulative())}
+
+
+class RequestContext(object):
+    """
+    Phase timings and payload sizes of a single endpoint call
+    """
+
+    __slots__ = ('endpoint', 'toolkit', 'phases', 'payloads')
+
+    def __init__(self, endpoint, toolkit=None):
+
+        self.endpoint = endpoint
+        self.toolkit = toolkit
+        self.phases = {}
+        self.payloads = {}
+
+    def record(self, phase, elapsed):
+
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+
+class Phase(object):
+    """
+    Context manager timing a phase of the active request
+
+    A no-op when used outside of an instrumented endpoint call.
+    """
+
+    __slots__ = ('name', 'context', 'start')
+
+    def __init__(self, name):
+
+        self.name = name
+
+    def __enter__(self):
+
+        self.context = getattr(_local, 'context', None)
+        self.start = timer()
+        return self
+
+    def __exit__(self, *exc_info):
+
+        if self.context is not None:
+            self.context.record(self.name, timer() - self.start)
+        return False
+
+
+phase = Phase
+
+
+def payload_size(obj):
+    """
+    Approximate size of a request or response payload in bytes
+
+    Sums the lengths of all strings in the (nested) payload which, for
+    path_file objects, is dominated by the structure file content.
+    """
+
+    if isinstance(obj, dict):
+        return sum(payload_size(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(payload_size(value) for value in obj)
+    if isinstance(obj, string_types):
+        return len(obj)
+    return 0
+
+
+class MetricsRegistry(object):
+    """
+    Thread safe registry of endpoint latency, payload size and request
+    count metrics
+    """
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self.textfile = None
+        self.textfile_interval = 60
+        self._textfile_written = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Remove all recorded metrics
+        """
+
+        with self._lock:
+            self.phases = {}
+            self.payloads = {}
+            self.requests = {}
+
+    def commit(self, context, status):
+        """
+        Add the timings and payload sizes of a finished request
+        """
+
+        toolkit = context.toolkit or ''
+        with self._lock:
+            for name, elapsed in context.phases.items():
+                key = (context.endpoint, name, toolkit)
+                if key not in self.phases:
+                    self.phases[key] = Histogram(LATENCY_BUCKETS)
+                self.phases[key].observe(elapsed)
+
+            for direction, size in context.payloads.items():
+                key = (context.endpoint, direction, toolkit)
+                if key not in self.payloads:
+                    self.payloads[key] = Histogram(PAYLOAD_BUCKETS)
+                self.payloads[key].observe(size)
+
+            key = (context.endpoint, toolkit, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+        if self.textfile and timer() - self._textfile_written > self.textfile_interval:
+            self._textfile_written = timer()
+            self.write_textfile(self.textfile)
+
+    def snapshot(self):
+        """
+        Return all metrics as JSON serializable dictionary
+
+        :rtype: :py:dict
+        """
+
+        with self._lock:
+            phases = [dict(endpoint=e, phase=p, toolkit=t, **h.to_dict())
+                      for (e, p, t), h in sorted(self.phases.items())]
+            payloads = [dict(endpoint=e, direction=d, toolkit=t, **h.to_dict())
+                        for (e, d, t), h in sorted(self.payloads.items())]
+            requests = [{'endpoint': e, 'toolkit': t, 'status': s, 'count': c}
+                        for (e, t, s), c in sorted(self.requests.items())]
+
+        return {'phases': phases, 'payloads': payloads, 'requests': requests}
+
+    def to_prometheus(self):
+        """
+        Return all metrics in the Prometheus text exposition format
+
+        :rtype: :py:str
+        """
+
+        lines = []
+
+        def labels(**kwargs):
+            return ','.join('{0}="{1}"'.format(k, str(v).replace('"', '\\"')) for k, v in sorted(kwargs.items()))
+
+        def histogram(name, description, histograms, label_names):
+            lines.append('# HELP {0}_{1} {2}'.format(PROMETHEUS_PREFIX, name, description))
+            lines.append('# TYPE {0}_{1} histogram'.format(PROMETHEUS_PREFIX, name))
+            for key, hist in sorted(histograms.items()):
+                base = dict(zip(label_names, key))
+                for bound, count in hist.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('{0}_{1}_bucket{{{2}}} {3}'.format(PROMETHEUS_PREFIX, name, labels(le=le, **base),
+                                                                     count))
+                lines.append('{0}_{1}_sum{{{2}}} {3!r}'.format(PROMETHEUS_PREFIX, name, labels(**base), hist.sum))
+                lines.append('{0}_{1}_count{{{2}}} {3}'.format(PROMETHEUS_PREFIX, name, labels(**base), hist.count))
+
+        with self._lock:
+            histogram('phase_seconds', 'Endpoint phase latency in seconds', self.phases,
+                      ('endpoint', 'phase', 'toolkit'))
+            histogram('payload_bytes', 'Endpoint request and response payload size in bytes', self.payloads,
+                      ('endpoint', 'direction', 'toolkit'))
+
+            lines.append('# HELP {0}_requests_total Endpoint calls by status'.format(PROMETHEUS_PREFIX))
+            lines.append('# TYPE {0}_requests_total counter'.format(PROMETHEUS_PREFIX))
+            for (endpoint, toolkit, status), count in sorted(self.requests.items()):
+                lines.append('{0}_requests_total{{{1}}} {2}'.format(
+                    PROMETHEUS_PREFIX, labels(endpoint=endpoint, toolkit=toolkit, status=status), count))
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """
+        Atomically write the metrics in Prometheus format to path, for use
+        with the node_exporter textfile collector
+        """
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        with os.fdopen(fd, 'w') as outfile:
+            outfile.write(self.to_prometheus())
+        os.chmod(tmp, 0o644)
+        getattr(os, 'replace', os.rename)(tmp, path)
+
+
+metrics = MetricsRegistry()
+
+
+def propagate_context(func):
+    """
+    Bind the active request context to func so phases are recorded when
+    func is called from another thread, such as an executor worker.
+
+    :param func: callable to bind
+    :type func:  :py:func
+
+    :rtype:      :py:func
+    """
+
+    context = getattr(_local, 'context', None)
+    if context is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+
+        previous = getattr(_local, 'context', None)
+        _local.context = context
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.context = previous
+
+    return wrapper
+
+
+def instrument(endpoint):
+    """
+    Decorator recording latency, payload size and status of an endpoint
+    method with signature (self, request, claims).
+
+    Endpoint methods returning a Deferred are recorded when the Deferred
+    fires.
+
+    :param endpoint: endpoint name used as metric label
+    :type endpoint:  :py:str
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(self, request, claims):
+
+            context = RequestContext(endpoint, request.get('toolkit'))
+            context.payloads['request'] = payload_size(request)
+            start = timer()
+
+            def finish(response):
+
+                status = 'error'
+                if isinstance(response, dict):
+                    status = response.get('status') or response.get('session') or 'completed'
+                    context.payloads['response'] = payload_size(response)
+                context.record('total', timer() - start)
+                metrics.commit(context, status)
+                return response
+
+            previous = getattr(_local, 'context', None)
+            _local.context = context
+            try:
+                response = func(self, request, claims)
+            except Exception:
+                finish(None)
+                raise
+            finally:
+                _local.context = previous
+
+            if hasattr(response, 'addBoth'):
+                return response.addBoth(finish)
+            return finish(response)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_mmcif.py
+
+Lightweight mmCIF reader and writer functions for the '_atom_site' loop.
+
+The reader tokenizes the atom records line by line and only extracts the
+columns that are needed, either streaming the raw lines or collecting the
+values in column arrays. No per-atom Python objects are created, making it
+suitable for very large assemblies that are only distributed as mmCIF.
+"""
+
+import re
+
+import numpy
+
+# mmCIF values are whitespace separated. Quoted values may contain
+# whitespace and are closed by a quote followed by whitespace.
+_token_regex = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""")
+
+# Numeric '_atom_site' columns and their NumPy dtype
+ATOM_SITE_DTYPES = {'id': numpy.int64, 'label_seq_id': numpy.int64, 'auth_seq_id': numpy.int64,
+                    'pdbx_PDB_model_num': numpy.int64, 'Cartn_x': numpy.float64,
+                    'Cartn_y': numpy.float64, 'Cartn_z': numpy.float64,
+                    'occupancy': numpy.float64, 'B_iso_or_equiv': numpy.float64}
+
+# '_atom_site' columns used to write PDB ATOM/HETATM records, in order of
+# preference when multiple columns describe the same property.
+PDB_RECORD_COLUMNS = (('group_PDB',), ('id',), ('auth_atom_id', 'label_atom_id'), ('label_alt_id',),
+                      ('auth_comp_id', 'label_comp_id'), ('auth_asym_id', 'label_asym_id'),
+                      ('auth_seq_id', 'label_seq_id'), ('pdbx_PDB_ins_code',), ('Cartn_x',),
+                      ('Cartn_y',), ('Cartn_z',), ('occupancy',), ('B_iso_or_equiv',),
+                      ('type_symbol',), ('pdbx_formal_charge',), ('pdbx_PDB_model_num',))
+
+_pdb_atom_record = '{0:<6}{1:>5} {2:<4}{3:1}{4:>3} {5:1}{6:>4}{7:1}   {8:>8.3f}{9:>8.3f}{10:>8.3f}' \
+                   '{11:>6.2f}{12:>6.2f}          {13:>2}{14:<2}\n'
+
+
+def is_mmcif(content):
+    """
+    Check if a string looks like a (mm)CIF data block
+
+    :param content: structure file content
+    :type content:  :py:str
+
+    :rtype:         :py:bool
+    """
+
+    return content.lstrip()[:5] == 'data_'
+
+
+def tokenize(line):
+    """
+    Split a mmCIF data line into its values, honouring quoted values
+
+    :param line: mmCIF data line
+    :type line:  :py:str
+
+    :rtype:      :py:list
+    """
+
+    if "'" not in line and '"' not in line:
+        return line.split()
+    return [single or double or bare for single, double, bare in _token_regex.findall(line)]
+
+
+def _null(value):
+
+    return value in ('.', '?')
+
+
+class AtomSiteParser(object):
+    """
+    Lazy parser of the '_atom_site' loop in a mmCIF file
+
+    Iterating over the parser yields (line, values) tuples for every atom
+    record where values holds the tokens of the line. Lines before and after
+    the loop are collected in the `header` and `trailer` attributes. The
+    column names of the loop are available in `columns` once the loop header
+    has been parsed.
+
+    :param handle: iterable over the lines of a mmCIF file
+    :type handle:  file object
+    """
+
+    def __init__(self, handle):
+
+        self.handle = iter(handle)
+        self.header = []
+        self.trailer = []
+        self.columns = []
+
+    def column_index(self, *names):
+        """
+        Return the index of the first available column in names or None
+        """
+
+        for name in names:
+            if name in self.columns:
+                return self.columns.index(name)
+        return None
+
+    def _read_loop_header(self):
+        """
+        Read lines up to the first atom record. Return the first data line
+        """
+
+        in_loop = False
+        for line in self.handle:
+            stripped = line.strip()
+            if stripped.startswith('_atom_site.'):
+                in_loop = True
+                self.columns.append(stripped.split('.', 1)[1].split()[0])
+            elif in_loop:
+                return line
+            self.header.append(line)
+
+        return None
+
+    def __iter__(self):
+
+        line = self._read_loop_header()
+        ncolumns = len(self.columns)
+        values = []
+        record = []
+        while line is not None:
+            if line[:1] in ('#', '_') or line.startswith('loop_') or line.startswith('data_'):
+                self.trailer.append(line)
+                self.trailer.extend(self.handle)
+                break
+
+            # Records normally occupy a single line but may be split over
+            # multiple lines.
+            values.extend(tokenize(line))
+            record.append(line)
+            if len(values) >= ncolumns:
+                yield ''.join(record), values
+                values = []
+                record = []
+
+            line = next(self.handle, None)
+
+
+def read_atom_site(handle, columns=None):
+    """
+    Read '_atom_site' columns into NumPy column arrays
+
+    Numeric columns are converted to integer or float arrays, undefined
+    values ('.' or '?') become NaN for float columns and -1 for integer
+    columns. All other columns are returned as string arrays.
+
+    :param handle:  iterable over the lines of a mmCIF file
+    :type handle:   file object
+    :param columns: column names to read, all columns by default
+    :type columns:  :py:list
+
+    :return:        column name to array mapping
+    :rtype:         :py:dict
+    """
+
+    parser = AtomSiteParser(handle)
+    records = iter(parser)
+    first = next(records, None)
+    if first is None:
+        return {}
+
+    columns = [c for c in (columns or parser.columns) if c in parser.columns]
+    indices = [parser.column_index(c) for c in columns]
+    data = [[value] for value in (first[1][i] for i in indices)]
+    for line, values in records:
+        for column, i in zip(data, indices):
+            column.append(values[i])
+
+    arrays = {}
+    for name, values in zip(columns, data):
+        dtype = ATOM_SITE_DTYPES.get(name)
+        if dtype is numpy.float64:
+            values = [numpy.nan if _null(v) else v for v in values]
+        elif dtype is numpy.int64:
+            values = [-1 if _null(v) else v for v in values]
+        arrays[name] = numpy.array(values, dtype=dtype or str)
+
+    return arrays
+
+
+def mmcif_remove_residues(handle, residues, outfile, output_format='cif'):
+    """
+    Remove residues by name from a mmCIF structure
+
+    Atom records are streamed from handle to outfile, without building a
+    structure object. The output is written as mmCIF (all other data blocks
+    and categories untouched) or as PDB ATOM/HETATM records.
+
+    :param handle:        iterable over the lines of a mmCIF file
+    :type handle:         file object
+    :param residues:      residue names to remove
+    :type residues:       :py:list
+    :param outfile:       file like object to write to
+    :type outfile:        file object
+    :param output_format: 'cif' or 'pdb'
+    :type output_format:  :py:str
+
+    :return:              names of the removed residues
+    :rtype:               :py:list
+    :raises ValueError:   if the atom records have no residue name column
+    """
+
+    to_remove = set(r.upper() for r in residues)
+    parser = AtomSiteParser(handle)
+    records = iter(parser)
+    first = next(records, None)
+
+    comp_idx = parser.column_index('label_comp_id', 'auth_comp_id')
+    if first is not None and comp_idx is None:
+        raise ValueError('mmCIF atom records define neither "label_comp_id" nor "auth_comp_id"')
+
+    residue_idx = [parser.column_index(*names) for names in
+                   (('pdbx_PDB_model_num',), ('label_asym_id', 'auth_asym_id'),
+                    ('label_seq_id', 'auth_seq_id'), ('pdbx_PDB_ins_code',))]
+    residue_idx = [i for i in residue_idx if i is not None]
+
+    writer = None
+    if output_format == 'pdb':
+        writer = PDBRecordWriter(parser, outfile)
+    else:
+        outfile.writelines(parser.header)
+
+    removed = []
+    last_removed = None
+    if first is not None:
+        for line, values in _chain_first(first, records):
+            if values[comp_idx].upper() in to_remove:
+                residue = tuple(values[i] for i in residue_idx)
+                if residue != last_removed:
+                    removed.append(values[comp_idx].upper())
+                    last_removed = residue
+            elif writer is not None:
+                writer.write(values)
+            else:
+                outfile.write(line)
+
+    if writer is not None:
+        writer.close()
+    else:
+        outfile.writelines(parser.trailer)
+
+    return removed
+
+
+def _chain_first(first, records):
+
+    yield first
+    for record in records:
+        yield record
+
+
+class PDBRecordWriter(object):
+    """
+    Write '_atom_site' records as PDB ATOM/HETATM records
+
+    :param parser:  parser providing the '_atom_site' column names
+    :type parser:   :AtomSiteParser
+    :param outfile: file like object to write to
+    :type outfile:  file object
+    """
+
+    def __init__(self, parser, outfile):
+
+        self.outfile = outfile
+        self.indices = [parser.column_index(*names) for names in PDB_RECORD_COLUMNS]
+        self.model = None
+
+    def _value(self, values, column, default=''):
+
+        i = self.indices[column]
+        if i is None or _null(values[i]):
+            return default
+        return values[i]
+
+    def write(self, values):
+        """
+        Write a single atom record
+        """
+
+        value = self._value
+        model = value(values, 15, '1')
+        if model != self.model:
+            if self.model is not None:
+                self.outfile.write('ENDMDL\n')
+            self.outfile.write('MODEL     {0:>4}\n'.format(model))
+            self.model = model
+
+        chain = value(values, 5, ' ')
+        if len(chain) > 1:
+            raise ValueError('Chain identifier "{0}" cannot be represented in PDB format'.format(chain))
+
+        element = value(values, 13).upper()
+        name = value(values, 2)
+        if len(name) < 4 and len(element) < 2:
+            name = ' {0}'.format(name)
+
+        charge = value(values, 14)
+        if charge and charge != '0':
+            charge = '{0}{1}'.format(charge.lstrip('+-'), '-' if charge.startswith('-') else '+')
+        else:
+            charge = ''
+
+        self.outfile.write(_pdb_atom_record.format(
+            value(values, 0, 'ATOM'), int(value(values, 1, '0')) % 100000, name, value(values, 3),
+            value(values, 4)[-3:], chain, value(values, 6)[-4:], value(values, 7),
+            float(value(values, 8, '0')), float(value(values, 9, '0')), float(value(values, 10, '0')),
+            float(value(values, 11, '1')), float(value(values, 12, '0')), element, charge))
+
+    def close(self):
+        """
+        Close the last model and write the END record
+        """
+
+        if self.model is not None:
+            self.outfile.write('ENDMDL\n')
+        self.outfile.write('END\n')
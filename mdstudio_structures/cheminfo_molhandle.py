@@ -6,50 +6,96 @@ file: cheminfo_molhandle.py
 Cinfony driven cheminformatics molecule read, write and manipulate functions
 """
 
-import re
 import os
 import sys
+import numpy
+import logging
+import tempfile
+import itertools
 
 from . import toolkits
+from .cheminfo_payload import decode_content
+from .cheminfo_format import LINE_FORMATS, sniff_format, sniff_file_format, same_format, iter_records, read_records
 
-smiles_regex = re.compile('^([^J][A-Za-z0-9@+\-\[\]\(\)\\\/%=#$]+)$')
+logger = logging.getLogger(__name__)
 
+# Upper limit to the worker threads of a batch conversion request
+MAX_CONVERT_THREADS = 16
 
-def mol_validate_file_object(path_file):
+
+def mol_validate_file_object(path_file, load=True):
     """
     Validate a MDStudio path_file object
 
-    - Check if 'content' is a InChI or SMILES string and set extension
-      (mol_format)
-    - If no 'content' check if path exists
+    - Decode compressed 'content' according to 'encoding'
+    - Detect the file format from the start of 'content' (or the header of
+      the file at 'path'). Detected line notations (SMILES, InChI) replace
+      the extension unless it denotes the same format. Other detected
+      formats only set a missing or line notation extension, dialects the
+      detection does not tell apart (e.g. PDBQT and PQR content detected
+      as PDB) keep the given extension
+    - If no 'content' check if path exists and load its content unless
+      `load` is False
 
     :param path_file: path_file object
     :type path_file:  :py:dict
+    :param load:      load the file at 'path' into 'content'
+    :type load:       :py:bool
 
     :return:          validated path_file object
     :rtype:           :py:dict
     """
 
     content = path_file['content']
+    if content is not None and path_file.get('encoding'):
+        content = path_file['content'] = decode_content(content, path_file['encoding'])
+        path_file['encoding'] = 'utf8'
+
+    mol_format = None
     if content is not None:
+        mol_format = sniff_format(content)
+
+    elif path_file['path'] is not None and os.path.isfile(path_file['path']):
+        mol_format = sniff_file_format(path_file['path'])
+
+        if load:
+            with open(path_file['path']) as pf:
+                path_file['content'] = pf.read()
+
+    extension = (path_file.get('extension') or '').lstrip('.')
+    if mol_format and not same_format(extension, mol_format):
+        if mol_format in LINE_FORMATS or not extension or extension in LINE_FORMATS:
+            path_file['extension'] = mol_format
+
+    return path_file
+
+
+def mol_read_file_object(path_file, toolkit='pybel'):
+    """
+    Import a validated path_file object in a cheminformatics toolkit
+    molecular object
 
-        # SMILES and InChI are single line strings
-        if len(content.split('\n')) == 1:
+    Structures defined by 'path' only are parsed from file by the toolkit
+    file reader without loading the file content first. The content is
+    loaded for toolkits without file reader.
 
-            # Test for InChI type
-            if content.startswith('InChI='):
-                path_file['extension'] = 'inchi'
+    :param path_file: path_file object
+    :type path_file:  :py:dict
+    :param toolkit:   cheminformatics toolkit to use
+    :type toolkit:    :py:str
 
-            # Test for SMILES
-            if smiles_regex.match(path_file['content']):
-                path_file['extension'] = 'smi'
+    :rtype:           :cinfony:molobject
+    """
 
-    elif path_file['path'] is not None and os.path.exists(path_file['path']):
+    mol_format = (path_file.get('extension') or '').lstrip('.') or None
+    if path_file['content'] is None and path_file.get('path'):
+        if hasattr(toolkits.get(toolkit), 'readfile'):
+            return mol_read(path_file['path'], mol_format=mol_format, from_file=True, toolkit=toolkit)
 
         with open(path_file['path']) as pf:
             path_file['content'] = pf.read()
 
-    return path_file
+    return mol_read(path_file['content'], mol_format=mol_format, toolkit=toolkit)
 
 
 def mol_read(mol, mol_format=None, from_file=False, toolkit='pybel', default_mol_name='ligand'):
@@ -59,7 +105,7 @@ def mol_read(mol, mol_format=None, from_file=False, toolkit='pybel', default_mol
 
     toolkit_driver = toolkits.get(toolkit)
     if not toolkit_driver:
-        print('Cheminformatics toolkit {0} not active'.format(toolkit))
+        logger.error('Cheminformatics toolkit %s not active', toolkit)
         return
 
     # Get molecular file format from file extension if path
@@ -68,7 +114,7 @@ def mol_read(mol, mol_format=None, from_file=False, toolkit='pybel', default_mol
 
     # Is the file format supported by the toolkit
     if mol_format not in toolkit_driver.informats:
-        print('Molecular input file format "{0}" not supported by {1}'.format(mol_format, toolkit))
+        logger.error('Molecular input file format "%s" not supported by %s', mol_format, toolkit)
         return
 
     try:
@@ -81,34 +127,136 @@ def mol_read(mol, mol_format=None, from_file=False, toolkit='pybel', default_mol
         else:
             molobject = toolkit_driver.readstring(mol_format, mol)
     except IOError as e:
-        print(e)
+        logger.error('Unable to read %s molecule using %s: %s', mol_format, toolkit, e)
         return
 
     if isinstance(molobject, list):
         molobject = molobject[0]
-    # Set the molecular title to something meaningful
+
+    return _register_molobject(molobject, mol_format, toolkit, default_mol_name)
+
+
+def _register_molobject(molobject, mol_format, toolkit, default_mol_name='ligand'):
+    """
+    Set a meaningful title and register the import file format and toolkit
+    in molobject
+    """
+
     if not getattr(molobject, 'title', None):
         molobject.title = default_mol_name
     if not all([i.isalnum() for i in molobject.title]):
         molobject.title = default_mol_name
 
-    # Register import file format and toolkit in molobject
     molobject.mol_format = mol_format
     molobject.toolkit = toolkit
 
     return molobject
 
 
+def _read_record(toolkit_driver, mol_format, record):
+    """
+    Read a single record of multi molecule content
+
+    Toolkits that only read single molecule blocks from strings parse SD
+    file records as MOL block.
+    """
+
+    try:
+        return toolkit_driver.readstring(mol_format, record)
+    except ValueError:
+        if mol_format != 'sdf':
+            raise
+        return toolkit_driver.readstring('mol', record)
+
+
+def mol_read_many(mol, mol_format=None, from_file=False, toolkit='pybel', default_mol_name='ligand',
+                  start=0, stop=None, offsets=None):
+    """
+    Lazily import all molecules in a multi molecule structure file or
+    string
+
+    Files are parsed by the toolkit file reader (e.g. RDKit SDMolSupplier,
+    Pybel readfile, Indigo iterators). Strings are split in records that
+    are parsed one at a time. Records that fail to parse yield None to
+    keep the molecule index aligned with the record index.
+
+    When the record offsets of a file are given, as returned by
+    `cheminfo_format.record_offsets`, the records from `start` to `stop`
+    are read directly without parsing the records before them.
+
+    :param mol:              structure file path or content
+    :type mol:               :py:str
+    :param mol_format:       structure file format
+    :type mol_format:        :py:str
+    :param from_file:        mol is a file path
+    :type from_file:         :py:bool
+    :param toolkit:          cheminformatics toolkit to use
+    :type toolkit:           :py:str
+    :param default_mol_name: title for molecules without a valid title
+    :type default_mol_name:  :py:str
+    :param start:            index of the first molecule
+    :type start:             :py:int
+    :param stop:             index after the last molecule, all by default
+    :type stop:              :py:int
+    :param offsets:          record byte offsets of the file
+    :type offsets:           :py:list
+
+    :return:                 molecule generator
+    :rtype:                  :py:generator
+    """
+
+    toolkit_driver = toolkits.get(toolkit)
+    if not toolkit_driver:
+        logger.error('Cheminformatics toolkit %s not active', toolkit)
+        return
+
+    if not mol_format and from_file:
+        mol_format = mol.split('.')[-1] or None
+
+    if mol_format not in toolkit_driver.informats:
+        logger.error('Molecular input file format "%s" not supported by %s', mol_format, toolkit)
+        return
+
+    if from_file and offsets is None and hasattr(toolkit_driver, 'readfile'):
+        try:
+            molobjects = itertools.islice(toolkit_driver.readfile(mol_format, mol), start, stop)
+        except IOError as e:
+            logger.error('Unable to read %s molecules using %s: %s', mol_format, toolkit, e)
+            return
+
+        for molobject in molobjects:
+            yield _register_molobject(molobject, mol_format, toolkit, default_mol_name)
+        return
+
+    if from_file and offsets is not None:
+        records = read_records(mol, mol_format, offsets, start=start, stop=stop)
+    elif from_file:
+        with open(mol) as mol_file:
+            records = itertools.islice(iter_records(mol_file.read(), mol_format), start, stop)
+    else:
+        records = itertools.islice(iter_records(mol, mol_format), start, stop)
+
+    for record in records:
+        try:
+            molobject = _read_record(toolkit_driver, mol_format, record)
+        except IOError as e:
+            logger.error('Unable to read %s molecule using %s: %s', mol_format, toolkit, e)
+            yield None
+            continue
+
+        yield _register_molobject(molobject, mol_format, toolkit, default_mol_name)
+
+
 def mol_write(molobject, mol_format=None, file_path=None):
 
     toolkit_driver = toolkits.get(molobject.toolkit)
     if not toolkit_driver:
-        print('Cheminformatics toolkit {0} not active'.format(molobject.toolkit))
+        logger.error('Cheminformatics toolkit %s not active', molobject.toolkit)
         return
 
     mol_format = mol_format or getattr(molobject, 'mol_format', None)
     if mol_format not in toolkit_driver.outformats:
-        print('Molecular output file format "{0}" not supported by {1}'.format(mol_format, molobject.toolkit))
+        logger.error('Molecular output file format "%s" not supported by %s', mol_format, molobject.toolkit)
         return
 
     output = molobject.write(mol_format, file_path, overwrite=True)
@@ -118,6 +266,71 @@ def mol_write(molobject, mol_format=None, file_path=None):
     return output.strip()
 
 
+def mol_convert_many(mols, input_format, output_formats=('smi',), toolkit='pybel', threads=4):
+    """
+    Convert many line notations or names to one or more output formats
+
+    Toolkits providing a batch conversion function (OPSIN IUPAC name
+    conversion) convert all structures in one call, using `threads`
+    worker threads (at most MAX_CONVERT_THREADS). Other toolkits read and
+    write the structures one at a time.
+
+    :param mols:           structures as string, e.g. SMILES, InChI or
+                           IUPAC names
+    :type mols:            :py:list
+    :param input_format:   structure input format
+    :type input_format:    :py:str
+    :param output_formats: structure output formats
+    :type output_formats:  :py:list
+    :param toolkit:        cheminformatics toolkit to use
+    :type toolkit:         :py:str
+    :param threads:        worker threads for batch conversion
+    :type threads:         :py:int
+
+    :return:               list of output strings per output format and
+                           list of error messages, None for converted
+                           structures. None if the formats are not
+                           supported by the toolkit.
+    :rtype:                :py:tuple
+    """
+
+    toolkit_driver = toolkits.get(toolkit)
+    if not toolkit_driver:
+        logger.error('Cheminformatics toolkit %s not active', toolkit)
+        return
+
+    if input_format not in toolkit_driver.informats:
+        logger.error('Molecular input file format "%s" not supported by %s', input_format, toolkit)
+        return
+
+    for output_format in output_formats:
+        if output_format not in toolkit_driver.outformats:
+            logger.error('Molecular output file format "%s" not supported by %s', output_format, toolkit)
+            return
+
+    if hasattr(toolkit_driver, 'convert_many'):
+        threads = max(1, min(threads or 1, MAX_CONVERT_THREADS))
+        return toolkit_driver.convert_many(mols, output_formats, threads=threads)
+
+    output = dict((output_format, []) for output_format in output_formats)
+    errors = []
+    for mol in mols:
+        try:
+            molobject = toolkit_driver.readstring(input_format, mol)
+            converted = [molobject.write(output_format).strip() for output_format in output_formats]
+        except (IOError, ValueError) as e:
+            logger.debug('Unable to convert %s molecule using %s: %s', input_format, toolkit, e)
+            converted = [None] * len(output_formats)
+            errors.append(str(e) or 'Conversion failed')
+        else:
+            errors.append(None)
+
+        for output_format, value in zip(output_formats, converted):
+            output[output_format].append(value)
+
+    return output, errors
+
+
 def mol_attributes(molobject):
     """
     Common and toolkit specific molecular attributes
@@ -135,8 +348,8 @@ def mol_attributes(molobject):
 def mol_addh(molobject, polaronly=False, correctForPH=False, pH=7.4):
 
     if molobject.toolkit == 'pybel':
-        print(
-            'Add hydrogens. Toolkit: {0}, only polar: {1}, correct pH: {2}, pH: {3}'.format(molobject.toolkit, polaronly, correctForPH, pH))
+        logger.debug('Add hydrogens. Toolkit: %s, only polar: %s, correct pH: %s, pH: %s',
+                     molobject.toolkit, polaronly, correctForPH, pH)
         molobject.OBMol.AddHydrogens(polaronly, correctForPH, pH)
     else:
         molobject.addh()
@@ -148,12 +361,32 @@ def mol_removeh(molobject):
     """
     Remove hydrogens from the structure
     """
-    print('Remove hydrogen atoms from structure: {0}'.format(molobject.title))
+    logger.debug('Remove hydrogen atoms from structure: %s', molobject.title)
     molobject.removeh()
 
     return molobject
 
 
+def mol_coordinates(molobject):
+    """
+    Return the atom coordinates of a molecule as (n_atoms, 3) array
+
+    Uses the bulk coordinate access of the toolkit Molecule class if
+    available, the coordinates of the individual atoms otherwise.
+
+    :param molobject: Cinfony molecular object
+    :type molobject:  :cinfony:molobject
+
+    :rtype:           :numpy:ndarray
+    """
+
+    if hasattr(type(molobject), 'coordinates'):
+        return molobject.coordinates
+
+    coords = [atom.coords for atom in molobject.atoms]
+    return numpy.array(coords, dtype=numpy.float64).reshape(-1, 3)
+
+
 def mol_make3D(molobject, forcefield='mmff94', localopt=True, steps=50):
     """
     Convert 1D or 2D to a 3D representation.
@@ -165,24 +398,21 @@ def mol_make3D(molobject, forcefield='mmff94', localopt=True, steps=50):
     # RDKit has no 'dim' variable, add it
     if molobject.toolkit in ('rdk', 'webel'):
         try:
-            molobject.dim = len(molobject.atoms[0].coords)
+            molobject.dim = mol_coordinates(molobject).shape[1]
         except AttributeError:
             molobject.dim = 0
 
     # If molobject has 3 dimensions, check if coordinates are 3D
     if molobject.dim == 3:
-        coord_sum = [0, 0, 0]
-        for atom in molobject.atoms:
-            coord_sum = [a + abs(b) for a, b in zip(coord_sum, atom.coords)]
+        coord_sum = numpy.abs(mol_coordinates(molobject)).sum(axis=0)
 
         # If truely 3D, the sum of all dimensions should be larger than 0
-        if all(dim > 0 for dim in coord_sum):
-            print('Molecule {0} already in 3D'.format(molobject.title))
+        if numpy.all(coord_sum > 0):
+            logger.debug('Molecule %s already in 3D', molobject.title)
             return molobject
 
     if molobject.toolkit in ('cdk', 'webel'):
-        print(
-            'Conversion to 3D coordinate set not supported by {0} toolkit'.format(molobject.toolkit))
+        logger.error('Conversion to 3D coordinate set not supported by %s toolkit', molobject.toolkit)
         return None
 
     molobject.make3D(forcefield=forcefield, steps=steps)
@@ -192,33 +422,52 @@ def mol_make3D(molobject, forcefield='mmff94', localopt=True, steps=50):
     return molobject
 
 
+def rotation_matrix(axis, angle):
+    """
+    Rotation matrix for a rotation about an axis through the origin
+
+    Follows the OpenBabel matrix3x3.RotAboutAxisByAngle convention that
+    rotates clockwise for a positive angle looking down the axis.
+
+    :param axis:  x, y, z components of the rotation axis
+    :type axis:   :py:list
+    :param angle: rotation angle in degrees
+    :type angle:  :py:float
+
+    :rtype:       :numpy:ndarray
+    """
+
+    axis = numpy.asarray(axis, dtype=numpy.float64)
+    norm = numpy.linalg.norm(axis)
+    if norm == 0 or angle == 0:
+        return numpy.identity(3)
+
+    x, y, z = axis / norm
+    theta = -numpy.radians(angle)
+    c, s = numpy.cos(theta), numpy.sin(theta)
+
+    # Rodrigues' rotation formula: cI + s[k]x + (1 - c)kk^T
+    cross = numpy.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    return c * numpy.identity(3) + s * cross + (1 - c) * numpy.outer((x, y, z), (x, y, z))
+
+
 def mol_rotate(molobject, vector=None):
     """
     Rotate molecule coordinate frame by a vector describing x,y,z and angle
+
+    The angle is in degrees, the rotation axis passes through the origin.
     """
 
     if vector is None:
         vector = [0, 0, 0, 0]
 
-    if molobject.toolkit != 'pybel':
-        print('Rotation only supported by OpenBabel Pybel object')
+    if not hasattr(type(molobject), 'coordinates'):
+        logger.error('Rotation not supported by %s toolkit', molobject.toolkit)
         return
 
-    toolkit_driver = toolkits.get(molobject.toolkit)
     x, y, z, angle = vector
-    matrix = toolkit_driver.ob.matrix3x3()
-
-    # calculates a rotation matrix around the axes specified,
-    # by angle specified
-    matrix.RotAboutAxisByAngle(
-        toolkit_driver.ob.vector3(x, y, z), angle)
-    rotarray = toolkit_driver.ob.doubleArray(9)
-
-    # convert the matrix to an array
-    matrix.GetArray(rotarray)
-
-    # rotates the supplied molecule object
-    molobject.OBMol.Rotate(rotarray)
+    matrix = rotation_matrix((x, y, z), angle)
+    molobject.coordinates = mol_coordinates(molobject).dot(matrix.T)
 
     return molobject
 
@@ -229,13 +478,14 @@ def mol_copy(molobject):
     """
 
     mol_to_string = mol_write(molobject)
-    return mol_read(mol_to_string, mol_format=molobject.mol_format)
+    return mol_read(mol_to_string, mol_format=molobject.mol_format, toolkit=molobject.toolkit)
 
 
-def mol_combine_rotations(molobject, rotations=None):
+def mol_combine_rotations(molobject, rotations=None, file_path=None):
     """
     Takes a pybel molecule and array of rotations to perform on it
-    Returns array with rotated pybel molecules
+    Returns the rotated molecules combined in a multi-molecule file,
+    inline or written to file_path
     """
 
     rotated_mols = [molobject]
@@ -245,20 +495,31 @@ def mol_combine_rotations(molobject, rotations=None):
         mol = mol_copy(molobject)
         mol = mol_rotate(mol, vector=i)
         rotated_mols.append(mol)
-        print("Rotating x,y,z,angle {0}".format(i))
 
-    # Combine rotated structure into new file
+    logger.debug('Combine %s with %d rotations (x,y,z,angle)', molobject.title, len(rotations))
+
+    # Combine rotated structure into new file. Use a unique temporary file
+    # as endpoints may run concurrently.
     toolkit_driver = toolkits.get(molobject.toolkit)
-    rotated_file = toolkit_driver.Outputfile(
-        molobject.mol_format, "multipleSD.mol2")
+    rotated_path = file_path
+    if rotated_path is None:
+        fd, rotated_path = tempfile.mkstemp(suffix='.{0}'.format(molobject.mol_format))
+        os.close(fd)
+    if os.path.isfile(rotated_path):
+        os.remove(rotated_path)
+
+    rotated_file = toolkit_driver.Outputfile(molobject.mol_format, rotated_path)
     for rotated_mol in rotated_mols:
         rotated_file.write(rotated_mol)
     rotated_file.close()
 
+    if file_path is not None:
+        return file_path if os.path.isfile(file_path) else None
+
     combined = None
-    if os.path.isfile('multipleSD.mol2'):
-        with open('multipleSD.mol2', 'r') as cf:
+    if os.path.isfile(rotated_path):
+        with open(rotated_path, 'r') as cf:
             combined = cf.read()
-        os.remove('multipleSD.mol2')
+        os.remove(rotated_path)
 
     return combined
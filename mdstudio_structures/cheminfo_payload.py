@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_payload.py
+
+Compressed encodings of path_file object content.
+
+Structure content in path_file objects is sent as JSON string. Large
+structures can be transferred compressed by setting the path_file
+'encoding' to one of the '<compression>+base64' encodings: the content
+is the base64 encoded compressed UTF-8 file content. 'utf8' is the
+default plain text encoding.
+
+Supported compressions are zlib, gzip, bz2, lzma (Python 3) and zstd
+when the `zstandard` package is installed.
+"""
+
+import zlib
+import bz2
+import base64
+import binascii
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PLAIN_ENCODINGS = ('utf8', 'utf-8')
+
+# Errors raised by base64 and the decompressors on malformed content
+DECODE_ERRORS = (binascii.Error, TypeError, UnicodeError, zlib.error, IOError, EOFError)
+if lzma is not None:
+    DECODE_ERRORS += (lzma.LZMAError,)
+if zstandard is not None:
+    DECODE_ERRORS += (zstandard.ZstdError,)
+
+
+def _gzip_compress(data):
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _gzip_decompress(data):
+
+    return zlib.decompress(data, 31)
+
+
+COMPRESSIONS = {'zlib': (zlib.compress, zlib.decompress),
+                'gzip': (_gzip_compress, _gzip_decompress),
+                'bz2': (bz2.compress, bz2.decompress)}
+
+if lzma is not None:
+    COMPRESSIONS['lzma'] = (lzma.compress, lzma.decompress)
+
+if zstandard is not None:
+    COMPRESSIONS['zstd'] = (lambda data: zstandard.ZstdCompressor().compress(data),
+                            lambda data: zstandard.ZstdDecompressor().decompress(data))
+
+
+def available_encodings():
+    """
+    List the supported path_file content encodings
+
+    :rtype: :py:list
+    """
+
+    return list(PLAIN_ENCODINGS[:1]) + sorted('{0}+base64'.format(name) for name in COMPRESSIONS)
+
+
+def is_plain_encoding(encoding):
+    """
+    Return True if encoding denotes plain text content
+    """
+
+    return not encoding or encoding.lower() in PLAIN_ENCODINGS
+
+
+def is_supported_encoding(encoding):
+    """
+    Return True if content can be encoded and decoded using encoding
+    """
+
+    if is_plain_encoding(encoding):
+        return True
+
+    try:
+        _compression(encoding)
+    except ValueError:
+        return False
+    return True
+
+
+def _compression(encoding):
+    """
+    Compression functions for a '<compression>+base64' encoding
+
+    :raises ValueError: for unsupported encodings
+    """
+
+    name, sep, transfer = encoding.lower().partition('+')
+    if transfer != 'base64' or name not in COMPRESSIONS:
+        raise ValueError('Unsupported content encoding "{0}", choose from: {1}'.format(
+            encoding, ', '.join(available_encodings())))
+
+    return COMPRESSIONS[name]
+
+
+def encode_content(content, encoding=None):
+    """
+    Encode text content using encoding
+
+    :param content:  text content
+    :type content:   :py:str
+    :param encoding: path_file encoding
+    :type encoding:  :py:str
+
+    :return:         encoded content
+    :rtype:          :py:str
+    """
+
+    if content is None or is_plain_encoding(encoding):
+        return content
+
+    compress = _compression(encoding)[0]
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+
+    return base64.b64encode(compress(content)).decode('ascii')
+
+
+def decode_content(content, encoding=None):
+    """
+    Decode encoded content to text
+
+    :param content:  encoded content
+    :type content:   :py:str
+    :param encoding: path_file encoding
+    :type encoding:  :py:str
+
+    :return:         text content
+    :rtype:          :py:str
+
+    :raises ValueError: for unsupported encodings and malformed content
+    """
+
+    if content is None or is_plain_encoding(encoding):
+        return content
+
+    decompress = _compression(encoding)[1]
+    try:
+        return decompress(base64.b64decode(content)).decode('utf-8')
+    except DECODE_ERRORS as error:
+        raise ValueError('Unable to decode "{0}" content: {1}'.format(encoding, error))
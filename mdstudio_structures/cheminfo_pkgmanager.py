@@ -1,7 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from __future__ import print_function
-
 
 """
 file: cheminfo_pkgmanager.py
@@ -94,6 +92,11 @@ Currently supports the following 9 packages:
          in this case the Mac OSX one. LD_LIBRARY_PATH to the Java libraries in
          this case also the Mac OSX one.
 
+         CDK, OPSIN and JChem share one JVM started on import of the first of
+         them. Its classpath, heap size and garbage collector are configured
+         in the 'jvm' section of settings.yml, the classpath is combined with
+         the CLASSPATH variable.
+
          Citation: D.M. Lowe, P.T. Corbett, P. Murray-Rust and R.C. Glen
          "Chemical Name to Structure: OPSIN, an Open Source Solution", Journal
          of Chemical Information and Modeling 2011 51 (3), 739-753
@@ -148,14 +151,70 @@ Currently supports the following 9 packages:
 
 import os
 import sys
+import logging
+import threading
 import collections
 import importlib
 
 from retrying import retry
 
+logger = logging.getLogger(__name__)
+
 # Cheminformatics packages supported by cheminfo, the order matters!
 SUPPORTED_PACKAGES = ('webel', 'silverwebel', 'pybel', 'jchem', 'cdk', 'indy', 'opsin', 'rdk', 'pydpi')
 
+# Packages sharing the JPype Java virtual machine
+JVM_PACKAGES = ('jchem', 'cdk', 'opsin')
+
+# Packages keeping state in module level objects that are not thread safe:
+# the force fields, builder and fingerprinters of pybel and the single
+# Indigo session of indy. Calls to them are serialized.
+SERIAL_PACKAGES = ('pybel', 'indy')
+
+_package_locks = dict((package, threading.RLock()) for package in SERIAL_PACKAGES)
+
+
+class _NoLock(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def configure_jvm(settings_file):
+    """
+    Configure the JVM shared by the Java packages using the 'jvm' section
+    of the component settings file
+
+    The first Java package imported starts the JVM, so this is called
+    before the packages are imported. A JVM started earlier in the process
+    cannot be reconfigured and keeps its settings.
+
+    :param settings_file: path to the component settings.yml file
+    :type settings_file:  :py:str
+    """
+
+    try:
+        import yaml
+        from cinfony import jvm
+    except ImportError:
+        return
+
+    if not os.path.isfile(settings_file):
+        return
+
+    with open(settings_file) as settings:
+        config = ((yaml.safe_load(settings) or {}).get('settings') or {}).get('jvm') or {}
+    config = dict((key, value) for key, value in config.items() if value is not None)
+
+    if jvm.isstarted():
+        if config:
+            logger.warning('JVM already started, settings in %s not applied', settings_file)
+        return
+    jvm.configure(**config)
+
 
 def retry_if_Index_Exception(exception):
     """
@@ -181,11 +240,17 @@ class CinfonyPackageManager(collections.MutableMapping):
         for package in SUPPORTED_PACKAGES:
             self._import_pkg(package, package_config)
 
-        print('Imported packages: {0}'.format(', '.join(self.keys())))
+        logger.info('Imported packages: %s', ', '.join(self.keys()))
+        if self.uses_jvm:
+            from cinfony import jvm
+            if jvm.startup_time is not None:
+                logger.info('JVM started in %.2f seconds with options: %s', jvm.startup_time,
+                            ' '.join(jvm.jvmoptions()))
+
         not_imported = [p for p in SUPPORTED_PACKAGES if p not in self]
         if not_imported:
-            print('Packages not imported: {0}. Check the installation instructions '
-                  'if this was unexpected'.format(', '.join(not_imported)))
+            logger.info('Packages not imported: %s. Check the installation instructions '
+                        'if this was unexpected', ', '.join(not_imported))
 
     def __setitem__(self, key, value):
         self.__dict__[key] = value
@@ -202,6 +267,35 @@ class CinfonyPackageManager(collections.MutableMapping):
     def __len__(self):
         return len(self.__dict__)
 
+    @property
+    def uses_jvm(self):
+        """
+        True if any of the imported packages runs in the JVM
+        """
+
+        return any(package in self for package in JVM_PACKAGES)
+
+    def attach_thread(self):
+        """
+        Attach the calling thread to the JVM shared by the Java packages.
+        Needed before worker threads call CDK, OPSIN or JChem functions.
+        """
+
+        if self.uses_jvm:
+            from cinfony import jvm
+            jvm.attach_thread()
+
+    def lock(self, package):
+        """
+        Lock serializing the calls to a package that is not thread safe,
+        a context manager doing nothing for other packages
+
+        :param package: package name
+        :type package:  :py:str
+        """
+
+        return _package_locks.get(package) or _NoLock()
+
     @retry(retry_on_exception=retry_if_Index_Exception, stop_max_attempt_number=10)
     def _import_pkg(self, package, package_config):
         """
@@ -218,7 +312,7 @@ class CinfonyPackageManager(collections.MutableMapping):
         path = '{0}_path'.format(package)
         if path in package_config:
             if not os.path.exists(package_config[path]):
-                print('No such path to package {0}: {1}'.format(package, package_config[path]))
+                logger.warning('No such path to package %s: %s', package, package_config[path])
                 return
             if path not in sys.path:
                 sys.path.append(package_config[path])
@@ -229,7 +323,7 @@ class CinfonyPackageManager(collections.MutableMapping):
 
             # RDKit needed for pydpi
             if 'rdk' not in self:
-                print('Cannot load PyDPI, RDKit not available')
+                logger.info('Cannot load PyDPI, RDKit not available')
                 return
             package_name = 'cheminfo_pydpi'
 
@@ -237,10 +331,10 @@ class CinfonyPackageManager(collections.MutableMapping):
         try:
             self[package] = importlib.import_module(package_name)
         except ImportError as e:
-            print('Import error for package {0}: {1}'.format(package, e))
+            logger.info('Import error for package %s: %s', package, e)
         except SyntaxError as e:
-            print('Syntax error on import of package {0}: {1}'.format(package, e))
+            logger.warning('Syntax error on import of package %s: %s', package, e)
         except KeyError as e:
-            print('Package {0}: not found.'.format(package))
+            logger.warning('Package %s: not found.', package)
         except Exception:
-            print('Unexpected error for package {0}: {1}'.format(package, sys.exc_info()[0]))
+            logger.exception('Unexpected error for package %s', package)
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_profiler.py
+
+Opt-in profiling of slow or sampled endpoint calls.
+
+Endpoint methods wrapped by the `profiled` decorator are profiled when
+the module level `profiler` is enabled:
+
+* A `sample_rate` fraction of the requests is profiled deterministically
+  using cProfile and stored in the pstats format.
+* When a latency `threshold` is defined, the remaining requests run with
+  a lightweight statistical stack sampler. A single sampler thread
+  samples the call stacks of all of these requests. The samples are
+  stored in the speedscope JSON format (https://www.speedscope.app) only
+  when the request took longer than the threshold.
+
+Profiles are stored in a 'profiles' directory in the request workdir, or
+the configured directory, named after the endpoint and the request id:
+the process id and sequence number of the profiled request.
+The configuration can be changed at runtime using `profiler.configure`.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import pstats
+import cProfile
+import tempfile
+import functools
+import threading
+
+timer = getattr(time, 'perf_counter', time.time)
+
+PROFILE_FORMATS = ('pstats', 'speedscope')
+
+
+class SampledProfile(object):
+    """
+    Call stack samples of a single thread
+
+    :param thread_id: identifier of the sampled thread
+    :type thread_id:  :py:int
+    """
+
+    def __init__(self, thread_id):
+
+        self.thread_id = thread_id
+        self.frames = []
+        self.samples = []
+        self.weights = []
+        self.start = self.last = timer()
+        self.duration = 0.0
+
+        self._frame_index = {}
+
+    def _frame_id(self, code, lineno):
+
+        key = (code.co_filename, code.co_name, code.co_firstlineno)
+        if key not in self._frame_index:
+            self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return self._frame_index[key]
+
+    def add_sample(self, frame, now):
+        """
+        Add the call stack ending at frame sampled at time now
+        """
+
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_id(frame.f_code, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+
+        self.samples.append(stack)
+        self.weights.append(now - self.last)
+        self.last = now
+
+    def to_speedscope(self, name):
+        """
+        Export the samples as speedscope JSON document
+
+        :param name: profile name
+        :type name:  :py:str
+
+        :rtype:      :py:dict
+        """
+
+        return {'$schema': 'https://www.speedscope.app/file-format-schema.json',
+                'name': name, 'exporter': 'mdstudio_structures', 'activeProfileIndex': 0,
+                'shared': {'frames': self.frames},
+                'profiles': [{'type': 'sampled', 'name': name, 'unit': 'seconds', 'startValue': 0,
+                              'endValue': sum(self.weights), 'samples': self.samples,
+                              'weights': self.weights}]}
+
+
+class StackSampler(threading.Thread):
+    """
+    Statistical profiler sampling the call stacks of the threads of all
+    active profile sessions in a single daemon thread, idle while there
+    are none
+
+    :param interval:  sampling interval in seconds
+    :type interval:   :py:float
+    """
+
+    def __init__(self, interval=0.005):
+
+        super(StackSampler, self).__init__(name='mdstudio_structures_sampler')
+        self.daemon = True
+
+        self.interval = interval
+
+        self._profiles = []
+        self._condition = threading.Condition()
+
+    def add(self, thread_id):
+        """
+        Start sampling a thread
+
+        :param thread_id: identifier of the thread to sample
+        :type thread_id:  :py:int
+
+        :rtype:           :py:SampledProfile
+        """
+
+        profile = SampledProfile(thread_id)
+        with self._condition:
+            self._profiles.append(profile)
+            self._condition.notify()
+        return profile
+
+    def remove(self, profile):
+        """
+        Stop sampling the thread of a profile
+        """
+
+        with self._condition:
+            self._profiles.remove(profile)
+        profile.duration = timer() - profile.start
+
+    def run(self):
+
+        while True:
+            with self._condition:
+                while not self._profiles:
+                    self._condition.wait()
+
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            now = timer()
+            with self._condition:
+                for profile in self._profiles:
+                    frame = frames.get(profile.thread_id)
+                    if frame is not None:
+                        profile.add_sample(frame, now)
+            del frames
+
+
+class ProfileSession(object):
+    """
+    Profile of a single endpoint call
+
+    :param name:      profile name, endpoint and request id
+    :type name:       :py:str
+    :param threshold: store sampled profiles only above this latency
+    :type threshold:  :py:float
+    :param sampled:   use cProfile instead of the stack sampler
+    :type sampled:    :py:bool
+    :param sampler:   shared stack sampler, used when not sampled
+    :type sampler:    :py:StackSampler
+    """
+
+    def __init__(self, name, threshold=None, sampled=False, sampler=None):
+
+        self.name = name
+        self.threshold = threshold
+        self.profile = None
+        self.sampler = None
+        self.samples = None
+        self.start = timer()
+
+        if sampled:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Another profiler is already active in this process
+                self.profile = None
+        elif sampler is not None:
+            self.sampler = sampler
+            self.samples = sampler.add(threading.current_thread().ident)
+
+    def finish(self, directory):
+        """
+        Stop profiling and store the profile in directory if needed
+
+        :param directory: output directory
+        :type directory:  :py:str
+
+        :return:          path to the profile or None if not stored
+        :rtype:           :py:str
+        """
+
+        elapsed = timer() - self.start
+        if self.profile is not None:
+            self.profile.disable()
+        elif self.sampler is not None:
+            self.sampler.remove(self.samples)
+        else:
+            return None
+
+        if self.profile is None and (self.threshold is None or elapsed < self.threshold):
+            return None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        if self.profile is not None:
+            path = os.path.join(directory, '{0}.pstats'.format(self.name))
+            pstats.Stats(self.profile).dump_stats(path)
+        else:
+            path = os.path.join(directory, '{0}.speedscope.json'.format(self.name))
+            with open(path, 'w') as outfile:
+                json.dump(self.samples.to_speedscope(self.name), outfile)
+
+        return path
+
+
+class RequestProfiler(object):
+    """
+    Runtime configurable profiler settings
+
+    :param enabled:     profile endpoint calls
+    :type enabled:      :py:bool
+    :param sample_rate: fraction of the requests profiled using cProfile
+    :type sample_rate:  :py:float
+    :param threshold:   latency in seconds above which sampled profiles
+                        are stored, disables the stack sampler when None
+    :type threshold:    :py:float
+    :param interval:    stack sampler interval in seconds
+    :type interval:     :py:float
+    :param endpoints:   names of the endpoints to profile, all when empty
+    :type endpoints:    :py:list
+    :param directory:   output directory overriding <workdir>/profiles
+    :type directory:    :py:str
+    """
+
+    def __init__(self, **kwargs):
+
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.threshold = None
+        self.interval = 0.005
+        self.endpoints = []
+        self.directory = None
+
+        self._sampler = None
+        self._sampler_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self.configure(**kwargs)
+
+    def configure(self, **kwargs):
+        """
+        Update the profiler settings
+
+        :raises ValueError: on unknown or invalid settings
+
+        :return: the updated settings
+        :rtype:  :py:dict
+        """
+
+        unknown = set(kwargs).difference(self.config())
+        if unknown:
+            raise ValueError('Unknown profiler settings: {0}'.format(', '.join(sorted(unknown))))
+
+        if not 0 <= kwargs.get('sample_rate', self.sample_rate) <= 1:
+            raise ValueError('Profiler sample_rate should be between 0 and 1')
+        if kwargs.get('interval', self.interval) <= 0:
+            raise ValueError('Profiler interval should be larger than 0')
+
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+        self.endpoints = list(self.endpoints or [])
+        if self._sampler is not None:
+            self._sampler.interval = self.interval
+
+        return self.config()
+
+    def config(self):
+        """
+        Return the current settings
+
+        :rtype: :py:dict
+        """
+
+        return {'enabled': self.enabled, 'sample_rate': self.sample_rate, 'threshold': self.threshold,
+                'interval': self.interval, 'endpoints': self.endpoints, 'directory': self.directory}
+
+    @property
+    def sampler(self):
+        """
+        Stack sampler shared by all profile sessions, started on first use
+        """
+
+        with self._sampler_lock:
+            if self._sampler is None:
+                self._sampler = StackSampler(interval=self.interval)
+                self._sampler.start()
+        return self._sampler
+
+    def request_id(self):
+        """
+        Return a new request id, unique within the process
+
+        :rtype: :py:str
+        """
+
+        return '{0}-{1}'.format(os.getpid(), next(self._request_ids))
+
+    def start(self, endpoint):
+        """
+        Start a profile session for a call to endpoint
+
+        :return: profile session or None if the call is not profiled
+        :rtype:  :py:ProfileSession
+        """
+
+        if not self.enabled or (self.endpoints and endpoint not in self.endpoints):
+            return None
+
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and self.threshold is None:
+            return None
+
+        name = '{0}_{1}'.format(endpoint, self.request_id())
+        return ProfileSession(name, threshold=self.threshold, sampled=sampled,
+                              sampler=None if sampled else self.sampler)
+
+    def output_directory(self, request):
+        """
+        Profile output directory for a request
+        """
+
+        if self.directory:
+            return self.directory
+
+        workdir = request.get('workdir') if isinstance(request, dict) else None
+        return os.path.join(os.path.abspath(workdir or tempfile.gettempdir()), 'profiles')
+
+
+profiler = RequestProfiler()
+
+
+def profiled(endpoint):
+    """
+    Decorator profiling an endpoint method with signature
+    (self, request, claims) according to the `profiler` settings.
+
+    :param endpoint: endpoint name used in the profile name
+    :type endpoint:  :py:str
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(self, request, claims):
+
+            session = profiler.start(endpoint)
+            if session is None:
+                return func(self, request, claims)
+
+            try:
+                return func(self, request, claims)
+            finally:
+                path = session.finish(profiler.output_directory(request))
+                if path is not None and hasattr(self, 'log'):
+                    self.log.info('Stored {0} endpoint profile: {1}'.format(endpoint, path))
+
+        return wrapper
+
+    return decorator
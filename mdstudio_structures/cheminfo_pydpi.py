@@ -14,6 +14,7 @@ DOI: 10.1021/ci400127q
 """
 
 import os
+import logging
 
 from rdkit import Chem
 from pydpi.drug import getmol, fingerprint
@@ -23,6 +24,8 @@ from cinfony.rdk import descs as rdk_descs
 from cinfony.rdk import readstring as rdk_readstring
 from cinfony.rdk import (informats, Fingerprint)
 
+logger = logging.getLogger(__name__)
+
 # Available descriptors
 descs = rdk_descs
 
@@ -173,7 +176,7 @@ class Molecule(RdkMolecule):
         if descnames:
             non_avail = [d for d in descnames if d not in calc_desc]
             if non_avail:
-                print('PyDPI descriptors not available: {0}'.format(','.join(non_avail)))
+                logger.warning('PyDPI descriptors not available: %s', ','.join(non_avail))
             return dict([(d, calc_desc[d]) for d in descnames])
 
         return calc_desc
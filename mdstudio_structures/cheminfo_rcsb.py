@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_rcsb.py
+
+Retrieval of biomolecular structure files from the RCSB database backed by
+a local structure cache and an optional pre-populated local mirror.
+"""
+
+import os
+import gzip
+import shutil
+import hashlib
+import tempfile
+import threading
+
+from Bio.PDB import PDBList
+
+# File names as written by Bio.PDB.PDBList.retrieve_pdb_file for each of the
+# supported RCSB file formats.
+RCSB_FILE_NAMES = {'pdb': 'pdb{0}.ent', 'mmCif': '{0}.cif', 'xml': '{0}.xml',
+                   'mmtf': '{0}.mmtf', 'bundle': '{0}-pdb-bundle.tar'}
+
+# File names to look for in a local mirror, in order of preference. Both the
+# 'divided' wwPDB layout (two middle characters of the ID as subdirectory) and
+# a flat directory layout are supported, compressed or not.
+MIRROR_FILE_NAMES = {'pdb': ('pdb{0}.ent', '{0}.pdb', '{1}.pdb', '{0}.ent'),
+                     'mmCif': ('{0}.cif', '{1}.cif'),
+                     'xml': ('{0}.xml', '{1}.xml'),
+                     'mmtf': ('{0}.mmtf', '{1}.mmtf'),
+                     'bundle': ('{0}-pdb-bundle.tar',)}
+
+_replace = getattr(os, 'replace', os.rename)
+_pdblist = None
+
+
+def _get_pdblist():
+    """
+    Return a PDBList instance shared between requests
+    """
+
+    global _pdblist
+    if _pdblist is None:
+        _pdblist = PDBList()
+    return _pdblist
+
+
+class StructureCache(object):
+    """
+    Local on-disk structure file cache
+
+    Entries are stored under a two level directory layout named after the
+    SHA1 hash of their cache key. Writes are atomic: the file is first copied
+    to a temporary file in the cache directory and then renamed.
+    The cache is bounded by `max_size` bytes; least recently used entries
+    are evicted first using the file modification time that is updated on
+    every cache hit.
+
+    :param path:     cache directory, created if needed
+    :type path:      :py:str
+    :param max_size: maximum cache size in bytes
+    :type max_size:  :py:int
+    """
+
+    def __init__(self, path, max_size=2 * 1024 ** 3):
+
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self._size = sum(os.path.getsize(entry) for entry, mtime in self._entries())
+
+    def __contains__(self, key):
+
+        return os.path.isfile(self._entry_path(key))
+
+    def __len__(self):
+
+        return len(list(self._entries()))
+
+    @property
+    def size(self):
+        """
+        Total size of the cache entries in bytes
+        """
+
+        return self._size
+
+    def _entry_path(self, key):
+
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest[:2], digest[2:])
+
+    def _entries(self):
+        """
+        Iterate over (path, modification time) tuples of all cache entries
+        """
+
+        for subdir in os.listdir(self.path):
+            subpath = os.path.join(self.path, subdir)
+            if len(subdir) != 2 or not os.path.isdir(subpath):
+                continue
+            for name in os.listdir(subpath):
+                if name.endswith('.tmp'):
+                    continue
+                entry = os.path.join(subpath, name)
+                yield entry, os.path.getmtime(entry)
+
+    def get(self, key):
+        """
+        Return the path to the cached file for key or None if not cached
+
+        :param key: cache key
+        :type key:  :py:str
+
+        :rtype:     :py:str
+        """
+
+        entry = self._entry_path(key)
+        try:
+            os.utime(entry, None)
+        except OSError:
+            return None
+
+        return entry
+
+    def put(self, key, filename):
+        """
+        Store a copy of a file in the cache under key
+
+        :param key:      cache key
+        :type key:       :py:str
+        :param filename: path to the file to cache
+        :type filename:  :py:str
+
+        :return:         path to the cached file
+        :rtype:          :py:str
+        """
+
+        entry = self._entry_path(key)
+        entry_dir = os.path.dirname(entry)
+        if not os.path.isdir(entry_dir):
+            try:
+                os.makedirs(entry_dir)
+            except OSError:
+                if not os.path.isdir(entry_dir):
+                    raise
+
+        fd, tmp = tempfile.mkstemp(dir=entry_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as dst, open(filename, 'rb') as src:
+                shutil.copyfileobj(src, dst)
+            previous = os.path.getsize(entry) if os.path.isfile(entry) else 0
+            _replace(tmp, entry)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        with self._lock:
+            self._size += os.path.getsize(entry) - previous
+            if self._size > self.max_size:
+                self._evict()
+
+        return entry
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache fits max_size
+        """
+
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(os.path.getsize(entry) for entry, mtime in entries)
+        for entry, mtime in entries:
+            if self._size <= self.max_size:
+                break
+            size = os.path.getsize(entry)
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            self._size -= size
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        """
+
+        with self._lock:
+            for entry, mtime in list(self._entries()):
+                os.remove(entry)
+            self._size = 0
+
+
+def find_mirror_file(mirror, pdb_id, file_format='pdb'):
+    """
+    Locate a structure file in a local mirror of the PDB archive
+
+    :param mirror:      mirror root directory
+    :type mirror:       :py:str
+    :param pdb_id:      four character PDB ID
+    :type pdb_id:       :py:str
+    :param file_format: RCSB file format
+    :type file_format:  :py:str
+
+    :return:            path to the (possibly gzip compressed) file or None
+    :rtype:             :py:str
+    """
+
+    lower, upper = pdb_id.lower(), pdb_id.upper()
+    for subdir in (lower[1:3], ''):
+        for name in MIRROR_FILE_NAMES.get(file_format, ()):
+            path = os.path.join(mirror, subdir, name.format(lower, upper))
+            for candidate in (path, '{0}.gz'.format(path)):
+                if os.path.isfile(candidate):
+                    return candidate
+
+    return None
+
+
+def _copy_structure_file(source, target):
+    """
+    Copy a structure file to target, decompressing gzip files on the fly
+    """
+
+    opener = gzip.open if source.endswith('.gz') else open
+    with opener(source, 'rb') as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+    return target
+
+
+def retrieve_rcsb_structure(pdb_id, workdir, file_format='pdb', cache=None, mirror=None, offline=False):
+    """
+    Retrieve a structure file by PDB ID into workdir
+
+    The local mirror is consulted first followed by the structure cache.
+    Only when both miss, and not in offline mode, the file is downloaded
+    from the RCSB and stored in the cache. Structures requested in PDB
+    format that are only distributed as mmCIF are returned as mmCIF, the
+    mmCIF file is only looked up after all PDB format lookups missed.
+
+    :param pdb_id:      four character PDB ID
+    :type pdb_id:       :py:str
+    :param workdir:     directory to store the structure file in
+    :type workdir:      :py:str
+    :param file_format: RCSB file format
+    :type file_format:  :py:str
+    :param cache:       structure cache
+    :type cache:        :StructureCache
+    :param mirror:      local PDB mirror root directory
+    :type mirror:       :py:str
+    :param offline:     never access the network
+    :type offline:      :py:bool
+
+    :return:            path to the structure file or None if not found
+    :rtype:             :py:str
+    """
+
+    # Large structures are not available in PDB format, fall back to mmCIF
+    # when the mirror, the cache and the RCSB all miss the PDB file
+    file_formats = (file_format, 'mmCif') if file_format == 'pdb' else (file_format,)
+    lower = pdb_id.lower()
+
+    dfile = None
+    for fmt in file_formats:
+        target = os.path.join(workdir, RCSB_FILE_NAMES.get(fmt, '{0}').format(lower))
+
+        if mirror:
+            mirror_file = find_mirror_file(mirror, pdb_id, file_format=fmt)
+            if mirror_file:
+                return _copy_structure_file(mirror_file, target)
+
+        if cache is not None:
+            cached = cache.get('{0}/{1}'.format(fmt, lower))
+            if cached:
+                return _copy_structure_file(cached, target)
+
+        if offline:
+            continue
+
+        dfile = _get_pdblist().retrieve_pdb_file(pdb_id, file_format=fmt, pdir=workdir, overwrite=True)
+        if os.path.isfile(dfile):
+            if cache is not None:
+                cache.put('{0}/{1}'.format(fmt, lower), dfile)
+            return dfile
+
+    return dfile
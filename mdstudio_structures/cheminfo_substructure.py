@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_substructure.py
+
+SMARTS substructure search in molecule libraries.
+
+Matching a SMARTS pattern is expensive compared to comparing fingerprints.
+Toolkits providing a 'pattern' fingerprint and a query fingerprint of the
+SMARTS pattern (`Smarts.calcfp`, RDKit) first screen the library: every
+bit of the query fingerprint is also set in the pattern fingerprint of a
+matching molecule, so molecules missing any query bit are discarded using
+a vectorized subset test on the packed fingerprint matrix. The remaining
+candidates are matched with `Smarts.findall` in a long lived pool of
+worker threads, which keep their compiled patterns between searches.
+
+Calculating the pattern fingerprints of a library costs more than matching
+a simple pattern, so screening pays off when the library fingerprints are
+reused for several queries. `LibraryFingerprintCache` keeps the
+fingerprint matrices of recently searched libraries.
+
+Compiled SMARTS patterns are kept in a process wide least recently used
+cache keyed by toolkit and pattern. `match_many` applies a fixed set of
+patterns, e.g. structural alerts, to a stream of molecules, optionally
+limited to the screened candidate molecule, pattern pairs.
+"""
+
+import atexit
+import logging
+import threading
+import collections
+
+from multiprocessing.pool import ThreadPool
+from numpy import all as np_all, array, bitwise_and, flatnonzero, ones, packbits, unpackbits, zeros, uint8
+
+from . import toolkits
+from .cheminfo_fingerprint import mol_fingerprint_many
+
+logger = logging.getLogger(__name__)
+
+SCREEN_FINGERPRINT = 'pattern'
+
+# Toolkits of which a compiled SMARTS pattern can match in several threads
+# at once. Patterns of other toolkits keep match state and are cached per
+# thread.
+REENTRANT_SMARTS = ('rdk', 'webel', 'silverwebel')
+
+# Number of SMARTS matching worker threads shared by all searches
+MATCH_THREADS = 8
+
+
+class SmartsCache(object):
+    """
+    Least recently used cache of compiled SMARTS patterns keyed by
+    toolkit and pattern
+
+    :param maxsize: maximum number of patterns to keep per cache
+    :type maxsize:  :py:int
+    """
+
+    def __init__(self, maxsize=1024):
+
+        self.maxsize = maxsize
+        self.stats = {'hits': 0, 'misses': 0}
+
+        self._shared = collections.OrderedDict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _cache(self, toolkit):
+
+        if toolkit in REENTRANT_SMARTS:
+            return self._shared
+
+        if not hasattr(self._local, 'cache'):
+            self._local.cache = collections.OrderedDict()
+        return self._local.cache
+
+    def get(self, smarts, toolkit):
+        """
+        Return the compiled SMARTS pattern, compiled when not cached
+
+        :param smarts:  SMARTS pattern
+        :type smarts:   :py:str
+        :param toolkit: cheminformatics toolkit to use
+        :type toolkit:  :py:str
+
+        :raises IOError: for invalid SMARTS patterns
+
+        :return:        compiled pattern
+        :rtype:         :cinfony:Smarts
+        """
+
+        key = (toolkit, smarts)
+        cache = self._cache(toolkit)
+        with self._lock:
+            if key in cache:
+                self.stats['hits'] += 1
+                pattern = cache.pop(key)
+                cache[key] = pattern
+                return pattern
+            self.stats['misses'] += 1
+
+        pattern = toolkits.get(toolkit).Smarts(smarts)
+        with self._lock:
+            cache[key] = pattern
+            while len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+        return pattern
+
+    def clear(self):
+        """
+        Remove the patterns compiled by all threads
+        """
+
+        with self._lock:
+            self._shared.clear()
+            self._local = threading.local()
+
+
+smarts_cache = SmartsCache()
+
+
+def screen_fingerprints(query, library):
+    """
+    Screen packed library fingerprints for the bits of a query fingerprint
+
+    :param query:   packed query fingerprint bytes
+    :type query:    :numpy:ndarray
+    :param library: packed fingerprint matrix, one row per molecule
+    :type library:  :numpy:ndarray
+
+    :return:        indices of the molecules having all query bits set
+    :rtype:         :numpy:ndarray
+    """
+
+    return flatnonzero(np_all(bitwise_and(library, query) == query, axis=1))
+
+
+def screen_many(queries, library):
+    """
+    Screen packed library fingerprints for the bits of many query
+    fingerprints
+
+    Query fingerprints set few bits, so only the library bit columns set
+    in a query are combined. The library bits are transposed and packed
+    along the molecules to combine the columns eight molecules at a time.
+
+    :param queries: packed query fingerprint matrix, one row per query
+    :type queries:  :numpy:ndarray
+    :param library: packed fingerprint matrix, one row per molecule
+    :type library:  :numpy:ndarray
+
+    :return:        boolean candidate matrix with one row per molecule
+                    and one column per query
+    :rtype:         :numpy:ndarray
+    """
+
+    columns = packbits(unpackbits(library, axis=1), axis=0).T.copy()
+    candidates = ones((len(library), len(queries)), dtype=bool)
+    for i, query_bits in enumerate(unpackbits(queries, axis=1)):
+        bits = flatnonzero(query_bits)
+        if len(bits):
+            candidates[:, i] = unpackbits(bitwise_and.reduce(columns[bits], axis=0))[:len(library)]
+
+    return candidates
+
+
+def screening_supported(toolkit):
+    """
+    Check if a toolkit supports pattern fingerprint screening of SMARTS
+    queries
+
+    :rtype: :py:bool
+    """
+
+    toolkit_driver = toolkits.get(toolkit)
+    return hasattr(getattr(toolkit_driver, 'Smarts', None), 'calcfp') and \
+        SCREEN_FINGERPRINT in getattr(toolkit_driver, 'fps', [])
+
+
+def library_fingerprints(molobjects):
+    """
+    Pattern fingerprint matrix of a molecule library for screening
+
+    :param molobjects: Cinfony molecular objects of the same toolkit, None
+                       for molecules that could not be read
+    :type molobjects:  :py:list
+
+    :return:           packed fingerprint matrix with one row per
+                       molecule, zeros for unreadable molecules
+    :rtype:            :numpy:ndarray
+    """
+
+    valid = [i for i, molobject in enumerate(molobjects) if molobject is not None]
+    fps = mol_fingerprint_many([molobjects[i] for i in valid], fp=SCREEN_FINGERPRINT)
+    if fps is None:
+        return
+
+    library = zeros((len(molobjects), fps.shape[1]), dtype=uint8)
+    library[valid] = fps
+    return library
+
+
+class LibraryFingerprintCache(object):
+    """
+    Least recently used cache of library fingerprint matrices
+
+    :param maxsize: maximum number of libraries to keep
+    :type maxsize:  :py:int
+    """
+
+    def __init__(self, maxsize=16):
+
+        self.maxsize = maxsize
+        self.stats = {'hits': 0, 'misses': 0}
+
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+
+        return len(self._cache)
+
+    def get(self, key, molobjects):
+        """
+        Return the fingerprint matrix of a library, calculated when not
+        cached
+
+        :param key:        library key, e.g. a content hash and toolkit
+        :type key:         :py:str
+        :param molobjects: molecules of the library
+        :type molobjects:  :py:list
+
+        :rtype:            :numpy:ndarray
+        """
+
+        with self._lock:
+            if key in self._cache:
+                self.stats['hits'] += 1
+                library = self._cache.pop(key)
+                self._cache[key] = library
+                return library
+            self.stats['misses'] += 1
+
+        library = library_fingerprints(molobjects)
+        if library is not None:
+            with self._lock:
+                self._cache[key] = library
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+
+        return library
+
+
+fingerprint_cache = LibraryFingerprintCache()
+
+
+class MatchWorkers(object):
+    """
+    Long lived pool of SMARTS matching threads shared by all searches
+
+    The worker threads keep their thread local compiled SMARTS patterns
+    between searches. The pool is started on first use and stopped when
+    the interpreter exits.
+
+    :param size: number of worker threads
+    :type size:  :py:int
+    """
+
+    def __init__(self, size=MATCH_THREADS):
+
+        self.size = size
+
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def map(self, func, chunks):
+        """
+        Call func on every chunk in the worker threads
+
+        :rtype: :py:list
+        """
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.size)
+                atexit.register(self.close)
+            pool = self._pool
+
+        return pool.map(func, chunks)
+
+    def close(self):
+        """
+        Stop the worker threads and wait for them to finish
+        """
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+match_workers = MatchWorkers()
+
+
+def _findall(toolkit, smarts, molobjects):
+    """
+    Match molecules with a cached SMARTS pattern in a worker thread
+    """
+
+    toolkits.attach_thread()
+    pattern = smarts_cache.get(smarts, toolkit)
+    return [[list(match) for match in pattern.findall(molobject)] for molobject in molobjects]
+
+
+def smarts_matcher(pattern):
+    """
+    Boolean match function of a compiled pattern, stopping at the first
+    match if the toolkit supports it
+    """
+
+    if hasattr(pattern, 'match'):
+        return pattern.match
+    return lambda molobject: bool(pattern.findall(molobject))
+
+
+def match_many(patterns, molobjects, toolkit='pybel', candidates=None):
+    """
+    Apply a set of SMARTS patterns to a stream of molecules
+
+    :param patterns:   SMARTS patterns
+    :type patterns:    :py:list
+    :param molobjects: iterable of Cinfony molecular objects, None for
+                       molecules that could not be read
+    :type molobjects:  :py:list
+    :param toolkit:    cheminformatics toolkit to use
+    :type toolkit:     :py:str
+    :param candidates: boolean matrix with one row per molecule and one
+                       column per pattern, only the molecule, pattern
+                       pairs set are matched. All pairs by default.
+    :type candidates:  :numpy:ndarray
+
+    :return:           boolean matrix with one row per molecule and one
+                       column per pattern, None if a pattern is invalid
+                       or the toolkit does not support SMARTS.
+    :rtype:            :numpy:ndarray
+    """
+
+    toolkit_driver = toolkits.get(toolkit)
+    if not hasattr(toolkit_driver, 'Smarts'):
+        logger.error('SMARTS matching not supported by toolkit %s', toolkit)
+        return
+
+    matchers = []
+    for smarts in patterns:
+        try:
+            matchers.append(smarts_matcher(smarts_cache.get(smarts, toolkit)))
+        except (IOError, ValueError) as e:
+            logger.error('Invalid SMARTS pattern "%s": %s', smarts, e)
+            return
+
+    rows = []
+    for i, molobject in enumerate(molobjects):
+        mask = candidates[i] if candidates is not None else [True] * len(matchers)
+        rows.append([molobject is not None and bool(candidate) and bool(matcher(molobject))
+                     for matcher, candidate in zip(matchers, mask)])
+
+    return array(rows, dtype=bool).reshape(len(rows), len(matchers))
+
+
+def mol_substructure_search(smarts, molobjects, toolkit='pybel', screen=True, fingerprints=None, threads=4):
+    """
+    Find the matches of a SMARTS pattern in many molecules
+
+    :param smarts:     SMARTS query
+    :type smarts:      :py:str
+    :param molobjects: Cinfony molecular objects, None for molecules that
+                       could not be read
+    :type molobjects:  :py:list
+    :param toolkit:    cheminformatics toolkit to use
+    :type toolkit:     :py:str
+    :param screen:     fingerprint screen the molecules before matching
+    :type screen:      :py:bool
+    :param fingerprints: library fingerprint matrix from
+                       `library_fingerprints`, calculated when screening
+                       without it
+    :type fingerprints: :numpy:ndarray
+    :param threads:    worker threads used for matching, at most the
+                       size of the shared `match_workers` pool
+    :type threads:     :py:int
+
+    :return:           list of atom index matches per molecule, None for
+                       unreadable molecules, and the number of molecules
+                       screened out and matched. None if the query is
+                       invalid or the toolkit does not support SMARTS.
+    :rtype:            :py:tuple
+    """
+
+    toolkit_driver = toolkits.get(toolkit)
+    if not toolkit_driver:
+        logger.error('Cheminformatics toolkit %s not active', toolkit)
+        return
+
+    if not hasattr(toolkit_driver, 'Smarts'):
+        logger.error('SMARTS matching not supported by toolkit %s', toolkit)
+        return
+
+    try:
+        query = smarts_cache.get(smarts, toolkit)
+    except (IOError, ValueError) as e:
+        logger.error('Invalid SMARTS pattern "%s": %s', smarts, e)
+        return
+
+    molobjects = list(molobjects)
+    matches = [None if molobject is None else [] for molobject in molobjects]
+    candidates = [i for i, molobject in enumerate(molobjects) if molobject is not None]
+
+    screened = 0
+    if screen and candidates and screening_supported(toolkit):
+        if fingerprints is None:
+            fingerprints = library_fingerprints(molobjects)
+        if fingerprints is not None:
+            survivors = screen_fingerprints(query.calcfp().to_numpy(packed=True), fingerprints[candidates])
+            screened = len(candidates) - len(survivors)
+            candidates = [candidates[i] for i in survivors]
+            logger.debug('Fingerprint screen discarded %s of %s molecules', screened, len(molobjects))
+
+    # Match the candidates in one chunk per worker thread
+    threads = max(1, min(threads, len(candidates), match_workers.size))
+    chunks = [candidates[i::threads] for i in range(threads)]
+    if threads > 1:
+        results = match_workers.map(lambda chunk: _findall(toolkit, smarts, [molobjects[i] for i in chunk]), chunks)
+    else:
+        results = [_findall(toolkit, smarts, [molobjects[i] for i in chunk]) for chunk in chunks]
+
+    matched = 0
+    for chunk, result in zip(chunks, results):
+        for i, match in zip(chunk, result):
+            matches[i] = match
+            matched += bool(match)
+
+    return matches, {'molecules': len(molobjects), 'screened': screened, 'matched': matched}
@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_toolkit_select.py
+
+Selection of the fastest toolkit for an endpoint request.
+
+Requests with toolkit 'auto' are assigned the active toolkit with the
+lowest measured cost for the operations of the endpoint (e.g. reading the
+input format, calculating the requested fingerprint and writing the output
+format) among the toolkits supporting all of them. The costs, in seconds
+per molecule, come from a calibration table:
+
+    {"costs": {<operation>: {<format or '*'>: {<toolkit>: seconds}}}}
+
+The table is produced by `calibrate` on a small built-in molecule set, at
+service start if no calibration file exists, or from benchmark suite
+results using `calibration_from_benchmarks`. It is stored as JSON file.
+Toolkits are ranked by the summed cost of the operations measured for all
+of them, ties (e.g. no measured operations) are broken in the `PREFERENCE`
+order.
+
+The `select_toolkit` endpoint decorator resolves 'auto' before the request
+is handled and reports the toolkit used in the response.
+"""
+
+import os
+import json
+import time
+import logging
+import datetime
+import functools
+import threading
+
+from mdstudio_structures import toolkits, __version__
+
+logger = logging.getLogger(__name__)
+
+AUTO = 'auto'
+
+# Toolkits calling a web service are never selected automatically
+ONLINE_TOOLKITS = ('webel', 'silverwebel')
+
+# Order of preference for toolkits without measured costs
+PREFERENCE = ('pybel', 'rdk', 'indy', 'cdk', 'jchem', 'opsin')
+
+CALIBRATION_SMILES = ('CC(=O)Oc1ccccc1C(=O)O', 'Cn1cnc2c1c(=O)n(C)c(=O)n2C', 'CC(C)Cc1ccc(cc1)C(C)C(=O)O',
+                      'OC[C@H]1OC(O)[C@H](O)[C@@H](O)[C@@H]1O', 'c1ccc2c(c1)[nH]c1ccccc12',
+                      'CCN(CC)CCNC(=O)c1ccc(N)cc1', 'CC(C)NCC(O)COc1cccc2ccccc12',
+                      'OC(=O)COCCN1CCN(CC1)C(c1ccccc1)c1ccc(Cl)cc1')
+CALIBRATION_FORMATS = ('smi', 'can', 'mol', 'sdf', 'mol2', 'pdb', 'inchi')
+CALIBRATION_SMARTS = '[#6]~[#7]'
+
+# Number of molecules used to calibrate 3D coordinate generation
+CALIBRATION_MAKE3D = 2
+
+# Benchmark suite results used for calibration: benchmark name to
+# operation and format
+BENCHMARK_OPERATIONS = {'mol_read': ('mol_read', 'smi'), 'mol_write': ('mol_write', 'mol'),
+                        'calcfp_head_sdf': ('fingerprint', '*'), 'calcdesc': ('descriptors', '*'),
+                        'mol_make3D': ('make3d', '*'), 'substructure_search_unscreened': ('substructure', '*')}
+
+
+def _path_file_format(path_file):
+
+    extension = (path_file or {}).get('extension') or ''
+    return extension.lstrip('.') or None
+
+
+def endpoint_operations(endpoint, request):
+    """
+    Operations and formats of an endpoint request that depend on the
+    toolkit
+
+    :param endpoint: endpoint name
+    :type endpoint:  :py:str
+    :param request:  endpoint request
+    :type request:   :py:dict
+
+    :return:         (operation, format) pairs, '*' for any format
+    :rtype:          :py:list
+    """
+
+    if endpoint == 'chemical_similarity':
+        test_set = request.get('test_set') or [{}]
+        return [('mol_read', _path_file_format(test_set[0])), ('fingerprint', request.get('fp_format') or '*')]
+
+    if endpoint == 'convert_batch':
+        output_formats = request.get('output_formats') or ['smi']
+        return [('mol_read', request.get('input_format'))] + [('mol_write', fmt) for fmt in output_formats]
+
+    if endpoint in ('substructure_search', 'filter'):
+        return [('mol_read', _path_file_format(request.get('library'))), ('substructure', '*')]
+
+    input_format = request.get('input_format') or _path_file_format(request.get('mol'))
+    operations = [('mol_read', input_format)]
+    if endpoint == 'descriptors':
+        operations.append(('descriptors', '*'))
+    elif endpoint == 'make3d':
+        operations.append(('make3d', '*'))
+    if endpoint in ('convert', 'addh', 'removeh', 'make3d', 'rotate'):
+        operations.append(('mol_write', request.get('output_format') or input_format))
+
+    return operations
+
+
+def supports(toolkit, operation, mol_format='*'):
+    """
+    Check if a toolkit supports an operation for a format
+
+    :rtype: :py:bool
+    """
+
+    toolkit_driver = toolkits.get(toolkit)
+    if toolkit_driver is None:
+        return False
+
+    if operation == 'mol_read':
+        return mol_format in (None, '*') or mol_format in getattr(toolkit_driver, 'informats', {})
+    if operation == 'mol_write':
+        return mol_format in (None, '*') or mol_format in getattr(toolkit_driver, 'outformats', {})
+    if operation == 'fingerprint':
+        fps = getattr(toolkit_driver, 'fps', [])
+        return bool(fps) if mol_format == '*' else mol_format in fps
+    if operation == 'descriptors':
+        return bool(getattr(toolkit_driver, 'descs', None))
+    if operation == 'make3d':
+        return hasattr(getattr(toolkit_driver, 'Molecule', None), 'make3D')
+    if operation == 'substructure':
+        return hasattr(toolkit_driver, 'Smarts')
+
+    return False
+
+
+def _time_per_item(func, items, warmup=None):
+    """
+    Seconds per item to call func on items after a warm up call on the
+    `warmup` item (first item by default), None if func fails
+    """
+
+    try:
+        func(items[0] if warmup is None else warmup)
+        start = time.time()
+        for item in items:
+            func(item)
+        return (time.time() - start) / len(items)
+    except Exception as e:
+        logger.debug('Calibration failed: %s', e)
+
+
+def _add_cost(costs, operation, mol_format, toolkit, cost):
+
+    if cost is not None:
+        costs.setdefault(operation, {}).setdefault(mol_format, {})[toolkit] = cost
+
+
+def _get_cost(costs, operation, mol_format, toolkit):
+
+    measured = costs.get(operation, {})
+    return measured.get(mol_format or '*', measured.get('*', {})).get(toolkit)
+
+
+def _metadata(source):
+
+    return {'source': source, 'version': __version__, 'timestamp': datetime.datetime.now().isoformat()}
+
+
+def _calibrate_toolkit(toolkit, toolkit_driver, costs):
+    """
+    Measure the per molecule cost of the operations of a toolkit and add
+    them to costs
+    """
+
+    try:
+        mols = [toolkit_driver.readstring('smi', smiles) for smiles in CALIBRATION_SMILES]
+    except Exception as e:
+        logger.warning('Unable to calibrate toolkit %s: %s', toolkit, e)
+        return
+
+    _add_cost(costs, 'mol_read', 'smi', toolkit,
+              _time_per_item(lambda smiles: toolkit_driver.readstring('smi', smiles), CALIBRATION_SMILES))
+
+    for mol_format in CALIBRATION_FORMATS:
+        if mol_format not in toolkit_driver.outformats:
+            continue
+        _add_cost(costs, 'mol_write', mol_format, toolkit,
+                  _time_per_item(lambda mol: mol.write(mol_format), mols))
+
+        if mol_format != 'smi' and mol_format in toolkit_driver.informats:
+            try:
+                contents = [mol.write(mol_format) for mol in mols]
+            except Exception:
+                continue
+            _add_cost(costs, 'mol_read', mol_format, toolkit,
+                      _time_per_item(lambda content: toolkit_driver.readstring(mol_format, content), contents))
+
+    for fp in getattr(toolkit_driver, 'fps', []):
+        _add_cost(costs, 'fingerprint', fp, toolkit, _time_per_item(lambda mol: mol.calcfp(fp), mols))
+    if getattr(toolkit_driver, 'fps', []):
+        _add_cost(costs, 'fingerprint', '*', toolkit, _time_per_item(lambda mol: mol.calcfp(), mols))
+
+    if getattr(toolkit_driver, 'descs', None):
+        _add_cost(costs, 'descriptors', '*', toolkit, _time_per_item(lambda mol: mol.calcdesc(), mols))
+
+    if hasattr(toolkit_driver, 'Smarts'):
+        try:
+            pattern = toolkit_driver.Smarts(CALIBRATION_SMARTS)
+            _add_cost(costs, 'substructure', '*', toolkit, _time_per_item(pattern.findall, mols))
+        except Exception as e:
+            logger.debug('Unable to calibrate SMARTS matching of %s: %s', toolkit, e)
+
+    if supports(toolkit, 'make3d'):
+        try:
+            # make3D changes the molecule, every call gets a new one
+            make3d_mols = [toolkit_driver.readstring('smi', smiles) for smiles in
+                           CALIBRATION_SMILES[:CALIBRATION_MAKE3D + 1]]
+        except Exception as e:
+            logger.debug('Unable to calibrate make3d of %s: %s', toolkit, e)
+        else:
+            _add_cost(costs, 'make3d', '*', toolkit,
+                      _time_per_item(lambda mol: mol.make3D(), make3d_mols[1:], warmup=make3d_mols[0]))
+
+    logger.debug('Calibrated toolkit %s', toolkit)
+
+
+def calibrate(selected_toolkits=None):
+    """
+    Measure the per molecule cost of the toolkit operations on a small
+    built-in molecule set
+
+    3D coordinate generation is slow and calibrated on the first
+    `CALIBRATION_MAKE3D` molecules only.
+
+    :param selected_toolkits: toolkits to calibrate, all active offline
+                              toolkits by default
+    :type selected_toolkits:  :py:list
+
+    :return:                  calibration table
+    :rtype:                   :py:dict
+    """
+
+    costs = {}
+    for toolkit in selected_toolkits or list(toolkits.keys()):
+        toolkit_driver = toolkits.get(toolkit)
+        if toolkit_driver is None or toolkit in ONLINE_TOOLKITS or 'smi' not in getattr(toolkit_driver, 'informats', {}):
+            continue
+
+        # Calibration runs next to the endpoint threads
+        with toolkits.lock(toolkit):
+            _calibrate_toolkit(toolkit, toolkit_driver, costs)
+
+    return {'metadata': _metadata('calibration'), 'costs': costs}
+
+
+def calibration_from_benchmarks(results):
+    """
+    Build a calibration table from benchmark suite results
+
+    The throughput of the largest problem size of every benchmark listed
+    in `BENCHMARK_OPERATIONS` is used.
+
+    :param results: benchmark results as written by `benchmarks run`
+    :type results:  :py:dict
+
+    :return:        calibration table
+    :rtype:         :py:dict
+    """
+
+    largest = {}
+    for result in results.get('results', []):
+        if result['name'] not in BENCHMARK_OPERATIONS or not result.get('toolkit') or not result.get('throughput'):
+            continue
+        key = (result['name'], result['toolkit'])
+        if key not in largest or result['size'] > largest[key]['size']:
+            largest[key] = result
+
+    costs = {}
+    for (name, toolkit), result in largest.items():
+        operation, mol_format = BENCHMARK_OPERATIONS[name]
+        _add_cost(costs, operation, mol_format, toolkit, 1.0 / result['throughput'])
+
+    return {'metadata': _metadata('benchmarks'), 'costs': costs}
+
+
+class ToolkitSelector(object):
+    """
+    Select toolkits by the costs in a calibration table
+
+    :param calibration: path to the JSON calibration file
+    :type calibration:  :py:str
+    :param calibrate:   calibrate the toolkits on start if the calibration
+                        file does not exist and store the result
+    :type calibrate:    :py:bool
+    """
+
+    def __init__(self, **kwargs):
+
+        self.calibration = None
+        self.calibrate = True
+        self.costs = {}
+
+        self._lock = threading.Lock()
+        self.configure(**kwargs)
+
+    def configure(self, **kwargs):
+        """
+        Update the toolkit selection settings
+
+        :raises ValueError: on unknown settings
+
+        :return: the updated settings
+        :rtype:  :py:dict
+        """
+
+        unknown = set(kwargs).difference(self.config())
+        if unknown:
+            raise ValueError('Unknown toolkit selection settings: {0}'.format(', '.join(sorted(unknown))))
+
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+        return self.config()
+
+    def config(self):
+        """
+        Return the current settings
+
+        :rtype: :py:dict
+        """
+
+        return {'calibration': self.calibration, 'calibrate': self.calibrate}
+
+    def load(self, table):
+        """
+        Use the costs of a calibration table
+
+        :param table: calibration table
+        :type table:  :py:dict
+        """
+
+        with self._lock:
+            self.costs = table.get('costs', {})
+
+    def save(self, table):
+        """
+        Store a calibration table in the calibration file
+
+        :param table: calibration table
+        :type table:  :py:dict
+        """
+
+        directory = os.path.dirname(self.calibration)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(self.calibration, 'w') as outfile:
+            json.dump(table, outfile, indent=2, sort_keys=True)
+        logger.info('Stored toolkit calibration in %s', self.calibration)
+
+    def start(self):
+        """
+        Load the calibration file or calibrate the toolkits and store the
+        calibration table
+
+        An unreadable calibration file is replaced by a new calibration.
+
+        :return: calibration table, None if not calibrated
+        :rtype:  :py:dict
+        """
+
+        table = None
+        if self.calibration and os.path.isfile(self.calibration):
+            try:
+                with open(self.calibration) as infile:
+                    table = json.load(infile)
+                logger.info('Loaded toolkit calibration from %s', self.calibration)
+            except (IOError, ValueError) as e:
+                logger.error('Unable to read toolkit calibration %s: %s', self.calibration, e)
+
+        if table is None and self.calibrate:
+            table = calibrate()
+            if self.calibration:
+                try:
+                    self.save(table)
+                except (IOError, OSError) as e:
+                    logger.error('Unable to store toolkit calibration %s: %s', self.calibration, e)
+
+        if table is not None:
+            self.load(table)
+        return table
+
+    def cost(self, toolkit, operations):
+        """
+        Total cost per molecule of the operations for a toolkit
+
+        :param toolkit:    toolkit name
+        :type toolkit:     :py:str
+        :param operations: (operation, format) pairs
+        :type operations:  :py:list
+
+        :return:           cost in seconds, None if not measured
+        :rtype:            :py:float
+        """
+
+        total = 0.0
+        with self._lock:
+            for operation, mol_format in operations:
+                cost = _get_cost(self.costs, operation, mol_format, toolkit)
+                if cost is None:
+                    return
+                total += cost
+
+        return total
+
+    def select(self, operations):
+        """
+        Select the cheapest active toolkit supporting all operations
+
+        Toolkits are compared by the summed cost of the operations measured
+        for all of them, operations not measured for some toolkit are left
+        out. Equal costs are ranked in the `PREFERENCE` order.
+
+        :param operations: (operation, format) pairs
+        :type operations:  :py:list
+
+        :return:           toolkit name, None if no toolkit supports the
+                           operations
+        :rtype:            :py:str
+        """
+
+        candidates = [toolkit for toolkit in toolkits.keys() if toolkit not in ONLINE_TOOLKITS and
+                      all(supports(toolkit, operation, mol_format) for operation, mol_format in operations)]
+        if not candidates:
+            return
+
+        with self._lock:
+            costs = self.costs
+        measured = [operation for operation in operations if
+                    all(_get_cost(costs, operation[0], operation[1], toolkit) is not None for toolkit in candidates)]
+
+        def rank(toolkit):
+
+            total = sum(_get_cost(costs, operation, mol_format, toolkit) for operation, mol_format in measured)
+            return total, PREFERENCE.index(toolkit) if toolkit in PREFERENCE else len(PREFERENCE)
+
+        return min(candidates, key=rank)
+
+
+toolkit_selector = ToolkitSelector()
+
+
+def select_toolkit(endpoint):
+    """
+    Decorator resolving the 'auto' toolkit of endpoint method requests
+    with signature (self, request, claims) and reporting the toolkit used
+    in the response.
+
+    :param endpoint: endpoint name
+    :type endpoint:  :py:str
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(self, request, claims):
+
+            toolkit = request.get('toolkit')
+            if toolkit == AUTO:
+                operations = endpoint_operations(endpoint, request)
+                toolkit = toolkit_selector.select(operations)
+                if toolkit is None:
+                    logger.error('No active toolkit supports %s', ', '.join('{0} {1}'.format(*op) for op in operations))
+                    return {'status': 'failed'}
+
+                logger.debug('Selected toolkit %s for %s request', toolkit, endpoint)
+                request = dict(request, toolkit=toolkit)
+
+            def report(response):
+
+                if isinstance(response, dict) and toolkit:
+                    response.setdefault('toolkit', toolkit)
+                return response
+
+            response = func(self, request, claims)
+            if hasattr(response, 'addCallback'):
+                return response.addCallback(report)
+            return report(response)
+
+        return wrapper
+
+    return decorator
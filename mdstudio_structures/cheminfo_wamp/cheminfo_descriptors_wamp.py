@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
-from mdstudio_structures.cheminfo_molhandle import mol_read, mol_validate_file_object
+from mdstudio_structures.cheminfo_metrics import phase
+from mdstudio_structures.cheminfo_molhandle import mol_read_file_object, mol_validate_file_object
 
 
 class CheminfoDescriptorsWampApi(object):
@@ -8,13 +9,19 @@ class CheminfoDescriptorsWampApi(object):
     Cheminformatics descriptors WAMP API
     """
 
-    @staticmethod
-    def get_descriptors(request, claims):
+    def get_descriptors(self, request, claims):
 
         # Import the molecule
-        mol = mol_validate_file_object(request['mol'])
-        molobject = mol_read(mol['content'], mol_format=mol['extension'], toolkit=request["toolkit"])
-        desc = molobject.calcdesc()
+        try:
+            with phase('validate'):
+                mol = mol_validate_file_object(request['mol'], load=False)
+        except ValueError as error:
+            self.log.error('Unable to decode the input structure: {0}'.format(error))
+            return {'status': 'failed', 'descriptors': None}
+        with phase('mol_read'):
+            molobject = mol_read_file_object(mol, toolkit=request["toolkit"])
+        with phase('compute'):
+            desc = molobject.calcdesc()
 
         if desc is not None:
             status = 'completed'
@@ -10,7 +10,9 @@ import os
 import numpy
 import pandas
 
-from mdstudio_structures.cheminfo_molhandle import mol_read, mol_validate_file_object
+from mdstudio_structures.cheminfo_dedupe import mol_deduplicate
+from mdstudio_structures.cheminfo_metrics import phase
+from mdstudio_structures.cheminfo_molhandle import mol_read_file_object, mol_validate_file_object
 from mdstudio_structures.cheminfo_fingerprint import mol_fingerprint_cross_similarity
 
 
@@ -33,35 +35,50 @@ class CheminfoFingerprintsWampApi(object):
         toolkit = request['toolkit']
         fp_format = request['fp_format']
         ci_cutoff = request['ci_cutoff']
-        test_set = [mol_validate_file_object(obj) for obj in request['test_set']]
-        reference_set = [mol_validate_file_object(obj) for obj in request['reference_set']]
+        try:
+            with phase('validate'):
+                test_set = [mol_validate_file_object(obj, load=False) for obj in request['test_set']]
+                reference_set = [mol_validate_file_object(obj, load=False) for obj in request['reference_set']]
+        except ValueError as error:
+            self.log.error('Unable to decode the input structures: {0}'.format(error))
+            return {'status': 'failed', 'results': {}}
 
         # Import the molecules
-        test_mols = [mol_read(
-            mol['content'], mol_format=mol['extension'], toolkit=toolkit) for mol in test_set]
-        reference_mols = [mol_read(
-            mol['content'], mol_format=mol['extension'], toolkit=toolkit) for mol in reference_set]
-
-        # Calculate the fingerprints
-        test_fps = [m.calcfp(fp_format) for m in test_mols]
-        reference_fps = [m.calcfp(fp_format) for m in reference_mols]
-
-        # Calculate the similarity matrix
-        simmat = mol_fingerprint_cross_similarity(test_fps, reference_fps, toolkit, metric=metric)
-
-        # Calculate average similarity, maximum similarity and report the index
-        # of the reference case with maximum similarity.
-        stats = [numpy.mean(simmat, axis=1), numpy.max(simmat, axis=1), numpy.argmax(simmat, axis=1)]
-
-        # Format as Pandas DataFrame and export as JSON
-        stats = pandas.DataFrame(stats).T
-        stats.columns = ['average', 'max_sim', 'idx_max_sim']
-        stats['idx_max_sim'] = stats['idx_max_sim'].astype(int)
-
-        # Calculate applicability domain CI value if ci_cutoff defined
-        if ci_cutoff:
-            stats['CI'] = (stats['average'] >= ci_cutoff).astype(int)
-            self.log.info('Chemical similarity AD analysis with cutoff {0}'.format(ci_cutoff))
+        with phase('mol_read'):
+            test_mols = [mol_read_file_object(mol, toolkit=toolkit) for mol in test_set]
+            reference_mols = [mol_read_file_object(mol, toolkit=toolkit) for mol in reference_set]
+
+        # Only calculate fingerprints and similarities for unique structures
+        test_inverse = reference_inverse = None
+        if request.get('deduplicate', False):
+            with phase('deduplicate'):
+                dedupe_key = request.get('dedupe_key', 'smiles')
+                test_mols, test_inverse = mol_deduplicate(test_mols, key=dedupe_key)
+                reference_mols, reference_inverse = mol_deduplicate(reference_mols, key=dedupe_key)
+
+        with phase('compute'):
+            # Calculate the fingerprints
+            test_fps = [m.calcfp(fp_format) for m in test_mols]
+            reference_fps = [m.calcfp(fp_format) for m in reference_mols]
+
+            # Calculate the similarity matrix
+            simmat = mol_fingerprint_cross_similarity(test_fps, reference_fps, toolkit, metric=metric)
+            if test_inverse is not None:
+                simmat = simmat[test_inverse][:, reference_inverse]
+
+            # Calculate average similarity, maximum similarity and report the index
+            # of the reference case with maximum similarity.
+            stats = [numpy.mean(simmat, axis=1), numpy.max(simmat, axis=1), numpy.argmax(simmat, axis=1)]
+
+            # Format as Pandas DataFrame and export as JSON
+            stats = pandas.DataFrame(stats).T
+            stats.columns = ['average', 'max_sim', 'idx_max_sim']
+            stats['idx_max_sim'] = stats['idx_max_sim'].astype(int)
+
+            # Calculate applicability domain CI value if ci_cutoff defined
+            if ci_cutoff:
+                stats['CI'] = (stats['average'] >= ci_cutoff).astype(int)
+                self.log.info('Chemical similarity AD analysis with cutoff {0}'.format(ci_cutoff))
 
         # Create workdir and save file
         workdir = request['workdir']
@@ -69,7 +86,9 @@ class CheminfoFingerprintsWampApi(object):
             os.mkdir(workdir)
             self.log.debug('Create working directory: {0}'.format(workdir))
         filepath = os.path.join(workdir, 'adan_chemical_similarity.csv')
-        stats.to_csv(filepath)
+        with phase('mol_write'):
+            stats.to_csv(filepath)
 
         status = 'completed'
-        return {'status': status, 'results': stats.to_dict()}
+        with phase('response'):
+            return {'status': status, 'results': stats.to_dict()}
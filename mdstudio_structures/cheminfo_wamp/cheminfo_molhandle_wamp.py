@@ -6,16 +6,26 @@ file: wamp_services.py
 WAMP service methods the module exposes.
 """
 
+import os
+import tempfile
+
+from mdstudio_structures.cheminfo_metrics import phase
 from mdstudio_structures.cheminfo_molhandle import (
-     mol_addh, mol_attributes, mol_make3D, mol_read, mol_removeh, mol_write, mol_combine_rotations,
-     mol_validate_file_object)
+     mol_addh, mol_attributes, mol_convert_many, mol_make3D, mol_read_file_object, mol_removeh, mol_write,
+     mol_combine_rotations, mol_validate_file_object)
+from mdstudio_structures.cheminfo_payload import available_encodings, encode_content, is_supported_encoding
 
 
-def create_path_file_obj(mol, extension='mol2'):
+def create_path_file_obj(mol, extension='mol2', encoding=None, path=None):
     """
-    Encode the input files
+    Encode the input files, optionally compressed using a path_file
+    content encoding. Only the path is returned for files written to disk.
     """
-    return {'path': None, 'content': mol, 'extension': extension}
+    if path is not None:
+        return {'path': path, 'content': None, 'extension': extension, 'encoding': 'utf8'}
+
+    return {'path': None, 'content': encode_content(mol, encoding), 'extension': extension,
+            'encoding': encoding or 'utf8'}
 
 
 class CheminfoMolhandleWampApi(object):
@@ -27,15 +37,79 @@ class CheminfoMolhandleWampApi(object):
     def read_mol(config):
         """Read molecular structure using `config` """
 
-        mol = mol_validate_file_object(config['mol'])
-        return mol_read(
-            mol['content'], mol_format=mol['extension'].lstrip('.'), toolkit=config['toolkit'])
+        with phase('validate'):
+            mol = mol_validate_file_object(config['mol'], load=False)
+        with phase('mol_read'):
+            return mol_read_file_object(mol, toolkit=config['toolkit'])
 
     @staticmethod
     def get_output_format(config):
         """ Retrieve the format to store the output"""
         return config.get('output_format', config['mol']['extension'].lstrip('.'))
 
+    @staticmethod
+    def get_output_encoding(config):
+        """ Retrieve the content encoding of the output"""
+        return config.get('output_encoding')
+
+    def unsupported_output_encoding(self, config):
+        """
+        Failed response if the content encoding of the output is not
+        supported, None otherwise
+        """
+        encoding = self.get_output_encoding(config)
+        if is_supported_encoding(encoding):
+            return None
+
+        self.log.error('Unsupported output encoding "{0}", choose from: {1}'.format(
+            encoding, ', '.join(available_encodings())))
+        return {'status': 'failed', 'mol': self.failed_mol(config)}
+
+    def failed_mol(self, config):
+        """Empty output path_file object of a failed response"""
+        return {'path': None, 'content': None, 'extension': self.get_output_format(config)}
+
+    def invalid_input(self, error, **response):
+        """
+        Failed response if the input structure content can not be decoded,
+        e.g. malformed base64 or an unavailable compression
+        """
+        self.log.error('Unable to decode the input structure: {0}'.format(error))
+        response['status'] = 'failed'
+        return response
+
+    @staticmethod
+    def get_output_path(config, extension):
+        """
+        Unique file path in the workdir to write the output to if
+        `return_path` is requested, None otherwise
+        """
+        if not config.get('return_path', False):
+            return None
+
+        workdir = os.path.abspath(config.get('workdir') or '.')
+        if not os.path.isdir(workdir):
+            os.makedirs(workdir)
+
+        fd, path = tempfile.mkstemp(prefix='structure_', suffix='.{0}'.format(extension), dir=workdir)
+        os.close(fd)
+        return path
+
+    def write_mol(self, molobject, config):
+        """
+        Write molecule as path_file object, inline or to a file in the
+        workdir if `return_path` is requested
+        """
+        output_format = self.get_output_format(config)
+        file_path = self.get_output_path(config, output_format)
+        with phase('mol_write'):
+            output = mol_write(molobject, mol_format=output_format, file_path=file_path)
+
+        with phase('response'):
+            return create_path_file_obj(
+                output, extension=output_format, encoding=self.get_output_encoding(config),
+                path=output if file_path else None)
+
     def convert_structures(self, request, claims):
         """
         Convert input file format to a different format. For a detailed
@@ -44,12 +118,35 @@ class CheminfoMolhandleWampApi(object):
         And for a detailed description of the output see:
            mdstudio_structures/schemas/endpoints/convert_response_v1.json
         """
-        molobject = self.read_mol(request)
+        failed = self.unsupported_output_encoding(request)
+        if failed:
+            return failed
 
-        output_format = self.get_output_format(request)
-        output = mol_write(molobject, mol_format=output_format, file_path=None)
+        try:
+            molobject = self.read_mol(request)
+        except ValueError as error:
+            return self.invalid_input(error, mol=self.failed_mol(request))
 
-        return {'mol': create_path_file_obj(output, extension=output_format), 'status': 'completed'}
+        return {'mol': self.write_mol(molobject, request), 'status': 'completed'}
+
+    def convert_batch_structures(self, request, claims):
+        """
+        Convert many line notations or IUPAC names to one or more output
+        formats. For a detailed input description see the file:
+           mdstudio_structures/schemas/endpoints/convert_batch_request_v1.json
+        And for a detailed description of the output see:
+           mdstudio_structures/schemas/endpoints/convert_batch_response_v1.json
+        """
+        with phase('compute'):
+            result = mol_convert_many(
+                request['mols'], request['input_format'], output_formats=request.get('output_formats', ['smi']),
+                toolkit=request['toolkit'], threads=request.get('threads', 4))
+
+        if result is None:
+            return {'status': 'failed'}
+
+        output, errors = result
+        return {'output': output, 'errors': errors, 'status': 'completed'}
 
     def addh_structures(self, request, claims):
         """
@@ -59,17 +156,22 @@ class CheminfoMolhandleWampApi(object):
         And for a detailed description of the output see:
            mdstudio_structures/schemaS/endpoints/addh_response_v1.json
         """
+        failed = self.unsupported_output_encoding(request)
+        if failed:
+            return failed
 
-        molobject = mol_addh(
-            self.read_mol(request),
-            polaronly=request['polaronly'],
-            correctForPH=request['correctForPH'],
-            pH=request['pH'])
-
-        output_format = self.get_output_format(request)
-        output = mol_write(molobject, mol_format=output_format, file_path=None)
+        try:
+            molobject = self.read_mol(request)
+        except ValueError as error:
+            return self.invalid_input(error, mol=self.failed_mol(request))
+        with phase('compute'):
+            molobject = mol_addh(
+                molobject,
+                polaronly=request['polaronly'],
+                correctForPH=request['correctForPH'],
+                pH=request['pH'])
 
-        return {'mol': create_path_file_obj(output, extension=output_format), 'status': 'completed'}
+        return {'mol': self.write_mol(molobject, request), 'status': 'completed'}
 
     def removeh_structures(self, request, claims):
         """
@@ -79,12 +181,18 @@ class CheminfoMolhandleWampApi(object):
         And for a detailed description of the output see:
            mdstudio_structures/schemas/endpoints/removeh_response_v1.json
         """
-        molobject = mol_removeh(self.read_mol(request))
+        failed = self.unsupported_output_encoding(request)
+        if failed:
+            return failed
 
-        output_format = self.get_output_format(request)
-        output = mol_write(molobject, mol_format=output_format, file_path=None)
+        try:
+            molobject = self.read_mol(request)
+        except ValueError as error:
+            return self.invalid_input(error, mol=self.failed_mol(request))
+        with phase('compute'):
+            molobject = mol_removeh(molobject)
 
-        return {'mol': create_path_file_obj(output, extension=output_format), 'status': 'completed'}
+        return {'mol': self.write_mol(molobject, request), 'status': 'completed'}
 
     def make3d_structures(self, request, claims):
         """
@@ -95,16 +203,22 @@ class CheminfoMolhandleWampApi(object):
         And for a detailed description of the output see:
           mdstudio_structures/schemas/endpoints/make3d_response_v1.json
         """
-        molobject = mol_make3D(
-            self.read_mol(request),
-            forcefield=request['forcefield'],
-            localopt=request['localopt'],
-            steps=request['steps'])
+        failed = self.unsupported_output_encoding(request)
+        if failed:
+            return failed
 
-        output_format = self.get_output_format(request)
-        output = mol_write(molobject, mol_format=output_format, file_path=None)
+        try:
+            molobject = self.read_mol(request)
+        except ValueError as error:
+            return self.invalid_input(error, mol=self.failed_mol(request))
+        with phase('compute'):
+            molobject = mol_make3D(
+                molobject,
+                forcefield=request['forcefield'],
+                localopt=request['localopt'],
+                steps=request['steps'])
 
-        return {'mol': create_path_file_obj(output, extension=output_format), 'status': 'completed'}
+        return {'mol': self.write_mol(molobject, request), 'status': 'completed'}
 
     def structure_attributes(self, request, claims):
         """
@@ -116,8 +230,12 @@ class CheminfoMolhandleWampApi(object):
           mdstudio_structures/schemas/endpoints/info_response_v1.json
         """
         # Retrieve the WAMP session information
-        molobject = self.read_mol(request)
-        attributes = mol_attributes(molobject) or {}
+        try:
+            molobject = self.read_mol(request)
+        except ValueError as error:
+            return self.invalid_input(error, attributes={})
+        with phase('compute'):
+            attributes = mol_attributes(molobject) or {}
 
         return {'status': 'completed', 'attributes': attributes}
 
@@ -131,12 +249,24 @@ class CheminfoMolhandleWampApi(object):
           mdstudio_structures/schemas/endpoints/rotate_response_v1.json
 
         """
+        failed = self.unsupported_output_encoding(request)
+        if failed:
+            return failed
+
         # Read in the molecule
-        molobject = self.read_mol(request)
+        try:
+            molobject = self.read_mol(request)
+        except ValueError as error:
+            return self.invalid_input(error, mol=self.failed_mol(request))
 
         rotations = request['rotations']
         output_format = self.get_output_format(request)
-        output = mol_combine_rotations(molobject, rotations=rotations)
+        file_path = self.get_output_path(request, output_format)
+        with phase('compute'):
+            output = mol_combine_rotations(molobject, rotations=rotations, file_path=file_path)
         status = 'completed' if output is not None else 'failed'
 
-        return {'status': status, 'mol': create_path_file_obj(output, extension=output_format)}
+        mol = create_path_file_obj(
+            output, extension=output_format, encoding=self.get_output_encoding(request),
+            path=output if file_path else None)
+        return {'status': status, 'mol': mol}
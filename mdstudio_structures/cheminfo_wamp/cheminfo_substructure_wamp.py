@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cheminfo_substructure_wamp.py
+
+WAMP service methods the module exposes.
+"""
+
+import os
+import hashlib
+
+from mdstudio_structures.cheminfo_dedupe import mol_deduplicate, scatter
+from mdstudio_structures.cheminfo_filter import mol_filter
+from mdstudio_structures.cheminfo_metrics import phase
+from mdstudio_structures.cheminfo_molhandle import mol_read_many, mol_validate_file_object
+from mdstudio_structures.cheminfo_substructure import (fingerprint_cache, mol_substructure_search,
+                                                        screening_supported, smarts_cache)
+
+
+def library_key(library, toolkit):
+    """
+    Cache key of a validated library path_file object: a hash of the
+    content, or of the path and modification time of a file
+    """
+
+    if library['content'] is not None:
+        data = library['content']
+    else:
+        stat = os.stat(library['path'])
+        data = '{0}:{1}:{2}'.format(os.path.abspath(library['path']), stat.st_mtime, stat.st_size)
+
+    return '{0}:{1}'.format(toolkit, hashlib.sha1(data.encode('utf-8')).hexdigest())
+
+
+class CheminfoSubstructureWampApi(object):
+    """
+    Cheminformatics substructure search WAMP API
+    """
+
+    @staticmethod
+    def read_library(config):
+        """
+        Read all molecules in the multi molecule `library` of config.
+        Returns the molecules and the library cache key, raises ValueError
+        if the library content can not be decoded or the library file does
+        not exist.
+        """
+
+        with phase('validate'):
+            library = mol_validate_file_object(config['library'], load=False)
+
+        from_file = library['content'] is None
+        if from_file and not (library['path'] and os.path.isfile(library['path'])):
+            raise ValueError('Library file not found: {0}'.format(library['path']))
+
+        with phase('mol_read'):
+            molobjects = list(mol_read_many(library['path'] if from_file else library['content'],
+                                            mol_format=library['extension'].lstrip('.'), from_file=from_file,
+                                            toolkit=config['toolkit']) or [])
+
+        return molobjects, library_key(library, config['toolkit'])
+
+    @staticmethod
+    def deduplicate_library(config, molobjects, key):
+        """
+        Reduce library molecules to unique structures if `deduplicate` is
+        requested. Returns the unique molecules, the index of the unique
+        molecule for every molecule (None without deduplication) and the
+        library cache key of the unique molecules.
+        """
+
+        if not config.get('deduplicate', False):
+            return molobjects, None, key
+
+        dedupe_key = config.get('dedupe_key', 'smiles')
+        with phase('deduplicate'):
+            unique, inverse = mol_deduplicate(molobjects, key=dedupe_key)
+
+        return unique, inverse, '{0}:{1}'.format(key, dedupe_key)
+
+    def substructure_search(self, request, claims):
+        """
+        Find the molecules in a library matching a SMARTS pattern.
+        For a detailed input description see the file:
+           mdstudio_structures/schemas/endpoints/substructure_search_request_v1.json
+        And for a detailed description of the output see:
+           mdstudio_structures/schemas/endpoints/substructure_search_response_v1.json
+        """
+        try:
+            molobjects, key = self.read_library(request)
+        except ValueError as error:
+            self.log.error('Unable to read the library: {0}'.format(error))
+            return {'status': 'failed'}
+        unique, inverse, key = self.deduplicate_library(request, molobjects, key)
+        screen = request.get('screen', True) and screening_supported(request['toolkit'])
+        with phase('compute'):
+            fingerprints = fingerprint_cache.get(key, unique) if screen else None
+            result = mol_substructure_search(
+                request['smarts'], unique, toolkit=request['toolkit'], screen=screen,
+                fingerprints=fingerprints, threads=request.get('threads', 4))
+
+        if result is None:
+            return {'status': 'failed'}
+
+        matches, stats = result
+        stats['unique'] = len(unique)
+        if inverse is not None:
+            matches = scatter(matches, inverse)
+            stats.update(molecules=len(matches), matched=sum(1 for match in matches if match))
+
+            # Atom indices differ between duplicates, match the duplicate hits again
+            with phase('compute'):
+                pattern = smarts_cache.get(request['smarts'], request['toolkit'])
+                for i, match in enumerate(matches):
+                    if match and molobjects[i] is not unique[inverse[i]]:
+                        matches[i] = [list(atoms) for atoms in pattern.findall(molobjects[i])]
+
+        hits = [{'index': i, 'title': molobjects[i].title, 'matches': match}
+                for i, match in enumerate(matches) if match]
+        self.log.info('Substructure search matched {matched} of {molecules} molecules, '
+                      '{screened} screened out by fingerprint'.format(**stats))
+
+        response = {'hits': hits, 'status': 'completed'}
+        response.update(stats)
+        return response
+
+    def filter_structures(self, request, claims):
+        """
+        Match the molecules in a library against the structural alerts of
+        one or more catalogues, e.g. PAINS or reactive groups.
+        For a detailed input description see the file:
+           mdstudio_structures/schemas/endpoints/filter_request_v1.json
+        And for a detailed description of the output see:
+           mdstudio_structures/schemas/endpoints/filter_response_v1.json
+        """
+        try:
+            molobjects, key = self.read_library(request)
+        except ValueError as error:
+            self.log.error('Unable to read the library: {0}'.format(error))
+            return {'status': 'failed'}
+        unique, inverse, key = self.deduplicate_library(request, molobjects, key)
+        screen = request.get('screen', True) and screening_supported(request['toolkit'])
+        with phase('compute'):
+            fingerprints = fingerprint_cache.get(key, unique) if screen else None
+            result = mol_filter(unique, catalogues=request.get('catalogues', ['pains']),
+                                toolkit=request['toolkit'], screen=screen, fingerprints=fingerprints)
+
+        if result is None:
+            return {'status': 'failed'}
+
+        alerts, stats = result
+        stats['unique'] = len(unique)
+        if inverse is not None:
+            alerts = scatter(alerts, inverse)
+            stats.update(molecules=len(alerts), flagged=sum(1 for alert in alerts if alert))
+
+        self.log.info('Structural alerts flagged {flagged} of {molecules} molecules'.format(**stats))
+
+        response = {'alerts': alerts, 'titles': [molobject.title if molobject is not None else None
+                                                 for molobject in molobjects], 'status': 'completed'}
+        response.update(stats)
+        return response
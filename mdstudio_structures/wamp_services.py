@@ -8,20 +8,28 @@ WAMP service methods the module exposes.
 
 import sys
 import os
+import logging
 import tempfile
+import threading
 
 from autobahn.wamp import RegisterOptions
 from mdstudio.api.endpoint import endpoint
 from mdstudio.component.session import ComponentSession
 
-from Bio.PDB import PDBList
-from Bio.PDB.PDBIO import PDBIO
-from Bio.PDB.PDBParser import PDBParser
-
 from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_biostructure import structure_format, structure_remove_residues
+from mdstudio_structures.cheminfo_coalesce import coalesce, coalescer
+from mdstudio_structures.cheminfo_executor import executor, offload
+from mdstudio_structures.cheminfo_filter import configure_catalogues
+from mdstudio_structures.cheminfo_metrics import instrument, metrics
+from mdstudio_structures.cheminfo_payload import decode_content, encode_content
+from mdstudio_structures.cheminfo_profiler import profiled, profiler
+from mdstudio_structures.cheminfo_rcsb import StructureCache, retrieve_rcsb_structure
+from mdstudio_structures.cheminfo_toolkit_select import select_toolkit, toolkit_selector
 from mdstudio_structures.cheminfo_wamp.cheminfo_descriptors_wamp import CheminfoDescriptorsWampApi
 from mdstudio_structures.cheminfo_wamp.cheminfo_molhandle_wamp import CheminfoMolhandleWampApi
 from mdstudio_structures.cheminfo_wamp.cheminfo_fingerprints_wamp import CheminfoFingerprintsWampApi
+from mdstudio_structures.cheminfo_wamp.cheminfo_substructure_wamp import CheminfoSubstructureWampApi
 
 # Library and function compatibility
 if sys.version_info[0] < 3:
@@ -32,50 +40,177 @@ else:
 
 class StructuresWampApi(
         CheminfoDescriptorsWampApi, CheminfoMolhandleWampApi,
-        CheminfoFingerprintsWampApi, ComponentSession):
+        CheminfoFingerprintsWampApi, CheminfoSubstructureWampApi, ComponentSession):
     """
     Structure database WAMP methods.
     """
+    _structure_cache = None
+    _structure_cache_lock = threading.Lock()
+
     def authorize_request(self, uri, claims):
         return True
 
+    def service_setting(self, key, default=None):
+        """
+        Return a setting from the 'settings' section of the component
+        configuration (settings.yml) or default if not defined.
+        """
+        settings = getattr(getattr(self, 'component_config', None), 'settings', None) or {}
+        return settings.get(key, default)
+
+    def on_run(self):
+        """
+        Configure the log level of the cheminformatics functions, the
+        endpoint executors, request coalescing, the Prometheus text file
+        export of the endpoint metrics, the endpoint profiler, the
+        structural alert catalogues and the 'auto' toolkit selection using
+        the 'logging', 'executor', 'coalesce', 'metrics', 'profiler',
+        'filter_catalogues' and 'toolkit_selection' settings.
+
+        The toolkit calibration runs in a worker thread, requests with
+        toolkit 'auto' use the preferred toolkit until it is done.
+        """
+        level = (self.service_setting('logging') or {}).get('level')
+        if level:
+            logging.getLogger('mdstudio_structures').setLevel(level.upper())
+
+        executor.configure(**(self.service_setting('executor') or {}))
+        coalescer.configure(**(self.service_setting('coalesce') or {}))
+
+        config = self.service_setting('metrics') or {}
+        metrics.textfile = config.get('textfile')
+        metrics.textfile_interval = config.get('interval', 60)
+
+        profiler.configure(**(self.service_setting('profiler') or {}))
+        configure_catalogues(self.service_setting('filter_catalogues'))
+
+        toolkit_selector.configure(**(self.service_setting('toolkit_selection') or {}))
+        executor.run_in_thread(toolkit_selector.start)
+
+        return super(StructuresWampApi, self).on_run()
+
+    @property
+    def structure_cache(self):
+        """
+        Local structure file cache used by the retrieve_rcsb_structure
+        endpoint. Configured using the 'structure_cache' settings.
+        """
+        with self._structure_cache_lock:
+            if self._structure_cache is None:
+                config = self.service_setting('structure_cache') or {}
+                path = config.get('path') or os.path.join(tempfile.gettempdir(), 'mdstudio_structures_cache')
+                self._structure_cache = StructureCache(path, max_size=config.get('max_size', 2 * 1024 ** 3))
+        return self._structure_cache
+
     @endpoint('chemical_similarity', 'chemical_similarity_request', 'chemical_similarity_response',
               options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('chemical_similarity')
+    @instrument('chemical_similarity')
+    @coalesce('chemical_similarity')
+    @offload('chemical_similarity')
+    @profiled('chemical_similarity')
     def calculate_chemical_similarity(self, request, claims):
         request['workdir'] = os.path.abspath(request['workdir'])
         return super(StructuresWampApi, self).calculate_chemical_similarity(request, claims)
 
     @endpoint('descriptors', 'descriptors_request', 'descriptors_response',
               options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('descriptors')
+    @instrument('descriptors')
+    @coalesce('descriptors')
+    @offload('descriptors')
+    @profiled('descriptors')
     def get_descriptors(self, request, claims):
         request['workdir'] = os.path.abspath(request['workdir'])
         return super(StructuresWampApi, self).get_descriptors(request, claims)
 
     @endpoint('convert', 'convert_request', 'convert_response', options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('convert')
+    @instrument('convert')
+    @coalesce('convert')
+    @offload('convert')
+    @profiled('convert')
     def convert_structures(self, request, claims):
         request['workdir'] = os.path.abspath(request['workdir'])
         return super(StructuresWampApi, self).convert_structures(request, claims)
 
+    @endpoint('convert_batch', 'convert_batch_request', 'convert_batch_response',
+              options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('convert_batch')
+    @instrument('convert_batch')
+    @coalesce('convert_batch')
+    @offload('convert_batch')
+    @profiled('convert_batch')
+    def convert_batch_structures(self, request, claims):
+        request['workdir'] = os.path.abspath(request['workdir'])
+        return super(StructuresWampApi, self).convert_batch_structures(request, claims)
+
+    @endpoint('substructure_search', 'substructure_search_request', 'substructure_search_response',
+              options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('substructure_search')
+    @instrument('substructure_search')
+    @coalesce('substructure_search')
+    @offload('substructure_search')
+    @profiled('substructure_search')
+    def substructure_search(self, request, claims):
+        request['workdir'] = os.path.abspath(request['workdir'])
+        return super(StructuresWampApi, self).substructure_search(request, claims)
+
+    @endpoint('filter', 'filter_request', 'filter_response', options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('filter')
+    @instrument('filter')
+    @coalesce('filter')
+    @offload('filter')
+    @profiled('filter')
+    def filter_structures(self, request, claims):
+        request['workdir'] = os.path.abspath(request['workdir'])
+        return super(StructuresWampApi, self).filter_structures(request, claims)
+
     @endpoint('addh', 'addh_request', 'addh_response', options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('addh')
+    @instrument('addh')
+    @coalesce('addh')
+    @offload('addh')
+    @profiled('addh')
     def addh_structures(self, request, claims):
         request['workdir'] = os.path.abspath(request['workdir'])
         return super(StructuresWampApi, self).addh_structures(request, claims)
 
     @endpoint('removeh', 'removeh_request', 'removeh_response', options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('removeh')
+    @instrument('removeh')
+    @coalesce('removeh')
+    @offload('removeh')
+    @profiled('removeh')
     def removeh_structures(self, request, claims):
         request['workdir'] = os.path.abspath(request['workdir'])
         return super(StructuresWampApi, self).removeh_structures(request, claims)
 
     @endpoint('make3d', 'make3d_request', 'make3d_response', options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('make3d')
+    @instrument('make3d')
+    @coalesce('make3d')
+    @offload('make3d')
+    @profiled('make3d')
     def make3d_structures(self, request, claims):
         request['workdir'] = os.path.abspath(request['workdir'])
         return super(StructuresWampApi, self).make3d_structures(request, claims)
 
     @endpoint('info', 'info_request', 'info_response', options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('info')
+    @instrument('info')
+    @coalesce('info')
+    @offload('info')
+    @profiled('info')
     def structure_attributes(self, request, claims):
         return super(StructuresWampApi, self).structure_attributes(request, claims)
 
     @endpoint('rotate', 'rotate_request', 'rotate_response', options=RegisterOptions(invoke=u'roundrobin'))
+    @select_toolkit('rotate')
+    @instrument('rotate')
+    @coalesce('rotate')
+    @offload('rotate')
+    @profiled('rotate')
     def rotate_structures(self, request, claims):
         request['workdir'] = os.path.abspath(request['workdir'])
         return super(StructuresWampApi, self).rotate_structures(request, claims)
@@ -93,11 +228,54 @@ class StructuresWampApi(
         """
         return {'status': 'completed', 'toolkits': list(toolkits.keys())}
 
+    @endpoint('metrics', 'metrics_request', 'metrics_response', options=RegisterOptions(invoke=u'roundrobin'))
+    def endpoint_metrics(self, request, claims):
+        """
+        Query endpoint latency, payload size and request count metrics
+
+        For a detailed input description see the file:
+           mdstudio_structures/schemas/endpoints/metrics_request_v1.json
+        And for a detailed description of the output see:
+           mdstudio_structures/schemas/endpoints/metrics_response_v1.json
+        """
+        if request.get('format') == 'prometheus':
+            result = {'status': 'completed', 'prometheus': metrics.to_prometheus()}
+        else:
+            result = {'status': 'completed', 'metrics': metrics.snapshot()}
+
+        if request.get('reset', False):
+            metrics.reset()
+
+        return result
+
+    @endpoint('profiler', 'profiler_request', 'profiler_response', options=RegisterOptions(invoke=u'roundrobin'))
+    def configure_profiler(self, request, claims):
+        """
+        Query or update the endpoint profiler settings at runtime
+
+        For a detailed input description see the file:
+           mdstudio_structures/schemas/endpoints/profiler_request_v1.json
+        And for a detailed description of the output see:
+           mdstudio_structures/schemas/endpoints/profiler_response_v1.json
+        """
+        try:
+            config = profiler.configure(**request)
+        except ValueError as error:
+            self.log.error('Unable to configure profiler: {0}'.format(error))
+            return {'status': 'failed', 'config': profiler.config()}
+
+        self.log.info('Profiler settings: {0}'.format(config))
+        return {'status': 'completed', 'config': config}
+
     @endpoint('remove_residues', 'remove_residues_request', 'remove_residues_response',
               options=RegisterOptions(invoke=u'roundrobin'))
+    @instrument('remove_residues')
+    @coalesce('remove_residues')
+    @offload('remove_residues')
+    @profiled('remove_residues')
     def remove_residues(self, request, claims):
         """
-        Remove residues from a PDB structure
+        Remove residues from a PDB or mmCIF structure
 
         For a detailed input description see the file:
            mdstudio_structures/schemas/endpoints/removed_residues_request_v1.json
@@ -105,43 +283,59 @@ class StructuresWampApi(
            mdstudio_structures/schemas/endpoints/removed_residues_response_v1.json
         """
         request['workdir'] = os.path.abspath(request['workdir'])
-        # Parse the structure
-        parser = PDBParser(PERMISSIVE=True)
-        struc_obj = StringIO(request.get('mol'))
-
-        structure = parser.get_structure('mol_object', struc_obj)
-        struc_obj.close()
-
-        to_remove = [r.upper() for r in request.get('residues', [])]
-        removed = []
-        for model in structure:
-            for chain in model:
-                for residue in chain:
-                    if residue.get_resname() in to_remove:
-                        chain.detach_child(residue.id)
-                        removed.append(residue.get_resname())
-                if len(chain) == 0:
-                    model.detach_child(chain.id)
-        self.log.info('Removed residues: {0}'.format(','.join(removed)))
-
-        # Save to file or string
-        pdbio = PDBIO()
-        pdbio.set_structure(structure)
 
+        # Structure as path_file object or plain string. mmCIF structures
+        # are streamed from file when only a path is given.
+        mol = request.get('mol')
+        if not isinstance(mol, dict):
+            mol = {'content': mol, 'path': None, 'extension': None}
+
+        struc_obj = None
+        output_format = request.get('output_format') or mol.get('extension') or 'pdb'
         status = 'completed'
-        if request.get('workdir'):
-            result = os.path.join(request.get('workdir'), 'structure.pdb')
-            pdbio.save(result)
-        else:
-            outfile = StringIO()
-            pdbio.save(outfile)
-            outfile.seek(0)
-            result = outfile.read()
+        try:
+            if mol.get('content') is None and mol.get('path'):
+                struc_obj = open(mol['path'], 'r')
+            else:
+                struc_obj = StringIO(decode_content(mol.get('content'), mol.get('encoding')))
+
+            mol_format = structure_format(struc_obj, mol.get('extension'))
+            output_format = request.get('output_format') or mol_format
+
+            # Return the content when an output encoding is requested,
+            # write it to the workdir otherwise
+            encoding = request.get('output_encoding')
+            if not encoding:
+                if not os.path.isdir(request['workdir']):
+                    os.makedirs(request['workdir'])
+                result = os.path.join(request['workdir'], 'structure.{0}'.format(output_format))
+                with open(result, 'w') as outfile:
+                    content, removed = structure_remove_residues(
+                        struc_obj, request.get('residues', []), mol_format=mol_format,
+                        output_format=output_format, outfile=outfile)
+                mol = {'path': result, 'content': None, 'extension': output_format}
+            else:
+                content, removed = structure_remove_residues(
+                    struc_obj, request.get('residues', []), mol_format=mol_format, output_format=output_format)
+                mol = {'path': None, 'content': encode_content(content, encoding), 'extension': output_format,
+                       'encoding': encoding}
+            self.log.info('Removed residues: {0}'.format(','.join(removed)))
+        except ValueError as error:
+            self.log.error('Unable to remove residues: {0}'.format(error))
+            status = 'failed'
+            mol = {'path': None, 'content': None, 'extension': output_format}
+        finally:
+            if struc_obj is not None:
+                struc_obj.close()
 
-        return {'status': status, 'mol': result}
+        return {'status': status, 'mol': mol}
 
     @endpoint('retrieve_rcsb_structure', 'retrieve_rcsb_structure_request', 'retrieve_rcsb_structure_response',
               options=RegisterOptions(invoke=u'roundrobin'))
+    @instrument('retrieve_rcsb_structure')
+    @coalesce('retrieve_rcsb_structure')
+    @offload('retrieve_rcsb_structure')
+    @profiled('retrieve_rcsb_structure')
     def fetch_rcsb_structure(self, request, claims):
         """
         Download a structure file from the RCSB database using a PDB ID
@@ -157,12 +351,16 @@ class StructuresWampApi(
         if not os.path.isdir(workdir):
             os.makedirs(workdir)
 
-        # Retrieve the PDB file
+        # Retrieve the PDB file from the local mirror, the cache or the RCSB
+        config = self.service_setting('structure_cache') or {}
         pdb_id = request['pdb_id'].upper()
-        pdb = PDBList()
-        dfile = pdb.retrieve_pdb_file(
-            pdb_id, file_format=request.get('rcsb_file_format', 'pdb'), pdir=workdir,
-            overwrite=True)
+        dfile = retrieve_rcsb_structure(
+            pdb_id, workdir, file_format=request.get('rcsb_file_format', 'pdb'),
+            cache=self.structure_cache if request.get('use_cache', True) else None,
+            mirror=config.get('mirror'), offline=config.get('offline', False))
+        if dfile is None:
+            self.log.error('Structure {0} not in local mirror or cache and service is offline'.format(pdb_id))
+            return {'status': 'failed', 'mol': {'path': None, 'content': None, 'extension': 'pdb'}}
 
         # Change file extension
         base, ext = os.path.splitext(dfile)
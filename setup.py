@@ -40,7 +40,7 @@ setup(
     platforms=['Any'],
     packages=find_packages(),
     py_modules=[distribution_name],
-    package_data={distribution_name: ['schemas/*', 'schemas/endpoints/*']},
+    package_data={distribution_name: ['schemas/*', 'schemas/endpoints/*', 'catalogues/*']},
     install_requires=['biopython', 'cinfony==1.2', 'pandas', 'Pillow', 'retrying', 'scipy', 'JPype1==0.6.3', 'pydpi'],
     extras_require={'test': ['numpy']},
     dependency_links=["https://github.com/cinfony/cinfony/tarball/master#egg=cinfony-1.2"],
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the coalescing of identical concurrent endpoint calls
+"""
+
+import unittest
+
+try:
+    from twisted.internet import defer, task
+    from mdstudio_structures.cheminfo_coalesce import RequestCoalescer, request_key
+except ImportError:
+    defer = None
+
+
+class _DummyApi(object):
+
+    def __init__(self):
+
+        self.calls = []
+
+    def compute(self, request, claims):
+
+        deferred = defer.Deferred()
+        self.calls.append(deferred)
+        return deferred
+
+
+@unittest.skipIf(defer is None, "Twisted not available.")
+class CoalesceTests(unittest.TestCase):
+
+    def setUp(self):
+
+        self.clock = task.Clock()
+        self.coalescer = RequestCoalescer(clock=self.clock, timeout=10)
+        self.api = _DummyApi()
+
+    def call(self, request):
+
+        return self.coalescer.call('convert', _DummyApi.compute, self.api, request, {})
+
+    def test_request_key(self):
+        """
+        Test the request key does not depend on the key order
+        """
+
+        self.assertEqual(request_key('convert', {'a': 1, 'b': [1, 2]}), request_key('convert', {'b': [1, 2], 'a': 1}))
+        self.assertNotEqual(request_key('convert', {'a': 1}), request_key('make3d', {'a': 1}))
+
+    def test_followers(self):
+        """
+        Test identical calls share the result of the leader
+        """
+
+        leader = self.call({'mol': 'CCO'})
+        follower = self.call({'mol': 'CCO'})
+        other = self.call({'mol': 'CCC'})
+
+        self.assertEqual(len(self.api.calls), 2)
+        self.api.calls[0].callback({'status': 'completed', 'mol': {'content': 'CCO'}})
+
+        self.assertEqual(leader.result, follower.result)
+        self.assertFalse(leader.result is follower.result)
+        self.assertFalse(other.called)
+        self.assertEqual(len(self.coalescer), 1)
+
+    def test_failure(self):
+        """
+        Test failures of the leader propagate to followers
+        """
+
+        leader = self.call({'mol': 'CCO'})
+        follower = self.call({'mol': 'CCO'})
+        self.api.calls[0].errback(ValueError('failed'))
+
+        self.assertTrue(self.failure_of(leader, ValueError))
+        self.assertTrue(self.failure_of(follower, ValueError))
+        self.assertEqual(len(self.coalescer), 0)
+
+    def test_timeout(self):
+        """
+        Test followers run the call themselves after the timeout
+        """
+
+        self.call({'mol': 'CCO'})
+        follower = self.call({'mol': 'CCO'})
+
+        self.clock.advance(11)
+        self.assertEqual(len(self.api.calls), 2)
+        self.api.calls[1].callback({'status': 'completed'})
+        self.assertEqual(follower.result, {'status': 'completed'})
+
+        # The late leader result is not delivered twice
+        self.api.calls[0].callback({'status': 'completed'})
+        self.assertEqual(self.coalescer.stats['timeouts'], 1)
+
+    def failure_of(self, deferred, error):
+
+        failures = []
+        deferred.addErrback(failures.append)
+        return failures and failures[0].check(error)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the molecule deduplication functions
+"""
+
+import unittest
+
+from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_dedupe import canonical_keys, mol_deduplicate, scatter, unique_keys
+from mdstudio_structures.cheminfo_molhandle import mol_read
+
+SMILES = ['CCO', 'OCC', 'c1ccccc1O', None, 'C(C)O', 'Oc1ccccc1', 'CC(=O)C', 'CC(O)=C']
+
+
+class UniqueKeysTests(unittest.TestCase):
+
+    def test_unique_keys(self):
+        """
+        Test indexing the first occurrence of every key
+        """
+
+        unique, inverse = unique_keys(['a', 'b', 'a', None, None, 'b', 'c'])
+
+        self.assertEqual(unique, [0, 1, 3, 4, 6])
+        self.assertEqual(inverse.tolist(), [0, 1, 0, 2, 3, 1, 4])
+
+    def test_scatter(self):
+        """
+        Test scattering unique results back to all items
+        """
+
+        items = ['a', 'b', 'a', None, 'c', 'b']
+        unique, inverse = unique_keys(items)
+
+        self.assertEqual(scatter([items[i] for i in unique], inverse), items)
+
+
+@unittest.skipIf('rdk' not in toolkits, "RDKit not available.")
+class RDKitDeduplicateTests(unittest.TestCase):
+    toolkit_name = 'rdk'
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.mols = [mol_read(smiles, mol_format='smi', toolkit=cls.toolkit_name) if smiles else None
+                    for smiles in SMILES]
+
+    def test_canonical_keys(self):
+        """
+        Test canonical SMILES keys of equivalent SMILES are equal
+        """
+
+        keys = canonical_keys(self.mols)
+
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], keys[4])
+        self.assertEqual(keys[2], keys[5])
+        self.assertEqual(keys[3], None)
+        self.assertRaises(ValueError, canonical_keys, self.mols, key='name')
+
+    def test_deduplicate(self):
+        """
+        Test deduplication by canonical SMILES and InChIKey
+        """
+
+        unique, inverse = mol_deduplicate(self.mols)
+
+        self.assertEqual(len(unique), 5)
+        self.assertEqual(inverse.tolist(), [0, 0, 1, 2, 0, 1, 3, 4])
+        self.assertTrue(unique[2] is None)
+
+        # Keto and enol tautomers only share the InChIKey connectivity block
+        unique, inverse = mol_deduplicate(self.mols, key='inchikey')
+        self.assertEqual(inverse.tolist(), [0, 0, 1, 2, 0, 1, 3, 4])
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the endpoint executors
+"""
+
+import time
+import threading
+import unittest
+
+try:
+    from twisted.internet import defer
+    from mdstudio_structures.cheminfo_executor import EndpointExecutor, _run_offloaded, executor, offload
+except ImportError:
+    defer = None
+
+from mdstudio_structures.cheminfo_metrics import instrument, metrics, phase
+
+if defer is not None:
+
+    class _DummyApi(object):
+
+        @instrument('dummy')
+        @offload('dummy')
+        def compute(self, request, claims):
+
+            with phase('compute'):
+                return {'status': 'completed', 'value': request['value'] * 2}
+
+        @offload('dummy')
+        def track(self, request, claims):
+
+            with request['lock']:
+                request['active'].append(1)
+                request['overlap'] = max(request['overlap'], len(request['active']))
+            time.sleep(0.05)
+            with request['lock']:
+                request['active'].pop()
+            return {'status': 'completed'}
+
+
+@unittest.skipIf(defer is None, "Twisted not available.")
+class ExecutorTests(unittest.TestCase):
+
+    def setUp(self):
+
+        metrics.reset()
+        self.defaults = {'default': executor.default, 'endpoints': dict(executor.endpoints)}
+
+    def tearDown(self):
+
+        executor.endpoints = {}
+        executor.configure(**self.defaults)
+        metrics.reset()
+
+    def test_configure(self):
+        """
+        Test per endpoint executor selection
+        """
+
+        config = EndpointExecutor(default='inline', endpoints={'make3d': 'thread'})
+        self.assertEqual(config.executor_type('make3d'), 'thread')
+        self.assertEqual(config.executor_type('info'), 'inline')
+        self.assertRaises(ValueError, config.configure, endpoints={'info': 'fiber'})
+
+    def test_inline(self):
+        """
+        Test inline execution records metrics in the calling thread
+        """
+
+        executor.configure(endpoints={'dummy': 'inline'})
+        self.assertEqual(_DummyApi().compute({'value': 2}, {})['value'], 4)
+
+        phases = set(p['phase'] for p in metrics.snapshot()['phases'])
+        self.assertEqual(phases, set(['compute', 'total']))
+
+    def test_deferred_metrics(self):
+        """
+        Test metrics of Deferred results are recorded when fired
+        """
+
+        deferred = defer.Deferred()
+
+        @instrument('deferred')
+        def compute(self, request, claims):
+            return deferred
+
+        result = compute(None, {}, {})
+        self.assertEqual(metrics.snapshot()['requests'], [])
+
+        deferred.callback({'status': 'completed'})
+        self.assertEqual(result.result, {'status': 'completed'})
+        self.assertEqual(metrics.snapshot()['requests'][0]['count'], 1)
+
+    def test_run_offloaded(self):
+        """
+        Test the worker process entry point resolves the endpoint method
+        """
+
+        name = '{0}.compute'.format(_DummyApi.__module__)
+        self.assertEqual(_run_offloaded(name, _DummyApi, {'value': 3}, {})['value'], 6)
+
+    def test_serialized_toolkit(self):
+        """
+        Test calls to a toolkit that is not thread safe do not overlap,
+        calls to other toolkits do
+        """
+
+        executor.configure(endpoints={'dummy': 'inline'})
+        for toolkit, overlap in (('pybel', 1), ('rdk', 2)):
+            request = {'toolkit': toolkit, 'lock': threading.Lock(), 'active': [], 'overlap': 0}
+            workers = [threading.Thread(target=_DummyApi().track, args=(request, {})) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+            self.assertEqual(request['overlap'], overlap)
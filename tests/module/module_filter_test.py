@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the structural alert filter functions
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_filter import (available_catalogues, configure_catalogues, load_catalogue,
+                                                 mol_filter, read_catalogue)
+from mdstudio_structures.cheminfo_molhandle import mol_read
+
+SMILES = ['CCO', 'CC(=O)Cl', 'O=C1C(=Cc2ccccc2)SC(=S)N1', 'C1CO1', None]
+
+
+class CatalogueTests(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'custom.txt')
+        with open(self.path, 'w') as catalogue:
+            catalogue.write('# Custom alerts\n\n[#7] nitrogen\n[OX2H] hydroxyl extra words\nC=O\n')
+
+    def tearDown(self):
+
+        configure_catalogues({})
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_catalogue(self):
+        """
+        Test reading alert ids and patterns from a catalogue file
+        """
+
+        ids, patterns = read_catalogue(self.path)
+
+        self.assertEqual(ids, ['nitrogen', 'hydroxyl extra words', 'C=O'])
+        self.assertEqual(patterns, ['[#7]', '[OX2H]', 'C=O'])
+
+    def test_configure_catalogues(self):
+        """
+        Test configured catalogues are available and loaded once
+        """
+
+        self.assertIn('reactive', available_catalogues())
+
+        configure_catalogues({'custom': self.path})
+        catalogue = load_catalogue('custom')
+
+        self.assertEqual(len(catalogue), 3)
+        self.assertTrue(load_catalogue('custom') is catalogue)
+        self.assertEqual(load_catalogue('unknown'), None)
+
+
+@unittest.skipIf('rdk' not in toolkits, "RDKit not available.")
+class RDKitFilterTests(unittest.TestCase):
+    toolkit_name = 'rdk'
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.mols = [mol_read(smiles, mol_format='smi', toolkit=cls.toolkit_name) if smiles else None
+                    for smiles in SMILES]
+
+    def test_filter(self):
+        """
+        Test screened and unscreened filtering report the same alerts
+        """
+
+        catalogues = ['reactive', 'pains'] if 'pains' in available_catalogues() else ['reactive']
+        alerts, stats = mol_filter(self.mols, catalogues=catalogues, toolkit=self.toolkit_name)
+        unscreened, unscreened_stats = mol_filter(self.mols, catalogues=catalogues, toolkit=self.toolkit_name,
+                                                  screen=False)
+
+        self.assertEqual(alerts, unscreened)
+        self.assertEqual(alerts[0], [])
+        self.assertEqual(alerts[1], ['reactive:acyl_halide'])
+        self.assertEqual(alerts[3], ['reactive:epoxide'])
+        self.assertEqual(alerts[4], None)
+        self.assertTrue(stats['screened'] > 0)
+        self.assertTrue(stats['matched'] < unscreened_stats['matched'])
+        if 'pains' in catalogues:
+            self.assertIn('pains:ene_rhod_A', alerts[2])
+
+    def test_diazo(self):
+        """
+        Test the diazo alert matches both charge separated forms
+        """
+
+        smiles = ['C=[N+]=[N-]', 'CCOC(=O)C=[N+]=[N-]', '[CH2-][N+]#N', 'CN=[N+]=[N-]']
+        mols = [mol_read(smi, mol_format='smi', toolkit=self.toolkit_name) for smi in smiles]
+        alerts, stats = mol_filter(mols, catalogues=['reactive'], toolkit=self.toolkit_name)
+
+        self.assertEqual([('reactive:diazo' in alert) for alert in alerts], [True, True, True, False])
+        self.assertIn('reactive:azide', alerts[3])
+
+    def test_unknown_catalogue(self):
+        """
+        Test filtering fails for unknown catalogues
+        """
+
+        self.assertEqual(mol_filter(self.mols, catalogues=['unknown'], toolkit=self.toolkit_name), None)
@@ -3,11 +3,14 @@
 """
 Unit tests for fingerprint methods
 """
+import numpy
 import unittest
 import scipy.spatial.distance as hr
 
+from cinfony.bitvector import packbits, tanimoto, unpackbits, wordstobytes
+
 from mdstudio_structures.cheminfo_fingerprint import (available_fingerprints, mol_fingerprint_comparison,
-                                                 mol_fingerprint_pairwise_similarity,
+                                                 mol_fingerprint_many, mol_fingerprint_pairwise_similarity,
                                                  mol_fingerprint_cross_similarity)
 from mdstudio_structures.cheminfo_molhandle import mol_read
 
@@ -65,6 +68,107 @@ class CheminfoFingerprintComparisonTests(unittest.TestCase):
         self.assertEqual(simmat.shape, (6, 7))
 
 
+class CheminfoFingerprintNumpyTests(unittest.TestCase):
+
+    def _test_to_numpy(self, toolkit_name, fptype, offset=0):
+        """
+        Test NumPy bit vector export and round trip of a fingerprint
+        """
+
+        mol = mol_read('c1cc(ccc1OCC)NC(=O)C', mol_format="smi", toolkit=toolkit_name)
+        fp = mol.calcfp(fptype)
+
+        bitvector = fp.to_numpy()
+        self.assertEqual(bitvector.dtype, numpy.uint8)
+        self.assertEqual((numpy.flatnonzero(bitvector) + offset).tolist(), fp.bits)
+
+        packed = fp.to_numpy(packed=True)
+        self.assertEqual(len(packed), -(-len(bitvector) // 8))
+        self.assertEqual(fp.from_numpy(packed, packed=True).bits, fp.bits)
+        self.assertEqual(fp.from_numpy(bitvector).bits, fp.bits)
+
+    @unittest.skipIf('rdk' not in AVAIL_FPS, "RDKit software not available or no fps.")
+    def test_rdk_to_numpy(self):
+
+        self._test_to_numpy('rdk', 'rdkit')
+
+    @unittest.skipIf('pybel' not in AVAIL_FPS, "Pybel software not available or no fps.")
+    def test_pybel_to_numpy(self):
+
+        self._test_to_numpy('pybel', 'fp2', offset=1)
+
+    @unittest.skipIf('indy' not in AVAIL_FPS, "Indigo software not available or no fps.")
+    def test_indy_to_numpy(self):
+        """
+        Test Indigo fingerprint byte buffer export
+        """
+
+        mol = mol_read('c1cc(ccc1OCC)NC(=O)C', mol_format="smi", toolkit='indy')
+        fp = mol.calcfp('sim')
+
+        bitvector = fp.to_numpy()
+        self.assertEqual((numpy.flatnonzero(bitvector) + 1).tolist(), fp.bits)
+        self.assertEqual(fp.to_numpy(packed=True).tolist(), fp._buffer_to_int())
+        self.assertAlmostEqual(fp | fp, 1.0)
+
+        self._test_to_numpy('indy', 'sim', offset=1)
+        self.assertAlmostEqual(fp.from_numpy(bitvector) | fp, 1.0)
+
+    @unittest.skipIf('rdk' not in AVAIL_FPS, "RDKit software not available or no fps.")
+    def test_rdk_fingerprint_many(self):
+        """
+        Test batch fingerprints equal the packed single fingerprints
+        """
+
+        mols = [mol_read(smiles, mol_format="smi", toolkit='rdk') for smiles in ('CCO', 'c1ccccc1', 'CC(=O)O')]
+
+        for fptype in ('rdkit', 'maccs'):
+            packed = mol_fingerprint_many(mols, fp=fptype)
+            self.assertEqual(packed.shape[0], 3)
+            for row, mol in zip(packed, mols):
+                self.assertEqual(row.tolist(), mol.calcfp(fptype).to_numpy(packed=True).tolist())
+
+        self.assertEqual(mol_fingerprint_many([]).shape, (0, 0))
+
+    @unittest.skipIf('rdk' not in AVAIL_FPS, "RDKit software not available or no fps.")
+    def test_rdk_fingerprint_many_count_vectors(self):
+        """
+        Test batch atom pair and torsion fingerprints fold the count vectors
+        """
+
+        mols = [mol_read(smiles, mol_format="smi", toolkit='rdk') for smiles in ('CCOC', 'c1ccccc1CC')]
+
+        for fptype in ('atompairs', 'torsions'):
+            packed = mol_fingerprint_many(mols, fp=fptype)
+            self.assertEqual(packed.shape, (2, 256))
+            for row, mol in zip(packed, mols):
+                folded = sorted(set(i % 2048 for i in mol.calcfp(fptype).GetNonzeroElements()))
+                self.assertEqual(numpy.flatnonzero(unpackbits(row)).tolist(), folded)
+
+
+class CheminfoBitvectorTests(unittest.TestCase):
+
+    def test_pack_round_trip(self):
+        """
+        Test packing bit vectors least significant bit first
+        """
+
+        bitvector = numpy.array([1, 0, 0, 0, 0, 0, 0, 0, 0, 1], dtype=numpy.uint8)
+        packed = packbits(bitvector)
+
+        self.assertEqual(packed.tolist(), [1, 2])
+        self.assertEqual(unpackbits(packed)[:10].tolist(), bitvector.tolist())
+        self.assertEqual(wordstobytes([0x0201], 32).tolist(), [1, 2, 0, 0])
+
+    def test_tanimoto(self):
+        """
+        Test Tanimoto coefficient of packed bit vectors
+        """
+
+        self.assertAlmostEqual(tanimoto([0b0111], [0b1110, 0]), 0.5)
+        self.assertEqual(tanimoto([0], [0]), 0.0)
+
+
 # class _CheminfoFingerprintBase(object):
 #
 #     forcefield = 'mmff94'
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the structure file format sniffer
+"""
+
+import os
+import unittest
+
+from mdstudio_structures.cheminfo_format import (iter_records, read_records, record_offsets, sniff_format,
+                                                 sniff_file_format)
+from mdstudio_structures.cheminfo_molhandle import mol_validate_file_object
+
+PDB = ''.join('ATOM  {0:>5}  CA  ALA A{0:>4}      11.104   6.134  -6.504  1.00  0.00           C\n'.format(i)
+              for i in range(1, 200))
+XYZ = '3\nwater\nO 0.000 0.000 0.000\nH 0.757 0.586 0.000\nH -0.757 0.586 0.000\n'
+
+
+class FormatSniffTests(unittest.TestCase):
+    currpath = os.path.dirname(os.path.dirname(__file__))
+    formatexamples = {'asperine.mol': 'mol', 'asperine.mol2': 'mol2', 'asperine.cml': 'cml',
+                      'asperine.sdf': 'sdf', 'head.sdf': 'sdf', 'ligand.sdf': 'sdf', 'ligand.mol2': 'mol2',
+                      'rotations.mol2': 'mol2', 'hashizume.cif': 'cif'}
+
+    def test_files(self):
+        """
+        Test format detection of the example structure files
+        """
+
+        for name, mol_format in self.formatexamples.items():
+            path = os.path.join(self.currpath, 'files', name)
+            self.assertEqual(sniff_file_format(path), mol_format, name)
+
+            with open(path) as structure:
+                self.assertEqual(sniff_format(structure.read()), mol_format, name)
+
+    def test_strings(self):
+        """
+        Test format detection of line notations and text formats
+        """
+
+        self.assertEqual(sniff_format('CCO'), 'smi')
+        self.assertEqual(sniff_format('c1ccccc1 benzene\n'), 'smi')
+        self.assertEqual(sniff_format('InChI=1S/C2H6O/c1-2-3/h3H,2H2,1H3'), 'inchi')
+        self.assertEqual(sniff_format('LFQSCWFLJHTTHZ-UHFFFAOYSA-N'), 'inchikey')
+        self.assertEqual(sniff_format(PDB), 'pdb')
+        self.assertEqual(sniff_format(XYZ), 'xyz')
+        self.assertIsNone(sniff_format('not a structure file'))
+        self.assertIsNone(sniff_format(''))
+
+    def test_bounded_prefix(self):
+        """
+        Test only the prefix is inspected, the SD file delimiter is found
+        at the end of the content
+        """
+
+        with open(os.path.join(self.currpath, 'files', 'asperine.sdf')) as structure:
+            sdf = structure.read()
+
+        self.assertEqual(sniff_format(sdf, size=100), 'sdf')
+        self.assertEqual(sniff_format(PDB + 'garbage' * 100000), 'pdb')
+
+    def test_validate_file_object(self):
+        """
+        Test mol_validate_file_object sets the detected format and keeps
+        extensions of the same format
+        """
+
+        path_file = mol_validate_file_object({'content': PDB, 'path': None, 'extension': 'smi'})
+        self.assertEqual(path_file['extension'], 'pdb')
+
+        path_file = mol_validate_file_object({'content': 'CCO', 'path': None, 'extension': 'can'})
+        self.assertEqual(path_file['extension'], 'can')
+
+        for extension in ('pdbqt', 'pqr'):
+            path_file = mol_validate_file_object({'content': PDB, 'path': None, 'extension': extension})
+            self.assertEqual(path_file['extension'], extension)
+
+        path_file = mol_validate_file_object({'content': PDB, 'path': None, 'extension': None})
+        self.assertEqual(path_file['extension'], 'pdb')
+
+        path = os.path.join(self.currpath, 'files', 'asperine.sdf')
+        path_file = mol_validate_file_object({'content': None, 'path': path, 'extension': None}, load=False)
+        self.assertEqual(path_file['extension'], 'sdf')
+        self.assertIsNone(path_file['content'])
+
+
+class RecordSplitTests(unittest.TestCase):
+    currpath = os.path.dirname(os.path.dirname(__file__))
+
+    def test_iter_records(self):
+        """
+        Test splitting multi molecule content in records
+        """
+
+        with open(os.path.join(self.currpath, 'files', 'head.sdf')) as structure:
+            records = list(iter_records(structure.read(), 'sdf'))
+        self.assertEqual(len(records), 2)
+        self.assertTrue(all(record.rstrip().endswith('$$$$') for record in records))
+
+        with open(os.path.join(self.currpath, 'files', 'rotations.mol2')) as structure:
+            records = list(iter_records(structure.read(), 'mol2'))
+        self.assertEqual(len(records), 7)
+        self.assertTrue(all(record.startswith('@<TRIPOS>MOLECULE') for record in records))
+
+        self.assertEqual(list(iter_records('CCO ethanol\n\nCCC propane\n', 'smi')), ['CCO ethanol', 'CCC propane'])
+        self.assertEqual(list(iter_records(PDB, 'pdb')), [PDB])
+
+    def test_record_offsets(self):
+        """
+        Test reading a slice of records using the record offset index
+        """
+
+        for name, mol_format in (('head.sdf', 'sdf'), ('rotations.mol2', 'mol2')):
+            path = os.path.join(self.currpath, 'files', name)
+            with open(path) as structure:
+                records = list(iter_records(structure.read(), mol_format))
+
+            offsets = record_offsets(path, mol_format)
+            self.assertEqual(len(offsets), len(records))
+            self.assertEqual(list(read_records(path, mol_format, offsets, start=1, stop=2)), records[1:2])
+            self.assertEqual(list(read_records(path, mol_format, offsets, start=1)), records[1:])
+            self.assertEqual(list(read_records(path, mol_format, offsets, start=len(offsets))), [])
+
+    def test_record_offsets_blank_title(self):
+        """
+        Test SD file records start at the blank title line
+        """
+
+        path = os.path.join(self.currpath, 'files', 'blank_title.sdf')
+        with open(path) as structure:
+            records = list(iter_records(structure.read(), 'sdf'))
+
+        offsets = record_offsets(path, 'sdf')
+        self.assertEqual(len(offsets), 3)
+        self.assertEqual(offsets[0], 0)
+        for i in range(len(offsets)):
+            record = list(read_records(path, 'sdf', offsets, start=i, stop=i + 1))
+            self.assertEqual(record, records[i:i + 1])
+            self.assertTrue(record[0].startswith('\n'))
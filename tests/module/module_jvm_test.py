@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the shared JVM configuration of the Java toolkits
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from cinfony import jvm
+
+from mdstudio_structures import __rootpath__
+from mdstudio_structures.cheminfo_pkgmanager import JVM_PACKAGES, configure_jvm
+
+try:
+    import jpype
+except ImportError:
+    jpype = None
+
+SETTINGS = """settings:
+  jvm:
+    path:
+    classpath: []
+    max_heap: 3g
+    gc: G1
+"""
+
+
+class JVMConfigurationTests(unittest.TestCase):
+
+    def setUp(self):
+
+        self.config = dict(jvm._config)
+        self.classpath = os.environ.get('CLASSPATH')
+        os.environ['CLASSPATH'] = os.pathsep.join(['/java/cdk.jar', '/java/opsin.jar'])
+
+    def tearDown(self):
+
+        jvm._config.update(self.config)
+        if self.classpath is None:
+            del os.environ['CLASSPATH']
+        else:
+            os.environ['CLASSPATH'] = self.classpath
+
+    @unittest.skipIf(jvm.isstarted(), "JVM already started.")
+    def test_options(self):
+        """
+        Test JVM options combine the configured and environment classpath
+        """
+
+        jvm.configure(classpath=['/java/jchem.jar', '/java/cdk.jar'], max_heap='4g', gc='G1',
+                      options=['-Djava.awt.headless=true'])
+
+        self.assertEqual(jvm.classpath(['/java/extra.jar']),
+                         ['/java/jchem.jar', '/java/cdk.jar', '/java/opsin.jar', '/java/extra.jar'])
+        self.assertEqual(jvm.jvmoptions(), ['-Djava.class.path={0}'.format(os.pathsep.join(
+            ['/java/jchem.jar', '/java/cdk.jar', '/java/opsin.jar'])), '-Xmx4g', '-XX:+UseG1GC',
+            '-Djava.awt.headless=true'])
+
+    def test_unknown_setting(self):
+        """
+        Test unknown settings raise ValueError
+        """
+
+        self.assertRaises(ValueError, jvm.configure, heap='4g')
+
+    @unittest.skipIf(jvm.isstarted(), "JVM already started.")
+    def test_configure_from_settings(self):
+        """
+        Test configuring the JVM from the settings file, unset values
+        keep their default
+        """
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            settings_file = os.path.join(tmpdir, 'settings.yml')
+            with open(settings_file, 'w') as outfile:
+                outfile.write(SETTINGS)
+            configure_jvm(settings_file)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertEqual(jvm._config['max_heap'], '3g')
+        self.assertEqual(jvm._config['gc'], 'G1')
+        self.assertIsNone(jvm._config['path'])
+
+
+@unittest.skipIf(jpype is None, "JPype not available.")
+class JVMPackageImportTests(unittest.TestCase):
+
+    def test_import_configures_jvm(self):
+        """
+        Test importing the package with a Java toolkit starts the JVM with
+        the settings.yml configuration
+        """
+
+        script = ("import mdstudio_structures\n"
+                  "from cinfony import jvm\n"
+                  "print(','.join(mdstudio_structures.toolkits.keys()))\n"
+                  "print(' '.join(jvm.jvmoptions()) if jvm.isstarted() else '')\n")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output([sys.executable, '-c', script], env=env,
+                                         cwd=os.path.dirname(__rootpath__)).decode('utf-8').splitlines()
+
+        if not set(output[-2].split(',')).intersection(JVM_PACKAGES):
+            self.skipTest('No Java toolkit available.')
+        self.assertTrue('-Xmx2g' in output[-1].split())
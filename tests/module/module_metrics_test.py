@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the endpoint latency and payload size instrumentation
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mdstudio_structures.cheminfo_metrics import Histogram, MetricsRegistry, instrument, metrics, phase, timer
+
+
+class _DummyApi(object):
+
+    @instrument('dummy')
+    def convert(self, request, claims):
+
+        with phase('mol_read'):
+            content = request['mol']['content']
+        with phase('compute'):
+            content = content.upper()
+        with phase('response'):
+            return {'status': 'completed', 'mol': {'content': content, 'path': None, 'extension': 'smi'}}
+
+    @instrument('dummy')
+    def fail(self, request, claims):
+
+        with phase('compute'):
+            raise ValueError('failed')
+
+
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self):
+
+        metrics.reset()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        metrics.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def test_histogram(self):
+        """
+        Test cumulative histogram buckets
+        """
+
+        hist = Histogram((1, 10))
+        for value in (0.5, 1, 5, 20):
+            hist.observe(value)
+
+        self.assertEqual(hist.cumulative(), [(1, 2), (10, 3), (float('inf'), 4)])
+        self.assertEqual(hist.to_dict()['mean'], 26.5 / 4)
+
+    def test_instrument(self):
+        """
+        Test phase timings, payload sizes and status of an endpoint call
+        """
+
+        api = _DummyApi()
+        api.convert({'toolkit': 'rdk', 'mol': {'content': 'cco', 'path': None, 'extension': 'smi'}}, {})
+        self.assertRaises(ValueError, api.fail, {'toolkit': 'rdk'}, {})
+
+        snapshot = metrics.snapshot()
+        phases = set((p['phase'], p['toolkit'], p['count']) for p in snapshot['phases'])
+        self.assertEqual(phases, set([('compute', 'rdk', 2), ('mol_read', 'rdk', 1),
+                                      ('response', 'rdk', 1), ('total', 'rdk', 2)]))
+
+        payloads = dict((p['direction'], p['sum']) for p in snapshot['payloads'])
+        self.assertEqual(payloads, {'request': 12, 'response': 15})
+
+        requests = dict((r['status'], r['count']) for r in snapshot['requests'])
+        self.assertEqual(requests, {'completed': 1, 'error': 1})
+
+    def test_phase_outside_request(self):
+        """
+        Test phases outside of an instrumented call are not recorded
+        """
+
+        with phase('compute'):
+            pass
+
+        self.assertEqual(metrics.snapshot()['phases'], [])
+
+    def test_prometheus(self):
+        """
+        Test Prometheus text export
+        """
+
+        _DummyApi().convert({'toolkit': 'rdk', 'mol': {'content': 'c'}}, {})
+
+        registry_file = os.path.join(self.tmpdir, 'metrics.prom')
+        metrics.write_textfile(registry_file)
+        with open(registry_file) as infile:
+            content = infile.read()
+
+        self.assertTrue('# TYPE mdstudio_structures_phase_seconds histogram' in content)
+        self.assertTrue('mdstudio_structures_phase_seconds_count{endpoint="dummy",phase="compute",toolkit="rdk"} 1'
+                        in content)
+        self.assertTrue('mdstudio_structures_requests_total{endpoint="dummy",status="completed",toolkit="rdk"} 1'
+                        in content)
+        self.assertTrue('le="+Inf"' in content)
+
+    def test_overhead(self):
+        """
+        Test the per-phase overhead stays in the microsecond range
+        """
+
+        registry = MetricsRegistry()
+        self.assertEqual(registry.snapshot()['requests'], [])
+
+        repeat = 10000
+        api = _DummyApi()
+        start = timer()
+        for i in range(repeat):
+            api.convert({'toolkit': 'rdk', 'mol': {'content': 'c'}}, {})
+        per_phase = (timer() - start) / (repeat * 4)
+
+        self.assertLess(per_phase, 50e-6)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the lightweight mmCIF '_atom_site' reader and writer
+"""
+
+import sys
+import numpy
+import unittest
+
+from mdstudio_structures.cheminfo_mmcif import tokenize, is_mmcif, read_atom_site, mmcif_remove_residues
+
+# Library and function compatibility
+if sys.version_info[0] < 3:
+    from cStringIO import StringIO
+else:
+    from io import StringIO
+
+MMCIF = """data_TEST
+#
+_entry.id TEST
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.pdbx_formal_charge
+_atom_site.pdbx_PDB_model_num
+ATOM   1 N N   . GLY A 1 ? 1.000 2.000 3.000 1.00 10.00 ? 1
+ATOM   2 C CA  . GLY A 1 ? 2.000 2.000 3.000 1.00 10.00 ? 1
+HETATM 3 O O   . HOH B . ? 5.000 5.000 5.000 1.00 20.00 ? 1
+HETATM 4 O O   . HOH C . ? 6.000 6.000 6.000 1.00 20.00 ? 1
+HETATM 5 C "C1'" . LIG D . ? 7.000 7.000 7.000 0.50 30.00 ? 1
+#
+loop_
+_struct_asym.id
+A
+#
+"""
+
+
+class MMCIFTests(unittest.TestCase):
+
+    def test_tokenize(self):
+        """
+        Test tokenizing data lines with quoted values
+        """
+
+        self.assertEqual(tokenize('ATOM 1 N N'), ['ATOM', '1', 'N', 'N'])
+        self.assertEqual(tokenize("HETATM 5 C \"C1'\" 'a b'"), ['HETATM', '5', 'C', "C1'", 'a b'])
+
+    def test_is_mmcif(self):
+        """
+        Test detection of mmCIF content
+        """
+
+        self.assertTrue(is_mmcif(MMCIF))
+        self.assertFalse(is_mmcif('HEADER    TEST\n'))
+
+    def test_read_atom_site(self):
+        """
+        Test reading '_atom_site' columns into arrays
+        """
+
+        arrays = read_atom_site(StringIO(MMCIF), columns=['id', 'label_atom_id', 'label_seq_id', 'Cartn_x'])
+
+        self.assertEqual(sorted(arrays), ['Cartn_x', 'id', 'label_atom_id', 'label_seq_id'])
+        self.assertEqual(list(arrays['id']), [1, 2, 3, 4, 5])
+        self.assertEqual(list(arrays['label_seq_id']), [1, 1, -1, -1, -1])
+        self.assertEqual(arrays['label_atom_id'][4], "C1'")
+        self.assertTrue(numpy.allclose(arrays['Cartn_x'], [1, 2, 5, 6, 7]))
+
+    def test_remove_residues_cif(self):
+        """
+        Test residue removal writing mmCIF, other categories untouched
+        """
+
+        output = StringIO()
+        removed = mmcif_remove_residues(StringIO(MMCIF), ['hoh'], output)
+
+        self.assertEqual(removed, ['HOH', 'HOH'])
+        content = output.getvalue()
+        self.assertFalse('HOH' in content)
+        self.assertTrue('_entry.id TEST' in content)
+        self.assertTrue('_struct_asym.id' in content)
+        self.assertEqual(list(read_atom_site(StringIO(content), columns=['id'])['id']), [1, 2, 5])
+
+    def test_remove_residues_pdb(self):
+        """
+        Test residue removal writing PDB ATOM/HETATM records
+        """
+
+        output = StringIO()
+        removed = mmcif_remove_residues(StringIO(MMCIF), ['LIG'], output, output_format='pdb')
+
+        self.assertEqual(removed, ['LIG'])
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], 'MODEL        1')
+        self.assertEqual(lines[1][:30], 'ATOM      1  N   GLY A   1    ')
+        self.assertEqual(len([line for line in lines if line[:6] in ('ATOM  ', 'HETATM')]), 4)
+        self.assertEqual(lines[-2:], ['ENDMDL', 'END'])
+
+    def test_remove_residues_no_residue_names(self):
+        """
+        Test residue removal failing without residue name column
+        """
+
+        mmcif = MMCIF.replace('_atom_site.label_comp_id\n', '')
+        for name in ('GLY', 'HOH', 'LIG'):
+            mmcif = mmcif.replace(' {0} '.format(name), ' ')
+
+        self.assertRaises(ValueError, mmcif_remove_residues, StringIO(mmcif), ['HOH'], StringIO())
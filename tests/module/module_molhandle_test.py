@@ -5,11 +5,15 @@ Unit tests for the Open Babel methods
 """
 
 import os
+import numpy
 import pybel
 import unittest
 
 from mdstudio_structures.cheminfo_pkgmanager import CinfonyPackageManager
-from mdstudio_structures.cheminfo_molhandle import mol_addh, mol_make3D, mol_read, mol_removeh, mol_write
+from mdstudio_structures.cheminfo_format import record_offsets
+from mdstudio_structures.cheminfo_molhandle import (mol_addh, mol_convert_many, mol_coordinates, mol_make3D,
+                                                    mol_read, mol_read_file_object, mol_read_many, mol_removeh,
+                                                    mol_rotate, mol_validate_file_object, mol_write)
 
 toolkits = CinfonyPackageManager({})
 
@@ -81,6 +85,85 @@ class _CheminfoMolhandleBase(object):
                 mol.addh()
                 self.assertEqual(len(mol.atoms), 21)
 
+    def test_read_file_object(self):
+        """
+        Test path_file objects with only a path are read from file without
+        loading the content
+        """
+
+        if 'sdf' not in toolkits[self.toolkit_name].informats or not hasattr(toolkits[self.toolkit_name], 'readfile'):
+            self.skipTest("{0} does not read sdf files".format(self.toolkit_name))
+
+        path_file = mol_validate_file_object(
+            {'content': None, 'path': self.formatexamples['sdf'], 'extension': 'sdf'}, load=False)
+        self.assertIsNone(path_file['content'])
+
+        mol = mol_read_file_object(path_file, toolkit=self.toolkit_name)
+        self.assertEqual(mol.mol_format, 'sdf')
+        self.assertEqual(len(mol.atoms), len(mol_read(self.formatexamples['sdf'], mol_format='sdf', from_file=True,
+                                                      toolkit=self.toolkit_name).atoms))
+
+    def test_read_file_object_without_readfile(self):
+        """
+        Test path_file objects with only a path are loaded for toolkits
+        without file reader
+        """
+
+        toolkit = toolkits[self.toolkit_name]
+        if hasattr(toolkit, 'readfile') or 'smi' not in toolkit.informats:
+            self.skipTest("{0} reads files or does not read smi".format(self.toolkit_name))
+
+        path = os.path.join(self.currpath, 'files/benzene.smi')
+        self.tmp_files.append(path)
+        with open(path, 'w') as smi:
+            smi.write('c1ccccc1\n')
+
+        path_file = mol_validate_file_object({'content': None, 'path': path, 'extension': 'smi'}, load=False)
+        mol = mol_read_file_object(path_file, toolkit=self.toolkit_name)
+
+        self.assertIsNotNone(mol)
+        self.assertEqual(mol.mol_format, 'smi')
+
+    def test_read_many(self):
+        """
+        Test lazy import of all molecules in a multi molecule file or string
+        """
+
+        if 'sdf' not in toolkits[self.toolkit_name].informats or not hasattr(toolkits[self.toolkit_name], 'readfile'):
+            self.skipTest("{0} does not read sdf files".format(self.toolkit_name))
+
+        path = os.path.join(self.currpath, 'files/head.sdf')
+        from_file = [len(mol.atoms) for mol in mol_read_many(path, from_file=True, toolkit=self.toolkit_name)]
+        self.assertEqual(len(from_file), 2)
+
+        with open(path, 'r') as sdf:
+            mols = list(mol_read_many(sdf.read(), mol_format='sdf', toolkit=self.toolkit_name))
+        self.assertEqual([len(mol.atoms) for mol in mols], from_file)
+        self.assertTrue(all(mol.mol_format == 'sdf' for mol in mols))
+
+        # Read the second molecule only using the record offsets
+        offsets = record_offsets(path, 'sdf')
+        mols = list(mol_read_many(path, mol_format='sdf', from_file=True, toolkit=self.toolkit_name,
+                                  start=1, offsets=offsets))
+        self.assertEqual([len(mol.atoms) for mol in mols], from_file[1:])
+
+    def test_convert_many(self):
+        """
+        Test batch conversion with per structure error messages
+        """
+
+        toolkit = toolkits[self.toolkit_name]
+        if self.toolkit_name in ('webel', 'silverwebel') or 'smi' not in toolkit.informats:
+            self.skipTest("{0} does not convert smi offline".format(self.toolkit_name))
+
+        output, errors = mol_convert_many(['CCO', 'C1CC', 'c1ccccc1'], 'smi', output_formats=['smi', 'mol'],
+                                          toolkit=self.toolkit_name)
+        self.assertEqual(len(output['smi']), 3)
+        self.assertIsNone(output['mol'][1])
+        self.assertIsNotNone(errors[1])
+        self.assertEqual(errors[0::2], [None, None])
+        self.assertIsNone(mol_convert_many(['CCO'], 'smi', output_formats=['non'], toolkit=self.toolkit_name))
+
     def test_readfile_unsupported(self):
         """
         Test importing of structure files with wrong format
@@ -174,12 +257,22 @@ class _CheminfoMolhandleBase(object):
         x = mol_read('CCNCC', mol_format='smi', toolkit=self.toolkit_name)
         mol = mol_make3D(x)
         self.assertTrue(mol.dim == 3)
-    #
-    # def test_rotation(self):
-    #
-    #     mol = mol_read(self.ligand, mol_format='mol2', toolkit=self.toolkit_name)
-    #     mols = mol_combine_rotations(mol, rotations=[[1, 0, 0, 90], [1, 0, 0, -90], [0, 1, 0, 90],
-    #                                                  [0, 1, 0, -90], [0, 0, 1, 90], [0, 0, 1, -90]])
+
+    def test_rotation(self):
+        """
+        Test rotation of the coordinate frame using bulk coordinate access
+        """
+        if self.toolkit_name not in ('pybel', 'rdk', 'indy'):
+            self.skipTest("{0} has no bulk coordinate access".format(self.toolkit_name))
+
+        mol = mol_read(self.formatexamples['sdf'], mol_format='sdf', from_file=True, toolkit=self.toolkit_name)
+        coords = mol_coordinates(mol)
+        self.assertEqual(coords.shape, (len(mol.atoms), 3))
+        self.assertTrue(numpy.allclose(coords[0], mol.atoms[0].coords))
+
+        # 90 degrees clockwise about the z-axis: (x, y, z) -> (y, -x, z)
+        rotated = mol_coordinates(mol_rotate(mol, vector=[0, 0, 1, 90]))
+        self.assertTrue(numpy.allclose(rotated, coords[:, [1, 0, 2]] * [1, -1, 1], atol=1e-3))
 
 
 @unittest.skipIf('pybel' not in toolkits, "Pybel software not available.")
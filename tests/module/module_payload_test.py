@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the compressed path_file content encodings
+"""
+
+import logging
+import unittest
+
+from mdstudio_structures.cheminfo_molhandle import mol_validate_file_object
+from mdstudio_structures.cheminfo_payload import (COMPRESSIONS, available_encodings, decode_content, encode_content,
+                                                  is_supported_encoding)
+from mdstudio_structures.cheminfo_wamp.cheminfo_descriptors_wamp import CheminfoDescriptorsWampApi
+from mdstudio_structures.cheminfo_wamp.cheminfo_molhandle_wamp import CheminfoMolhandleWampApi
+
+PDB = ''.join('ATOM  {0:>5}  CA  ALA A{0:>4}      11.104   6.134  -6.504  1.00  0.00           C\n'.format(i)
+              for i in range(1, 200))
+
+
+class PayloadTests(unittest.TestCase):
+
+    def test_roundtrip(self):
+        """
+        Test encoding and decoding with all available encodings
+        """
+
+        for encoding in available_encodings():
+            encoded = encode_content(PDB, encoding)
+            self.assertEqual(decode_content(encoded, encoding), PDB)
+            if encoding != 'utf8':
+                self.assertLess(len(encoded), len(PDB) / 4)
+
+    def test_plain(self):
+        """
+        Test plain text encodings leave content untouched
+        """
+
+        self.assertEqual(encode_content(PDB), PDB)
+        self.assertEqual(decode_content(PDB, 'UTF-8'), PDB)
+        self.assertEqual(encode_content(None, 'gzip+base64'), None)
+
+    def test_unsupported(self):
+        """
+        Test unsupported encodings raise ValueError
+        """
+
+        self.assertRaises(ValueError, encode_content, PDB, 'gzip')
+        self.assertRaises(ValueError, decode_content, PDB, 'brotli+base64')
+
+        self.assertFalse(is_supported_encoding('brotli+base64'))
+        self.assertTrue(is_supported_encoding('gzip+base64'))
+        self.assertTrue(is_supported_encoding(None))
+
+    def test_unsupported_output_encoding(self):
+        """
+        Test endpoints fail on unsupported output encodings
+        """
+
+        api = CheminfoMolhandleWampApi()
+        api.log = logging.getLogger(__name__)
+        request = {'mol': {'content': 'CCO', 'path': None, 'extension': 'smi'}, 'toolkit': 'pybel',
+                   'output_format': 'mol', 'output_encoding': 'brotli+base64'}
+
+        response = api.convert_structures(request, {})
+        self.assertEqual(response['status'], 'failed')
+        self.assertEqual(response['mol'], {'path': None, 'content': None, 'extension': 'mol'})
+
+    def test_validate_file_object(self):
+        """
+        Test mol_validate_file_object decodes compressed content
+        """
+
+        path_file = {'content': encode_content('CCO', 'zlib+base64'), 'path': None, 'extension': None,
+                     'encoding': 'zlib+base64'}
+        path_file = mol_validate_file_object(path_file)
+
+        self.assertEqual(path_file['content'], 'CCO')
+        self.assertEqual(path_file['extension'], 'smi')
+        self.assertEqual(path_file['encoding'], 'utf8')
+
+    def test_malformed_content(self):
+        """
+        Test malformed content raises ValueError and fails endpoints
+        """
+
+        self.assertRaises(ValueError, decode_content, 'abc', 'zlib+base64')
+        self.assertRaises(ValueError, decode_content, encode_content(PDB, 'zlib+base64'), 'bz2+base64')
+
+        api = CheminfoMolhandleWampApi()
+        api.log = logging.getLogger(__name__)
+        request = {'mol': {'content': 'abc', 'path': None, 'extension': 'smi', 'encoding': 'zlib+base64'},
+                   'toolkit': 'pybel', 'output_format': 'mol'}
+
+        response = api.convert_structures(request, {})
+        self.assertEqual(response['status'], 'failed')
+        self.assertEqual(response['mol'], {'path': None, 'content': None, 'extension': 'mol'})
+
+        descriptors = CheminfoDescriptorsWampApi()
+        descriptors.log = api.log
+        response = descriptors.get_descriptors({'mol': dict(request['mol']), 'toolkit': 'pybel'}, {})
+        self.assertEqual(response, {'status': 'failed', 'descriptors': None})
+
+    def test_unavailable_input_encoding(self):
+        """
+        Test endpoints fail on input encodings of unavailable compressions
+        """
+
+        content = encode_content('CCO', 'zlib+base64')
+        compression = COMPRESSIONS.pop('zlib')
+        try:
+            api = CheminfoMolhandleWampApi()
+            api.log = logging.getLogger(__name__)
+            request = {'mol': {'content': content, 'path': None, 'extension': 'smi', 'encoding': 'zlib+base64'},
+                       'toolkit': 'pybel'}
+
+            response = api.structure_attributes(request, {})
+            self.assertEqual(response, {'status': 'failed', 'attributes': {}})
+        finally:
+            COMPRESSIONS['zlib'] = compression
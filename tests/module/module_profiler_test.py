@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the opt-in endpoint profiler
+"""
+
+import os
+import json
+import time
+import pstats
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mdstudio_structures.cheminfo_profiler import RequestProfiler, profiled, profiler
+
+
+class _DummyApi(object):
+
+    @profiled('dummy')
+    def compute(self, request, claims):
+
+        time.sleep(request.get('sleep', 0))
+        return {'status': 'completed'}
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+
+        self.defaults = profiler.config()
+        self.tmpdir = tempfile.mkdtemp()
+        self.request = {'workdir': self.tmpdir, 'sleep': 0.05}
+
+    def tearDown(self):
+
+        profiler.configure(**self.defaults)
+        shutil.rmtree(self.tmpdir)
+
+    def profiles(self):
+
+        directory = os.path.join(self.tmpdir, 'profiles')
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_disabled(self):
+        """
+        Test no profiles are stored by default
+        """
+
+        _DummyApi().compute(self.request, {})
+        self.assertEqual(self.profiles(), [])
+
+    def test_sampled(self):
+        """
+        Test sampled requests are stored in pstats format
+        """
+
+        profiler.configure(enabled=True, sample_rate=1.0)
+        _DummyApi().compute(self.request, {})
+
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].startswith('dummy_') and profiles[0].endswith('.pstats'))
+
+        stats = pstats.Stats(os.path.join(self.tmpdir, 'profiles', profiles[0]))
+        self.assertTrue(any(func[2] == 'compute' for func in stats.stats))
+
+    def test_threshold(self):
+        """
+        Test only requests above the latency threshold are stored in
+        speedscope format
+        """
+
+        profiler.configure(enabled=True, threshold=0.02, interval=0.001)
+        _DummyApi().compute({'workdir': self.tmpdir}, {})
+        self.assertEqual(self.profiles(), [])
+
+        _DummyApi().compute(self.request, {})
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].endswith('.speedscope.json'))
+
+        with open(os.path.join(self.tmpdir, 'profiles', profiles[0])) as infile:
+            profile = json.load(infile)
+        names = [profile['shared']['frames'][i]['name'] for sample in profile['profiles'][0]['samples']
+                 for i in sample]
+        self.assertTrue('compute' in names)
+
+    def test_shared_sampler(self):
+        """
+        Test concurrent requests share one sampler thread and profiles are
+        named after the request id
+        """
+
+        profiler.configure(enabled=True, threshold=0.02, interval=0.001)
+        _DummyApi().compute(self.request, {})
+        sampler = profiler.sampler
+
+        workers = [threading.Thread(target=_DummyApi().compute, args=(self.request, {})) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertIs(profiler.sampler, sampler)
+        self.assertEqual(len([t for t in threading.enumerate() if t.name == sampler.name]), 1)
+
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 3)
+        for name in profiles:
+            request_id = name[len('dummy_'):-len('.speedscope.json')]
+            pid, sequence = request_id.split('-')
+            self.assertEqual(int(pid), os.getpid())
+            self.assertTrue(sequence.isdigit())
+
+    def test_endpoints(self):
+        """
+        Test profiling is restricted to the configured endpoints
+        """
+
+        profiler.configure(enabled=True, sample_rate=1.0, endpoints=['make3d'])
+        _DummyApi().compute(self.request, {})
+        self.assertEqual(self.profiles(), [])
+
+    def test_configure(self):
+        """
+        Test validation of the profiler settings
+        """
+
+        config = RequestProfiler(enabled=True, threshold=1.0)
+        self.assertEqual(config.config()['threshold'], 1.0)
+        self.assertRaises(ValueError, config.configure, unknown=True)
+        self.assertRaises(ValueError, config.configure, sample_rate=2)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the RCSB structure cache and local mirror retrieval
+"""
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from mdstudio_structures import cheminfo_rcsb
+from mdstudio_structures.cheminfo_rcsb import StructureCache, find_mirror_file, retrieve_rcsb_structure
+
+
+class _PDBListStub(object):
+    """
+    PDBList replacement downloading only files in PDB format
+    """
+
+    def retrieve_pdb_file(self, pdb_id, file_format='pdb', pdir=None, overwrite=False):
+
+        dfile = os.path.join(pdir, 'pdb{0}.ent'.format(pdb_id.lower()))
+        if file_format == 'pdb':
+            with open(dfile, 'w') as structure:
+                structure.write('HEADER    DOWNLOAD\n')
+        return dfile
+
+
+class StructureCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Create a temporary cache directory and source file
+        """
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'source.pdb')
+        with open(self.source, 'w') as source:
+            source.write('ATOM' * 25)
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_put_get(self):
+        """
+        Test storing and retrieving a cache entry
+        """
+
+        cache = StructureCache(os.path.join(self.tmpdir, 'cache'))
+        self.assertIsNone(cache.get('pdb/1abc'))
+
+        cache.put('pdb/1abc', self.source)
+        self.assertTrue('pdb/1abc' in cache)
+        self.assertEqual(cache.size, 100)
+
+        with open(cache.get('pdb/1abc')) as cached:
+            self.assertEqual(cached.read(), 'ATOM' * 25)
+
+    def test_lru_eviction(self):
+        """
+        Test least recently used entries are evicted first
+        """
+
+        cache = StructureCache(os.path.join(self.tmpdir, 'cache'), max_size=250)
+        cache.put('pdb/1abc', self.source)
+        os.utime(cache.get('pdb/1abc'), (0, 0))
+        cache.put('pdb/2abc', self.source)
+        cache.put('pdb/3abc', self.source)
+
+        self.assertEqual(len(cache), 2)
+        self.assertFalse('pdb/1abc' in cache)
+        self.assertTrue(cache.size <= 250)
+
+    def test_size_on_init(self):
+        """
+        Test the cache size is restored from an existing cache directory
+        """
+
+        cache = StructureCache(os.path.join(self.tmpdir, 'cache'))
+        cache.put('pdb/1abc', self.source)
+
+        self.assertEqual(StructureCache(cache.path).size, 100)
+
+
+class RCSBMirrorTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Create a local mirror using the 'divided' wwPDB layout
+        """
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.mirror = os.path.join(self.tmpdir, 'mirror')
+        self.workdir = os.path.join(self.tmpdir, 'workdir')
+        os.makedirs(os.path.join(self.mirror, 'ab'))
+        os.makedirs(self.workdir)
+
+        with gzip.open(os.path.join(self.mirror, 'ab', 'pdb1abc.ent.gz'), 'wb') as mirror_file:
+            mirror_file.write(b'HEADER    TEST\n')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_find_mirror_file(self):
+        """
+        Test lookup of structure files in the mirror
+        """
+
+        self.assertTrue(find_mirror_file(self.mirror, '1ABC').endswith('pdb1abc.ent.gz'))
+        self.assertIsNone(find_mirror_file(self.mirror, '1ABC', file_format='mmCif'))
+
+    def test_retrieve_offline(self):
+        """
+        Test offline retrieval from mirror and cache
+        """
+
+        dfile = retrieve_rcsb_structure('1ABC', self.workdir, mirror=self.mirror, offline=True)
+        with open(dfile) as structure:
+            self.assertEqual(structure.read(), 'HEADER    TEST\n')
+
+        cache = StructureCache(os.path.join(self.tmpdir, 'cache'))
+        self.assertIsNone(retrieve_rcsb_structure('2ABC', self.workdir, cache=cache, offline=True))
+
+        cache.put('pdb/2abc', dfile)
+        dfile = retrieve_rcsb_structure('2ABC', self.workdir, cache=cache, offline=True)
+        self.assertEqual(os.path.basename(dfile), 'pdb2abc.ent')
+
+    def test_mmcif_fallback(self):
+        """
+        Test PDB requests fall back to mmCIF only after the PDB download
+        """
+
+        cache = StructureCache(os.path.join(self.tmpdir, 'cache'))
+        cif = os.path.join(self.tmpdir, '3abc.cif')
+        with open(cif, 'w') as structure:
+            structure.write('data_3ABC\n')
+        cache.put('mmCif/3abc', cif)
+
+        dfile = retrieve_rcsb_structure('3ABC', self.workdir, cache=cache, offline=True)
+        self.assertEqual(os.path.basename(dfile), '3abc.cif')
+
+        pdblist = cheminfo_rcsb._pdblist
+        cheminfo_rcsb._pdblist = _PDBListStub()
+        try:
+            dfile = retrieve_rcsb_structure('3ABC', self.workdir, cache=cache)
+        finally:
+            cheminfo_rcsb._pdblist = pdblist
+        self.assertEqual(os.path.basename(dfile), 'pdb3abc.ent')
+        self.assertIsNotNone(cache.get('pdb/3abc'))
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the substructure search functions
+"""
+
+import logging
+import numpy
+import threading
+import unittest
+
+from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_molhandle import mol_read
+from mdstudio_structures.cheminfo_substructure import (LibraryFingerprintCache, MatchWorkers, SmartsCache,
+                                                       library_fingerprints, match_many, mol_substructure_search,
+                                                       screen_fingerprints, screen_many)
+from mdstudio_structures.cheminfo_wamp.cheminfo_substructure_wamp import CheminfoSubstructureWampApi
+
+SMILES = ['CCN(CC)CC', 'CCO', 'c1ccccc1C(=O)N', 'CC(=O)NC', 'O=C(N)CCC(N)=O']
+
+
+class ScreenFingerprintTests(unittest.TestCase):
+
+    def test_screen_fingerprints(self):
+        """
+        Test only molecules having all query bits set survive
+        """
+
+        library = numpy.array([[0b1011, 0xff], [0b0011, 0xff], [0b1111, 0x00]], dtype=numpy.uint8)
+        query = numpy.array([0b1001, 0x01], dtype=numpy.uint8)
+
+        self.assertEqual(screen_fingerprints(query, library).tolist(), [0])
+
+    def test_screen_many(self):
+        """
+        Test screening many queries equals screening them one at a time
+        """
+
+        library = numpy.random.RandomState(1).randint(0, 256, (19, 4)).astype(numpy.uint8)
+        queries = numpy.vstack([library[[2, 5, 11]] & 0x0f, numpy.zeros((1, 4), dtype=numpy.uint8)])
+        candidates = screen_many(queries, library)
+
+        self.assertEqual(candidates.shape, (19, 4))
+        for i, query in enumerate(queries):
+            self.assertEqual(numpy.flatnonzero(candidates[:, i]).tolist(), screen_fingerprints(query, library).tolist())
+
+
+class SubstructureWampTests(unittest.TestCase):
+
+    def test_missing_library(self):
+        """
+        Test substructure search and filter fail for a missing library file
+        """
+
+        api = CheminfoSubstructureWampApi()
+        api.log = logging.getLogger(__name__)
+        library = {'content': None, 'path': '/nonexistent/library.smi', 'extension': 'smi'}
+
+        request = {'library': dict(library), 'smarts': 'C=O', 'toolkit': 'rdk'}
+        self.assertEqual(api.substructure_search(request, {}), {'status': 'failed'})
+
+        request = {'library': dict(library), 'toolkit': 'rdk'}
+        self.assertEqual(api.filter_structures(request, {}), {'status': 'failed'})
+
+
+class MatchWorkersTests(unittest.TestCase):
+
+    def test_reuse_threads(self):
+        """
+        Test successive searches run in the same worker threads
+        """
+
+        workers = MatchWorkers(size=2)
+        ident = lambda chunk: threading.current_thread().ident
+
+        idents = set(workers.map(ident, range(8))) | set(workers.map(ident, range(8)))
+        workers.close()
+
+        self.assertTrue(len(idents) <= 2)
+        self.assertFalse(threading.current_thread().ident in idents)
+        self.assertEqual(workers.map(lambda chunk: chunk * 2, [1, 2]), [2, 4])
+        workers.close()
+
+
+@unittest.skipIf('rdk' not in toolkits, "RDKit not available.")
+class RDKitSubstructureSearchTests(unittest.TestCase):
+    toolkit_name = 'rdk'
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.mols = [mol_read(smiles, mol_format='smi', toolkit=cls.toolkit_name) for smiles in SMILES]
+
+    def test_search(self):
+        """
+        Test screened and unscreened search find the same matches
+        """
+
+        matches, stats = mol_substructure_search('C(=O)[NX3;H2]', self.mols, toolkit=self.toolkit_name)
+        unscreened, unscreened_stats = mol_substructure_search('C(=O)[NX3;H2]', self.mols, toolkit=self.toolkit_name,
+                                                               screen=False, threads=1)
+
+        self.assertEqual(matches, unscreened)
+        self.assertEqual([bool(match) for match in matches], [False, False, True, False, True])
+        self.assertEqual(len(matches[4]), 2)
+        self.assertEqual(stats['matched'], 2)
+        self.assertTrue(stats['screened'] > 0)
+        self.assertEqual(unscreened_stats['screened'], 0)
+
+    def test_unreadable(self):
+        """
+        Test unreadable molecules are reported as None
+        """
+
+        matches, stats = mol_substructure_search('[#7]', [None] + self.mols, toolkit=self.toolkit_name)
+
+        self.assertEqual(matches[0], None)
+        self.assertEqual(stats['molecules'], 6)
+        self.assertEqual(stats['matched'], 4)
+
+    def test_invalid_smarts(self):
+        """
+        Test an invalid SMARTS pattern fails the search
+        """
+
+        self.assertEqual(mol_substructure_search('C(', self.mols, toolkit=self.toolkit_name), None)
+
+    def test_fingerprint_cache(self):
+        """
+        Test library fingerprints are calculated once per key
+        """
+
+        cache = LibraryFingerprintCache(maxsize=1)
+        fingerprints = cache.get('library', self.mols)
+
+        self.assertTrue(cache.get('library', self.mols) is fingerprints)
+        self.assertTrue(numpy.array_equal(fingerprints, library_fingerprints(self.mols)))
+
+        cache.get('other', self.mols[:2])
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 2})
+
+    def test_smarts_cache(self):
+        """
+        Test compiled patterns are reused
+        """
+
+        cache = SmartsCache(maxsize=2)
+        pattern = cache.get('[#7]', self.toolkit_name)
+
+        self.assertTrue(cache.get('[#7]', self.toolkit_name) is pattern)
+        cache.get('[#8]', self.toolkit_name)
+        cache.get('[#9]', self.toolkit_name)
+        self.assertFalse(cache.get('[#7]', self.toolkit_name) is pattern)
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 4})
+        self.assertRaises(IOError, cache.get, 'C(', self.toolkit_name)
+
+    def test_match_many(self):
+        """
+        Test applying a pattern set to a molecule stream
+        """
+
+        matrix = match_many(['[#7]', '[OX2H]', 'C(=O)N'], iter(self.mols + [None]), toolkit=self.toolkit_name)
+
+        self.assertEqual(matrix.shape, (6, 3))
+        self.assertEqual(matrix.tolist(), [[True, False, False], [False, True, False], [True, False, True],
+                                           [True, False, True], [True, False, True], [False, False, False]])
+        self.assertEqual(match_many(['[#7]', 'C('], self.mols, toolkit=self.toolkit_name), None)
+        self.assertEqual(match_many(['[#7]'], [], toolkit=self.toolkit_name).shape, (0, 1))
+
+        candidates = numpy.ones((5, 3), dtype=bool)
+        candidates[2:, 0] = False
+        matrix = match_many(['[#7]', '[OX2H]', 'C(=O)N'], self.mols, toolkit=self.toolkit_name, candidates=candidates)
+        self.assertEqual(matrix[:, 0].tolist(), [True, False, False, False, False])
+        self.assertEqual(matrix[:, 2].tolist(), [False, False, True, True, True])
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the toolkit selection by calibrated cost
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from mdstudio_structures import toolkits
+from mdstudio_structures.cheminfo_toolkit_select import (ONLINE_TOOLKITS, PREFERENCE, ToolkitSelector, calibrate,
+                                                         calibration_from_benchmarks, endpoint_operations,
+                                                         select_toolkit, supports)
+
+
+class EndpointOperationsTests(unittest.TestCase):
+
+    def test_convert_operations(self):
+        """
+        Test read and write formats of a conversion request
+        """
+
+        request = {'mol': {'content': 'CCO', 'path': None, 'extension': 'smi'}, 'output_format': 'mol'}
+
+        self.assertEqual(endpoint_operations('convert', request), [('mol_read', 'smi'), ('mol_write', 'mol')])
+
+    def test_similarity_operations(self):
+        """
+        Test read format and fingerprint type of a similarity request
+        """
+
+        request = {'test_set': [{'content': 'CCO', 'path': None, 'extension': 'smi'}], 'fp_format': 'morgan'}
+
+        self.assertEqual(endpoint_operations('chemical_similarity', request),
+                         [('mol_read', 'smi'), ('fingerprint', 'morgan')])
+
+    def test_batch_operations(self):
+        """
+        Test one write operation per output format of a batch request
+        """
+
+        request = {'input_format': 'smi', 'output_formats': ['can', 'inchi']}
+
+        self.assertEqual(endpoint_operations('convert_batch', request),
+                         [('mol_read', 'smi'), ('mol_write', 'can'), ('mol_write', 'inchi')])
+
+
+class CalibrationFromBenchmarksTests(unittest.TestCase):
+
+    def test_largest_size(self):
+        """
+        Test costs from the throughput of the largest problem size
+        """
+
+        results = {'results': [
+            {'name': 'mol_read', 'toolkit': 'rdk', 'size': 10, 'throughput': 100.0},
+            {'name': 'mol_read', 'toolkit': 'rdk', 'size': 100, 'throughput': 1000.0},
+            {'name': 'mol_read', 'toolkit': 'pybel', 'size': 100, 'throughput': 500.0},
+            {'name': 'sniff_format', 'toolkit': None, 'size': 100, 'throughput': 1e6}]}
+
+        costs = calibration_from_benchmarks(results)['costs']
+
+        self.assertEqual(costs, {'mol_read': {'smi': {'rdk': 0.001, 'pybel': 0.002}}})
+
+
+class ToolkitSelectorTests(unittest.TestCase):
+
+    def setUp(self):
+
+        self.selector = ToolkitSelector()
+
+    def test_configure_unknown(self):
+        """
+        Test rejecting unknown settings
+        """
+
+        self.assertRaises(ValueError, self.selector.configure, calibrate_on_start=True)
+
+    def test_cost(self):
+        """
+        Test summing format specific and any format costs
+        """
+
+        self.selector.load({'costs': {'mol_read': {'smi': {'rdk': 0.5}}, 'descriptors': {'*': {'rdk': 1.0}}}})
+
+        self.assertEqual(self.selector.cost('rdk', [('mol_read', 'smi'), ('descriptors', '*')]), 1.5)
+        self.assertIsNone(self.selector.cost('rdk', [('mol_read', 'mol')]))
+
+    def test_start_without_calibration(self):
+        """
+        Test no costs without calibration file and calibration
+        """
+
+        self.selector.configure(calibration=None, calibrate=False)
+
+        self.assertIsNone(self.selector.start())
+        self.assertEqual(self.selector.costs, {})
+
+    def test_select_fallback(self):
+        """
+        Test selecting a supporting toolkit without measured costs
+        """
+
+        self.assertIsNone(self.selector.select([('mol_read', 'no_such_format')]))
+        if 'rdk' in toolkits:
+            self.assertEqual(self.selector.select([('fingerprint', 'morgan')]), 'rdk')
+
+    def test_select_partially_measured(self):
+        """
+        Test ranking by the operations measured for all toolkits, equal
+        costs in order of preference
+        """
+
+        operations = [('mol_read', 'smi'), ('mol_write', 'can')]
+        candidates = [toolkit for toolkit in toolkits.keys() if toolkit not in ONLINE_TOOLKITS and
+                      all(supports(toolkit, *operation) for operation in operations)]
+        if not candidates:
+            self.skipTest('No toolkit reading SMILES and writing canonical SMILES')
+
+        candidates.sort(key=lambda toolkit: PREFERENCE.index(toolkit) if toolkit in PREFERENCE else len(PREFERENCE))
+        mol_read = dict((toolkit, 1.0) for toolkit in candidates)
+        self.selector.load({'costs': {'mol_read': {'smi': mol_read}}})
+        self.assertEqual(self.selector.select(operations), candidates[0])
+
+        mol_read[candidates[-1]] = 0.5
+        self.selector.load({'costs': {'mol_read': {'smi': mol_read}, 'mol_write': {'can': {candidates[0]: 0.1}}}})
+        self.assertEqual(self.selector.select(operations), candidates[-1])
+
+
+@unittest.skipIf('rdk' not in toolkits, "RDKit not available.")
+class RDKitCalibrationTests(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tempdir = tempfile.mkdtemp()
+        self.calibration = os.path.join(self.tempdir, 'calibration', 'toolkit_calibration.json')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tempdir)
+
+    def test_calibrate(self):
+        """
+        Test measuring the costs of the RDKit toolkit
+        """
+
+        costs = calibrate(['rdk'])['costs']
+
+        self.assertIn('rdk', costs['mol_read']['smi'])
+        self.assertIn('rdk', costs['fingerprint']['morgan'])
+        self.assertIn('rdk', costs['substructure']['*'])
+        self.assertIn('rdk', costs['make3d']['*'])
+        self.assertTrue(all(cost > 0 for cost in costs['mol_write']['can'].values()))
+
+    def test_start_stores_calibration(self):
+        """
+        Test calibrating on start and storing the calibration table
+        """
+
+        selector = ToolkitSelector(calibration=self.calibration)
+        table = selector.start()
+
+        with open(self.calibration) as infile:
+            self.assertEqual(json.load(infile)['costs'], table['costs'])
+        self.assertIn('rdk', selector.costs['mol_read']['smi'])
+
+    def test_select_cheapest(self):
+        """
+        Test selecting the toolkit with the lowest cost
+        """
+
+        self.assertTrue(supports('rdk', 'fingerprint', 'morgan'))
+
+        selector = ToolkitSelector()
+        selector.load({'costs': {'fingerprint': {'morgan': {'rdk': 0.1}}}})
+
+        self.assertEqual(selector.select([('fingerprint', 'morgan')]), 'rdk')
+
+    def test_select_toolkit_decorator(self):
+        """
+        Test resolving the 'auto' toolkit and reporting the toolkit used
+        """
+
+        @select_toolkit('descriptors')
+        def descriptors(self, request, claims):
+            return {'status': 'completed', 'requested': request['toolkit']}
+
+        request = {'toolkit': 'auto', 'mol': {'content': 'CCO', 'path': None, 'extension': 'smi'}}
+        response = descriptors(None, request, {})
+
+        self.assertEqual(response['toolkit'], response['requested'])
+        self.assertNotEqual(response['toolkit'], 'auto')
+        self.assertEqual(request['toolkit'], 'auto')
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the webel toolkit web service layer using a local
+stand-in HTTP server
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mdstudio_structures import toolkits
+
+if sys.version_info[0] < 3:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+else:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+DESCRIPTOR = 'org.openscience.cdk.qsar.descriptors.molecular.'
+RESPONSES = {
+    '/cdk/descriptors': '{0}ADescriptor\n{0}BDescriptor\n'.format(DESCRIPTOR),
+    '/cdk/descriptor/{0}ADescriptor/CCO'.format(DESCRIPTOR):
+        '<Descriptor parent="ADescriptor" name="nA" value="1.5"/>',
+    '/cdk/descriptor/{0}BDescriptor/CCO'.format(DESCRIPTOR):
+        '<Descriptor parent="BDescriptor" name="nB" value="2"/>',
+    '/cdk/mw/CCO': '46.07'}
+REDIRECTS = {
+    '/moved/mw/CCO': 'http://{host}/cdk/mw/CCO',
+    '/relative/mw/CCO': '/cdk/mw/CCO',
+    '/cdk/loop': '/cdk/loop'}
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.clients.add(self.client_address)
+
+        if self.path in REDIRECTS:
+            self.send_response(301)
+            self.send_header('Location', REDIRECTS[self.path].format(host=self.headers.get('Host')))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = RESPONSES.get(self.path)
+        self.send_response(404 if body is None else 200)
+        body = (body or 'not found').encode('utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+
+        pass
+
+
+@unittest.skipIf('webel' not in toolkits, "Webel software not available.")
+class WebelServiceTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Start the stand-in server and point webel to it
+        """
+
+        self.webel = toolkits['webel']
+        self.defaults = dict(rajweb=self.webel.baseurls['rajweb'], nci=self.webel.baseurls['nci'],
+                             cachedir=self.webel.cachedir or '', cachesize=self.webel.cachesize,
+                             maxworkers=self.webel.maxworkers, timeout=self.webel.timeout)
+
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.clients = set()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        url = self.url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+        self.tmpdir = tempfile.mkdtemp()
+        self.webel.configure(rajweb=url + '/cdk', nci=url + '/nci', cachedir='', maxworkers=4, timeout=5)
+
+    def tearDown(self):
+
+        self.webel.configure(**self.defaults)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_calcdesc(self):
+        """
+        Test concurrent descriptor calculation
+        """
+
+        desc = self.webel.Molecule('CCO').calcdesc()
+        self.assertEqual(desc, {'ADescriptor_nA': 1.5, 'BDescriptor_nB': 2.0})
+
+    def test_connection_reuse(self):
+        """
+        Test sequential requests share a single keep-alive connection
+        """
+
+        self.webel.configure(maxworkers=1)
+        for i in range(3):
+            self.assertEqual(self.webel.Molecule('CCO').molwt, 46.07)
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_response_cache(self):
+        """
+        Test repeated requests are served from the response cache
+        """
+
+        self.webel.configure(cachedir=self.tmpdir)
+        self.webel.Molecule('CCO').calcdesc(['ADescriptor'])
+        nrequests = len(self.server.requests)
+        self.webel.Molecule('CCO').calcdesc(['ADescriptor'])
+
+        self.assertEqual(len(self.server.requests), nrequests)
+
+    def test_not_found(self):
+        """
+        Test HTTP errors are raised and not cached
+        """
+
+        self.webel.configure(cachedir=self.tmpdir)
+        self.assertEqual(self.webel.Molecule('CCO').write('names'), [])
+        self.assertEqual(self.webel.Molecule('CCO').write('names'), [])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_redirect(self):
+        """
+        Test absolute and relative redirects are followed
+        """
+
+        for prefix in ('/moved', '/relative'):
+            self.webel.configure(rajweb=self.url + prefix)
+            self.assertEqual(self.webel.Molecule('CCO').molwt, 46.07)
+
+    def test_redirect_limit(self):
+        """
+        Test redirect loops raise an HTTP error
+        """
+
+        self.assertRaises(self.webel.HTTPError, self.webel.rajweb, 'loop')
+        self.assertEqual(len(self.server.requests), self.webel._pool.maxredirects + 1)
+
+    def test_response_cache_size(self):
+        """
+        Test the response cache is pruned to its maximum size
+        """
+
+        self.webel.configure(cachedir=self.tmpdir, cachesize=100)
+        self.webel.Molecule('CCO').calcdesc()
+        self.webel.Molecule('CCO').molwt
+
+        sizes = [os.path.getsize(os.path.join(dirpath, name))
+                 for dirpath, dirnames, filenames in os.walk(self.tmpdir) for name in filenames]
+        self.assertTrue(0 < sum(sizes) <= 100)